@@ -15,20 +15,40 @@ Acts as the single conversational face of the NBFC.
 """
 
 import os
-import asyncio
-from typing import List, Dict, Any
+import logging
+import time
+from contextlib import aclosing
+from typing import List, Dict, Any, AsyncIterator, Tuple
 
-from openai import OpenAI
-from dotenv import load_dotenv
+from leakage_filter import LeakageFilter
+from llm_cache import ResponseCache, cache_key
+from llm_client import LLMClient
+from metrics import REGISTRY
+from records import HISTORY_WINDOW
 
-# ---------- Setup ----------
-load_dotenv(override=True)
+logger = logging.getLogger(__name__)
 
+# ---------- Setup ----------
+# Imported lazily by main (after .env is loaded), not at API startup.
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 OPENAI_TIMEOUT_SECONDS = int(os.getenv("OPENAI_TIMEOUT_SECONDS", "30"))
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# OPENAI_BASE_URL (read by the client) can point at a local fake server.
+llm = LLMClient(
+    api_key=OPENAI_API_KEY,
+    model=OPENAI_MODEL,
+    timeout_seconds=OPENAI_TIMEOUT_SECONDS,
+)
+
+# Shared across sessions, but only for identical prompts (same full history
+# window), so one customer's reply is never served to another.
+RESPONSE_CACHE = ResponseCache()
+
+# Cache misses only: time to the full reply, by call mode and outcome.
+LLM_SECONDS = REGISTRY.histogram(
+    "llm_request_seconds", "Master Agent LLM calls", ("mode", "outcome")
+)
 
 # ---------- System Prompt ----------
 SYSTEM_PROMPT = """
@@ -51,66 +71,128 @@ Strict rules:
 Your responses are shown directly to customers.
 """
 
+# ---------- Leakage Filter ----------
+LEAKAGE_FILTER = LeakageFilter()
+
+FALLBACK_REPLY = (
+    "Thank you. Please share the requested details so I can continue "
+    "assisting you with your loan application."
+)
+
+
+def is_safe(reply: str) -> bool:
+    return len(reply) >= 5 and LEAKAGE_FILTER.scan(reply) is None
+
+
 # ---------- Master Agent ----------
-async def run_master_agent(
-    session_id: str,
+def build_messages(
     current_stage: str,
     history: List[Dict[str, str]],
     user_message: str,
-) -> Dict[str, Any]:
-    """
-    Generates a natural-language response only.
-    Control flow and decisions are handled elsewhere.
-    """
-
+) -> List[Dict[str, str]]:
     messages: List[Dict[str, str]] = [
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "system", "content": f"Conversation stage: {current_stage}"},
     ]
 
     # Include recent conversational history
-    for m in history[-12:]:
+    for m in history[-HISTORY_WINDOW:]:
         if m.get("role") in ("user", "assistant") and m.get("content"):
             messages.append(
                 {"role": m["role"], "content": m["content"]}
             )
 
     messages.append({"role": "user", "content": user_message})
+    return messages
 
-    try:
-        response = await asyncio.to_thread(
-            lambda: client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=messages,
-                temperature=0.6,
-                max_tokens=220,
-                timeout=OPENAI_TIMEOUT_SECONDS,
-            )
-        )
-        reply = (response.choices[0].message.content or "").strip()
-    except Exception:
-        reply = ""
 
-    # ---------- HARD SAFETY & LEAKAGE FILTER ----------
-    forbidden_phrases = [
-        "{", "}", "[", "]",
-        "verify", "verification",
-        "eligibility", "engine",
-        "tool", "agent", "worker",
-        "json", "api", "system",
-        "foir", "risk band"
-    ]
+async def run_master_agent(
+    session_id: str,
+    current_stage: str,
+    history: List[Dict[str, str]],
+    user_message: str,
+) -> Dict[str, Any]:
+    """
+    Generates a natural-language response only.
+    Control flow and decisions are handled elsewhere.
+    """
 
-    if (
-        not reply
-        or any(term in reply.lower() for term in forbidden_phrases)
-        or len(reply) < 5
-    ):
-        reply = (
-            "Thank you. Please share the requested details so I can continue "
-            "assisting you with your loan application."
-        )
+    messages = build_messages(current_stage, history, user_message)
+
+    async def complete() -> str:
+        start = time.perf_counter()
+        try:
+            reply = await llm.chat(messages, temperature=0.6, max_tokens=220)
+        except Exception:
+            LLM_SECONDS.observe(time.perf_counter() - start, "chat", "error")
+            logger.warning("Master agent completion failed; using fallback reply", exc_info=True)
+            return ""
+        LLM_SECONDS.observe(time.perf_counter() - start, "chat", "ok")
+        return reply
+
+    reply = await RESPONSE_CACHE.get_or_compute(
+        cache_key(messages),
+        complete,
+    )
+
+    # ---------- HARD SAFETY & LEAKAGE FILTER ----------
+    if not is_safe(reply):
+        reply = FALLBACK_REPLY
 
     return {
         "assistant_reply": reply
     }
+
+
+async def stream_master_agent(
+    session_id: str,
+    current_stage: str,
+    history: List[Dict[str, str]],
+    user_message: str,
+) -> AsyncIterator[Tuple[str, str]]:
+    """
+    Streaming form of run_master_agent. Yields ("delta", text) as tokens
+    clear the leakage filter. If the reply trips the filter or fails after
+    text was shown, yields ("reset", FALLBACK_REPLY) to replace it.
+    """
+    messages = build_messages(current_stage, history, user_message)
+    key = cache_key(messages)
+    cached = RESPONSE_CACHE.lookup(key)
+    if cached is not None:
+        yield ("delta", FALLBACK_REPLY if not is_safe(cached) else cached)
+        return
+
+    leak_filter = LEAKAGE_FILTER.stream()
+    shown: List[str] = []
+    start = time.perf_counter()
+
+    try:
+        async with aclosing(llm.chat_stream(messages, temperature=0.6, max_tokens=220)) as stream:
+            async for delta in stream:
+                text = leak_filter.feed(delta)
+                if leak_filter.tripped:
+                    break
+                if not shown:
+                    text = text.lstrip()
+                if text:
+                    shown.append(text)
+                    yield ("delta", text)
+    except Exception:
+        LLM_SECONDS.observe(time.perf_counter() - start, "stream", "error")
+        logger.warning("Master agent stream failed; using fallback reply", exc_info=True)
+        reply = ""
+    else:
+        tail = leak_filter.flush()
+        reply = ("".join(shown) + tail).strip()
+        LLM_SECONDS.observe(
+            time.perf_counter() - start, "stream", "leak" if leak_filter.tripped else "ok"
+        )
+
+    if leak_filter.tripped or len(reply) < 5:
+        yield ("reset" if shown else "delta", FALLBACK_REPLY)
+        return
+
+    tail = reply[len("".join(shown)):]
+    if tail:
+        yield ("delta", tail)
+    RESPONSE_CACHE.put(key, reply)
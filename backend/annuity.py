@@ -0,0 +1,99 @@
+# annuity.py
+"""
+Reducing-Balance EMI Engine
+
+EMI = P * r(1+r)^n / ((1+r)^n - 1), with r the monthly rate, computed
+as P * r / (1 - (1+r)^-n) so that long tenures tend to r instead of
+overflowing.
+
+Annuity factors for the standard product rates and every tenure up to
+TABLE_MAX_TENURE are precomputed at import; other (rate, tenure) pairs
+go through an LRU cache. Scalar and vectorized lookups return identical
+factors, so the chat and batch paths agree to the last bit.
+"""
+
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import numpy as np
+
+# ---------- Config ----------
+STANDARD_RATES = (12.0,)
+TABLE_MAX_TENURE = 120
+
+
+def _compute_factor(rate: float, tenure: int) -> float:
+    r = rate / 1200.0
+    if r == 0:
+        return 1.0 / tenure
+    return r / (1.0 - (1.0 + r) ** -tenure)
+
+
+_TABLE: Dict[Tuple[float, int], float] = {
+    (rate, n): _compute_factor(rate, n)
+    for rate in STANDARD_RATES
+    for n in range(1, TABLE_MAX_TENURE + 1)
+}
+
+# Row per rate for vectorized lookups; index 0 is unused because
+# tenure <= 0 is rejected before any EMI is computed.
+_TABLE_NP: Dict[float, np.ndarray] = {
+    rate: np.array(
+        [0.0] + [_TABLE[(rate, n)] for n in range(1, TABLE_MAX_TENURE + 1)],
+        dtype=np.float64,
+    )
+    for rate in STANDARD_RATES
+}
+
+
+@lru_cache(maxsize=4096)
+def _off_table_factor(rate: float, tenure: int) -> float:
+    return _compute_factor(rate, tenure)
+
+
+# ---------- Scalar ----------
+def annuity_factor(rate: float, tenure: int) -> float:
+    """
+    EMI per unit of principal at an annual `rate` (%) over `tenure` months.
+    """
+    factor = _TABLE.get((rate, tenure))
+    if factor is None:
+        factor = _off_table_factor(rate, tenure)
+    return factor
+
+
+def emi_for(principal: float, rate: float, tenure: int) -> float:
+    return principal * annuity_factor(rate, tenure)
+
+
+def max_principal(emi: float, rate: float, tenure: int) -> float:
+    """
+    Largest principal whose EMI does not exceed `emi`.
+    """
+    return emi / annuity_factor(rate, tenure)
+
+
+# ---------- Vectorized ----------
+def annuity_factors(rate: float, tenure: np.ndarray) -> np.ndarray:
+    """
+    Vectorized annuity_factor. Entries with tenure <= 0 come back as NaN.
+    """
+    tenure = np.asarray(tenure, dtype=np.int64)
+    factors = np.full(tenure.shape, np.nan)
+
+    row = _TABLE_NP.get(rate)
+    if row is not None:
+        on_table = (tenure > 0) & (tenure <= TABLE_MAX_TENURE)
+        factors[on_table] = row[tenure[on_table]]
+        off_table = tenure > TABLE_MAX_TENURE
+    else:
+        off_table = tenure > 0
+
+    # Few distinct off-table tenures in practice: resolve each through the
+    # scalar cache so both paths see exactly the same factor.
+    if off_table.any():
+        values, inverse = np.unique(tenure[off_table], return_inverse=True)
+        resolved = np.array([_off_table_factor(rate, int(n)) for n in values])
+        factors[off_table] = resolved[inverse]
+
+    return factors
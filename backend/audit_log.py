@@ -0,0 +1,539 @@
+# audit_log.py
+"""
+Credit Decision Audit Log
+
+Append-only log of every loan decision (approval, counter offer,
+rejection) with the numbers behind it, for regulators and for tuning
+the eligibility thresholds.
+
+- Fixed-size binary records (struct), 44 bytes each, in segment files
+  under AUDIT_LOG_DIR; a segment holds one day of one process's
+  decisions and rotates at AUDIT_SEGMENT_RECORDS
+- record() only queues the decision; a writer thread appends batches
+  and fsyncs them every AUDIT_FLUSH_MS, off the request path
+- A SQLite index (shared by all workers) keeps, per segment, its time
+  range, record counts by outcome and risk band, and a bloom filter of
+  PAN hashes, so a query opens only the segments that can match
+- PANs are stored as a keyed 64-bit hash, never in clear
+- query() streams records a block at a time; memory stays flat however
+  many millions of records a segment range holds
+
+Usage:
+    python audit_log.py query [--since 2026-01-01] [--until 2026-01-07]
+                              [--outcome rejected] [--risk MEDIUM] [--pan ABCDE1234F]
+                              [--count]
+    python audit_log.py stats
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import secrets
+import sqlite3
+import struct
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ---------- Config ----------
+AUDIT_LOG_DIR = os.getenv("AUDIT_LOG_DIR", "audit")
+AUDIT_SEGMENT_RECORDS = int(os.getenv("AUDIT_SEGMENT_RECORDS", "262144"))
+AUDIT_FLUSH_MS = int(os.getenv("AUDIT_FLUSH_MS", "200"))
+AUDIT_BATCH_RECORDS = 1024
+
+OUTCOMES = ("", "approved", "counter_offer", "rejected")
+RISK_BANDS = ("", "LOW", "MEDIUM", "HIGH")
+
+# ---------- Record Format ----------
+# ts, pan hash, outcome, risk band, reason id, tenure, requested amount,
+# approved amount, monthly income, existing EMI, FOIR (NaN if unknown).
+RECORD = struct.Struct("<dQBBHHIIIIf2x")
+HEADER = struct.Struct("<4sHH")
+MAGIC = b"NBAL"
+VERSION = 1
+READ_BLOCK_RECORDS = 4096
+
+# Bloom filter over a segment's PAN hashes: ~1% false positives when full.
+BLOOM_BITS_PER_RECORD = 10
+BLOOM_HASHES = 7
+
+
+def _day(ts: float) -> str:
+    return time.strftime("%Y-%m-%d", time.localtime(ts))
+
+
+def _bloom_positions(pan_hash: int, size_bits: int) -> List[int]:
+    # Double hashing from the two halves of the 64-bit hash.
+    h1, h2 = pan_hash & 0xFFFFFFFF, pan_hash >> 32 | 1
+    return [(h1 + i * h2) % size_bits for i in range(BLOOM_HASHES)]
+
+
+def _clamp(value: int, limit: int) -> int:
+    # Customers type these; an absurd figure must not fail the whole batch.
+    return min(max(int(value), 0), limit)
+
+
+def _writer_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class _Segment:
+    __slots__ = ("name", "day", "file", "records", "first_ts", "last_ts", "bloom", "counts")
+
+    def __init__(self, name: str, day: str, file, bloom_bytes: int):
+        self.name = name
+        self.day = day
+        self.file = file
+        self.records = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.bloom = bytearray(bloom_bytes)
+        self.counts: Counter = Counter()
+
+
+class AuditLog:
+    def __init__(
+        self,
+        directory: str = AUDIT_LOG_DIR,
+        segment_records: int = AUDIT_SEGMENT_RECORDS,
+        flush_seconds: float = AUDIT_FLUSH_MS / 1000,
+        batch_records: int = AUDIT_BATCH_RECORDS,
+    ):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.flush_seconds = flush_seconds
+        self.batch_records = batch_records
+        self.bloom_bits = segment_records * BLOOM_BITS_PER_RECORD
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "index.sqlite3"), timeout=10, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " name TEXT PRIMARY KEY,"
+            " day TEXT NOT NULL,"
+            " first_ts REAL NOT NULL,"
+            " last_ts REAL NOT NULL,"
+            " records INTEGER NOT NULL,"
+            " writer INTEGER NOT NULL,"
+            " sealed INTEGER NOT NULL DEFAULT 0,"
+            " pans BLOB)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS segments_time ON segments (first_ts, last_ts)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS segment_counts ("
+            " segment TEXT NOT NULL,"
+            " outcome INTEGER NOT NULL,"
+            " risk_band INTEGER NOT NULL,"
+            " records INTEGER NOT NULL,"
+            " PRIMARY KEY (segment, outcome, risk_band))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reasons (id INTEGER PRIMARY KEY, text TEXT UNIQUE NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta (name, value) VALUES ('pan_key', ?)",
+            (secrets.token_hex(16),),
+        )
+        self._conn.commit()
+        self._pan_key = bytes.fromhex(
+            self._conn.execute("SELECT value FROM meta WHERE name = 'pan_key'").fetchone()[0]
+        )
+
+        self._db_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending: List[Tuple] = []
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._segment: Optional[_Segment] = None
+        self._reason_ids: Dict[str, int] = {}
+        self.written = 0
+
+    def pan_hash(self, pan: str) -> int:
+        if not pan:
+            return 0
+        digest = hashlib.blake2b(pan.upper().encode("utf-8"), digest_size=8, key=self._pan_key)
+        return int.from_bytes(digest.digest(), "little")
+
+    # ---------- Writing ----------
+    def record(
+        self,
+        outcome: str,
+        reason: str,
+        risk_band: Optional[str] = None,
+        pan: str = "",
+        requested_amount: int = 0,
+        approved_amount: int = 0,
+        monthly_income: int = 0,
+        existing_emi: int = 0,
+        tenure: int = 0,
+        foir: Optional[float] = None,
+        ts: Optional[float] = None,
+    ) -> None:
+        """
+        Queues one decision; it is on disk within AUDIT_FLUSH_MS. Hashing
+        and packing happen on the writer thread.
+        """
+        if outcome not in OUTCOMES or (risk_band or "") not in RISK_BANDS:
+            raise ValueError(f"unknown outcome or risk band: {outcome!r}, {risk_band!r}")
+
+        entry = (
+            time.time() if ts is None else ts, pan, outcome, risk_band or "", reason,
+            tenure, requested_amount, approved_amount, monthly_income, existing_emi, foir,
+        )
+        with self._pending_lock:
+            self._pending.append(entry)
+            pending = len(self._pending)
+
+        if self._thread is None:
+            self._start()
+        if pending >= self.batch_records:
+            self._wake.set()
+
+    def _start(self) -> None:
+        with self._write_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            self.recover()
+        except Exception:
+            logger.warning("Audit log recovery failed", exc_info=True)
+
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Kept in memory and retried on the next flush.
+                logger.exception("Audit log flush failed")
+
+    def flush(self) -> int:
+        """
+        Writes and fsyncs everything queued so far. Returns the record count.
+        """
+        with self._write_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            try:
+                self._write(batch)
+            except Exception:
+                with self._pending_lock:
+                    self._pending[:0] = batch
+                raise
+            self.written += len(batch)
+            return len(batch)
+
+    def _write(self, batch: List[Tuple]) -> None:
+        chunk = bytearray()
+        segment = self._segment
+
+        for entry in batch:
+            try:
+                ts, pan_hash, outcome, risk_band, packed = self._pack(entry)
+            except (TypeError, ValueError, struct.error):
+                logger.exception("Dropping malformed audit record")
+                continue
+
+            day = _day(ts)
+            if segment is None or segment.day != day or segment.records >= self.segment_records:
+                if segment is not None:
+                    self._append(segment, chunk)
+                    self._seal(segment)
+                    chunk = bytearray()
+                segment = self._segment = self._open_segment(day)
+
+            chunk += packed
+            segment.records += 1
+            segment.first_ts = ts if segment.first_ts is None else min(segment.first_ts, ts)
+            segment.last_ts = ts if segment.last_ts is None else max(segment.last_ts, ts)
+            segment.counts[(outcome, risk_band)] += 1
+            if pan_hash:
+                for position in _bloom_positions(pan_hash, self.bloom_bits):
+                    segment.bloom[position >> 3] |= 1 << (position & 7)
+
+        if segment is not None:
+            self._append(segment, chunk)
+
+    def _pack(self, entry: Tuple) -> Tuple[float, int, int, int, bytes]:
+        (ts, pan, outcome, risk_band, reason, tenure, requested, approved,
+         income, emi, foir) = entry
+        pan_hash = self.pan_hash(pan)
+        outcome = OUTCOMES.index(outcome)
+        risk_band = RISK_BANDS.index(risk_band)
+        packed = RECORD.pack(
+            ts, pan_hash, outcome, risk_band, self._reason_id(reason),
+            _clamp(tenure, 0xFFFF),
+            _clamp(requested, 0xFFFFFFFF),
+            _clamp(approved, 0xFFFFFFFF),
+            _clamp(income, 0xFFFFFFFF),
+            _clamp(emi, 0xFFFFFFFF),
+            math.nan if foir is None else min(float(foir), 1e30),
+        )
+        return ts, pan_hash, outcome, risk_band, packed
+
+    def _open_segment(self, day: str) -> _Segment:
+        name = f"{day}_{time.time_ns() // 1000:x}_{os.getpid()}.seg"
+        f = open(os.path.join(self.directory, name), "ab")
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        return _Segment(name, day, f, self.bloom_bits // 8)
+
+    def _append(self, segment: _Segment, chunk: bytes) -> None:
+        if chunk:
+            segment.file.write(chunk)
+        segment.file.flush()
+        os.fsync(segment.file.fileno())
+        self._index(segment, sealed=False)
+
+    def _seal(self, segment: _Segment) -> None:
+        segment.file.close()
+        self._index(segment, sealed=True)
+
+    def _index(self, segment: _Segment, sealed: bool) -> None:
+        if segment.records == 0:
+            return
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT INTO segments (name, day, first_ts, last_ts, records, writer, sealed, pans)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(name) DO UPDATE SET first_ts = excluded.first_ts,"
+                " last_ts = excluded.last_ts, records = excluded.records,"
+                " sealed = excluded.sealed, pans = excluded.pans",
+                (segment.name, segment.day, segment.first_ts, segment.last_ts, segment.records,
+                 os.getpid(), int(sealed), bytes(segment.bloom) if sealed else None),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO segment_counts (segment, outcome, risk_band, records)"
+                " VALUES (?, ?, ?, ?)",
+                [(segment.name, o, r, n) for (o, r), n in segment.counts.items()],
+            )
+            self._conn.commit()
+
+    def _reason_id(self, reason: str) -> int:
+        reason_id = self._reason_ids.get(reason)
+        if reason_id is None:
+            with self._db_lock:
+                self._conn.execute("INSERT OR IGNORE INTO reasons (text) VALUES (?)", (reason,))
+                self._conn.commit()
+                reason_id = self._conn.execute(
+                    "SELECT id FROM reasons WHERE text = ?", (reason,)
+                ).fetchone()[0]
+            self._reason_ids[reason] = reason_id
+        return reason_id
+
+    def recover(self) -> int:
+        """
+        Seals segments left open by writers that have exited (crash or
+        kill), rebuilding their index entry from the file. A record cut
+        short by the crash is dropped.
+        """
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT name, day, writer FROM segments WHERE sealed = 0"
+            ).fetchall()
+
+        recovered = 0
+        for name, day, writer in rows:
+            if _writer_alive(writer):
+                continue
+            path = os.path.join(self.directory, name)
+            usable = HEADER.size + (os.path.getsize(path) - HEADER.size) // RECORD.size * RECORD.size
+            os.truncate(path, usable)
+
+            segment = _Segment(name, day, None, self.bloom_bits // 8)
+            for record in self._scan(name):
+                ts, pan_hash, outcome, risk_band = record[:4]
+                segment.records += 1
+                segment.first_ts = ts if segment.first_ts is None else min(segment.first_ts, ts)
+                segment.last_ts = ts if segment.last_ts is None else max(segment.last_ts, ts)
+                segment.counts[(outcome, risk_band)] += 1
+                if pan_hash:
+                    for position in _bloom_positions(pan_hash, self.bloom_bits):
+                        segment.bloom[position >> 3] |= 1 << (position & 7)
+            self._index(segment, sealed=True)
+            recovered += 1
+        return recovered
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+        with self._write_lock:
+            if self._segment is not None:
+                self._seal(self._segment)
+                self._segment = None
+
+    # ---------- Querying ----------
+    def segments(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        outcome: Optional[str] = None,
+        risk_band: Optional[str] = None,
+        pan: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Names of the segments that may hold matching records, oldest first.
+        """
+        sql = "SELECT name, sealed, pans FROM segments s WHERE last_ts >= ? AND first_ts <= ?"
+        params: List[Any] = [since or 0, until or math.inf]
+        if outcome is not None or risk_band is not None:
+            sql += " AND EXISTS (SELECT 1 FROM segment_counts c WHERE c.segment = s.name"
+            if outcome is not None:
+                sql += " AND c.outcome = ?"
+                params.append(OUTCOMES.index(outcome))
+            if risk_band is not None:
+                sql += " AND c.risk_band = ?"
+                params.append(RISK_BANDS.index(risk_band))
+            sql += ")"
+        sql += " ORDER BY first_ts"
+
+        with self._db_lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        if not pan:
+            return [name for name, _, _ in rows]
+
+        pan_hash = self.pan_hash(pan)
+        return [
+            name for name, sealed, pans in rows
+            # Open segments have no filter yet; they are always read.
+            if not sealed or all(
+                pans[p >> 3] & (1 << (p & 7)) for p in _bloom_positions(pan_hash, len(pans) * 8)
+            )
+        ]
+
+    def _scan(self, name: str) -> Iterator[Tuple]:
+        with open(os.path.join(self.directory, name), "rb") as f:
+            magic, version, size = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or size != RECORD.size:
+                raise ValueError(f"{name} is not a version {VERSION} audit segment")
+            while True:
+                block = f.read(READ_BLOCK_RECORDS * RECORD.size)
+                usable = len(block) // RECORD.size * RECORD.size
+                if usable == 0:
+                    return
+                yield from RECORD.iter_unpack(memoryview(block)[:usable])
+
+    def query(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        outcome: Optional[str] = None,
+        risk_band: Optional[str] = None,
+        pan: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Streams matching decisions, oldest segment first.
+        """
+        since = since or 0
+        until = math.inf if until is None else until
+        want_outcome = None if outcome is None else OUTCOMES.index(outcome)
+        want_risk = None if risk_band is None else RISK_BANDS.index(risk_band)
+        want_pan = self.pan_hash(pan) if pan else None
+
+        with self._db_lock:
+            reasons = dict(self._conn.execute("SELECT id, text FROM reasons"))
+
+        for name in self.segments(since, until, outcome, risk_band, pan):
+            for (ts, pan_hash, o, r, reason_id, tenure, requested, approved,
+                 income, emi, foir) in self._scan(name):
+                if (
+                    not since <= ts <= until
+                    or (want_outcome is not None and o != want_outcome)
+                    or (want_risk is not None and r != want_risk)
+                    or (want_pan is not None and pan_hash != want_pan)
+                ):
+                    continue
+                yield {
+                    "ts": ts,
+                    "pan_hash": f"{pan_hash:016x}",
+                    "outcome": OUTCOMES[o],
+                    "risk_band": RISK_BANDS[r] or None,
+                    "reason": reasons.get(reason_id, ""),
+                    "tenure_months": tenure,
+                    "requested_amount": requested,
+                    "approved_amount": approved,
+                    "monthly_income": income,
+                    "existing_emi": emi,
+                    "foir": None if math.isnan(foir) else round(foir, 4),
+                }
+
+    def stats(self) -> Dict[str, int]:
+        with self._db_lock:
+            segments, sealed, records = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(sealed), 0), COALESCE(SUM(records), 0) FROM segments"
+            ).fetchone()
+        return {
+            "segments": segments,
+            "sealed": sealed,
+            "records": records,
+            "bytes": records * RECORD.size,
+        }
+
+
+def _parse_day(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the credit decision audit log")
+    parser.add_argument("command", choices=["query", "stats"])
+    parser.add_argument("--since", type=_parse_day, help="first day, YYYY-MM-DD")
+    parser.add_argument("--until", type=_parse_day, help="last day (inclusive), YYYY-MM-DD")
+    parser.add_argument("--outcome", choices=[o for o in OUTCOMES if o])
+    parser.add_argument("--risk", choices=[r for r in RISK_BANDS if r])
+    parser.add_argument("--pan")
+    parser.add_argument("--count", action="store_true", help="print only the number of matches")
+    args = parser.parse_args()
+
+    audit = AuditLog()
+    if args.command == "stats":
+        print(audit.stats())
+    else:
+        matches = audit.query(
+            since=args.since.timestamp() if args.since else None,
+            until=(args.until + timedelta(days=1)).timestamp() if args.until else None,
+            outcome=args.outcome,
+            risk_band=args.risk,
+            pan=args.pan,
+        )
+        if args.count:
+            print(sum(1 for _ in matches))
+        else:
+            for match in matches:
+                print(json.dumps(match))
@@ -0,0 +1,180 @@
+# batch_letters.py
+"""
+Batch Sanction Letter Generator
+
+Renders pre-approved sanction letters for a whole campaign segment.
+
+- Streams a CSV or JSONL of approved offers row by row
+- Renders and encrypts across a process pool (one worker per core by
+  default), with a bounded number of rows in flight, so memory stays
+  flat whatever the input size
+- Names each letter by a hash of its offer, so a re-run skips rows
+  whose letters already exist (resumable)
+- Appends one manifest line per row: path, SHA-256 and size, or the
+  row's error
+
+Usage:
+    python batch_letters.py offers.csv campaign_letters/
+    python batch_letters.py offers.jsonl campaign_letters/ --sanction-date "01 Feb 2026"
+
+Input columns: customer_name, pan, approved_amount, tenure_months,
+optional interest_rate and sanction_date. Pin --sanction-date when a run
+may be resumed on a later day; it is part of each letter's name.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Dict, Iterator, Tuple
+
+from workers import LOAN_INTEREST_RATE, generate_sanction_letter, get_letter_template
+
+MANIFEST_NAME = "manifest.jsonl"
+IN_FLIGHT_PER_WORKER = 4
+
+
+# ---------- Input ----------
+def read_rows(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def normalize_offer(row: Dict[str, Any], sanction_date: str) -> Dict[str, Any]:
+    """
+    Validates one input row. Raises KeyError / ValueError for bad rows.
+    """
+    name = " ".join(str(row["customer_name"]).split())
+    if not name:
+        raise ValueError("customer_name is empty")
+
+    return {
+        "customer_name": name,
+        "pan": str(row["pan"]).strip().upper(),
+        "approved_amount": int(float(row["approved_amount"])),
+        "interest_rate": float(row.get("interest_rate") or LOAN_INTEREST_RATE),
+        "tenure_months": int(float(row["tenure_months"])),
+        "sanction_date": row.get("sanction_date") or sanction_date,
+    }
+
+
+def offer_path(out_dir: str, offer: Dict[str, Any]) -> str:
+    digest = hashlib.sha256(
+        json.dumps(
+            [
+                offer["customer_name"].lower(),
+                offer["pan"],
+                offer["approved_amount"],
+                f"{offer['interest_rate']:.4f}",
+                offer["tenure_months"],
+                offer["sanction_date"],
+            ]
+        ).encode("utf-8")
+    ).hexdigest()
+    return os.path.join(out_dir, digest[:2], f"{digest}.pdf")
+
+
+# ---------- Worker ----------
+def render_offer(task: Tuple[int, Dict[str, Any], str]) -> Dict[str, Any]:
+    row, offer, path = task
+    try:
+        generate_sanction_letter({**offer, "output_path": path, "letter_url": path})
+        with open(path, "rb") as f:
+            payload = f.read()
+    except Exception as exc:
+        return {"row": row, "status": "error", "error": f"{type(exc).__name__}: {exc}"}
+
+    return {
+        "row": row,
+        "status": "ok",
+        "path": path,
+        "sha256": hashlib.sha256(payload).hexdigest(),
+        "bytes": len(payload),
+    }
+
+
+# ---------- Batch ----------
+def run_batch(
+    src: str,
+    out_dir: str,
+    sanction_date: str,
+    workers: int,
+) -> Dict[str, int]:
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {"rendered": 0, "skipped": 0, "errors": 0}
+    max_in_flight = workers * IN_FLIGHT_PER_WORKER
+
+    with open(os.path.join(out_dir, MANIFEST_NAME), "a", encoding="utf-8") as manifest, \
+            ProcessPoolExecutor(max_workers=workers, initializer=get_letter_template) as pool:
+
+        def record(result: Dict[str, Any]) -> None:
+            counts["rendered" if result["status"] == "ok" else "errors"] += 1
+            manifest.write(json.dumps(result) + "\n")
+
+        in_flight = set()
+
+        def drain(until: int) -> None:
+            nonlocal in_flight
+            while len(in_flight) > until:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(future.result())
+            manifest.flush()
+
+        for row, raw in enumerate(read_rows(src), start=1):
+            try:
+                offer = normalize_offer(raw, sanction_date)
+            except (KeyError, TypeError, ValueError) as exc:
+                record({"row": row, "status": "error", "error": f"{type(exc).__name__}: {exc}"})
+                continue
+
+            path = offer_path(out_dir, offer)
+            # Letters are written atomically, so an existing file is complete
+            # and was logged by the run that wrote it.
+            if os.path.exists(path):
+                counts["skipped"] += 1
+                continue
+
+            in_flight.add(pool.submit(render_offer, (row, offer, path)))
+            if len(in_flight) >= max_in_flight:
+                drain(max_in_flight // 2)
+
+        drain(0)
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk sanction letter generation")
+    parser.add_argument("input", help="CSV or JSONL of approved offers")
+    parser.add_argument("output_dir", help="directory for letters and manifest.jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--sanction-date", default=datetime.now().strftime("%d %b %Y"),
+                        help='date printed on letters without one, e.g. "01 Feb 2026"')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = run_batch(args.input, args.output_dir, args.sanction_date, args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{counts['rendered']:,} rendered  {counts['skipped']:,} skipped  "
+        f"{counts['errors']:,} errors  in {elapsed:.1f}s  "
+        f"({counts['rendered'] / elapsed:.1f} letters/sec, {args.workers} workers)",
+        file=sys.stderr,
+    )
+    sys.exit(1 if counts["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# bench_audit.py
+"""
+Audit log benchmark: write throughput and index-pruned queries.
+
+Writes --records synthetic decisions spread over --days days into a
+scratch audit log (a mix of approvals, counter offers and rejections
+across risk bands), then times:
+
+- record() on the request path, and the writer's flush throughput
+- "MEDIUM-risk rejections in the last 7 days" and a single-PAN lookup,
+  each with the index (segments opened vs total) and as a full scan
+- peak RSS, which should not grow with the number of records read
+
+Usage:
+    python bench_audit.py [--records 2000000] [--days 30] [--segment-records 65536]
+"""
+
+import argparse
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from audit_log import AuditLog
+
+REASONS = {
+    "approved": ["Eligible as requested", "Counter offer accepted"],
+    "counter_offer": ["FOIR too high based on existing obligations"],
+    "rejected": [
+        "FOIR too high based on existing obligations",
+        "Monthly income below minimum eligibility threshold",
+        "Counter offer declined",
+        "PAN verification failed",
+    ],
+}
+# Outcome, risk band, weight.
+MIX = [
+    ("approved", "LOW", 50),
+    ("approved", "MEDIUM", 20),
+    ("counter_offer", "HIGH", 12),
+    ("rejected", "HIGH", 15),
+    ("rejected", "MEDIUM", 3),
+]
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed(label: str, fn, segments: str = "") -> int:
+    start = time.perf_counter()
+    matches = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:34s} {matches:9,} matches  {elapsed * 1000:9.1f} ms  {segments}")
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=2_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--segment-records", type=int, default=65_536)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_audit_")
+    try:
+        # Only explicit flushes, so the request-path cost of record() and
+        # the writer's throughput are measured separately.
+        audit = AuditLog(
+            directory, segment_records=args.segment_records,
+            flush_seconds=3600, batch_records=sys.maxsize,
+        )
+        rng = random.Random(7)
+        outcomes = [(o, r) for o, r, _ in MIX]
+        weights = [w for _, _, w in MIX]
+        now = time.time()
+        start_ts = now - args.days * 86400
+        step = args.days * 86400 / args.records
+        needle = "ABCDE1234F"
+
+        # ---------- Write ----------
+        record_seconds = flush_seconds = 0.0
+        for i in range(args.records):
+            outcome, risk_band = rng.choices(outcomes, weights)[0]
+            pan = needle if i % 250_000 == 0 else f"P{i:09d}"
+            t0 = time.perf_counter()
+            audit.record(
+                outcome,
+                rng.choice(REASONS[outcome]),
+                risk_band=risk_band,
+                pan=pan,
+                requested_amount=rng.randrange(50_000, 2_000_000),
+                approved_amount=rng.randrange(0, 2_000_000) if outcome == "approved" else 0,
+                monthly_income=rng.randrange(15_000, 300_000),
+                existing_emi=rng.randrange(0, 50_000),
+                tenure=rng.choice((12, 24, 36, 48, 60)),
+                foir=rng.random(),
+                ts=start_ts + i * step,
+            )
+            record_seconds += time.perf_counter() - t0
+            if i % 50_000 == 49_999:
+                t0 = time.perf_counter()
+                audit.flush()
+                flush_seconds += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        audit.close()
+        flush_seconds += time.perf_counter() - t0
+
+        stats = audit.stats()
+        print(
+            f"{args.records:,} records  {stats['segments']} segments  "
+            f"{stats['bytes'] / 1e6:.1f} MB  ({stats['bytes'] / args.records:.0f} bytes/record)"
+        )
+        print(f"record()  {record_seconds / args.records * 1e6:6.2f} us/call on the request path")
+        print(f"flush     {args.records / flush_seconds:,.0f} records/sec (pack, write, fsync, index)")
+        rss_after_write = max_rss_mb()
+        print()
+
+        # ---------- Query ----------
+        week_ago = now - 7 * 86400
+        total = stats["segments"]
+
+        pruned = len(audit.segments(week_ago, now, "rejected", "MEDIUM"))
+        indexed = timed(
+            "MEDIUM rejections, last 7 days",
+            lambda: sum(1 for _ in audit.query(week_ago, now, "rejected", "MEDIUM")),
+            f"({pruned}/{total} segments)",
+        )
+        scanned = timed(
+            "  same, full scan",
+            lambda: sum(
+                1 for name in audit.segments()
+                for r in audit._scan(name)
+                if week_ago <= r[0] <= now and r[2] == 3 and r[3] == 2
+            ),
+            f"({total}/{total} segments)",
+        )
+
+        pan_segments = len(audit.segments(pan=needle))
+        by_pan = timed(
+            f"PAN {needle}, all time",
+            lambda: sum(1 for _ in audit.query(pan=needle)),
+            f"({pan_segments}/{total} segments)",
+        )
+        pan_hash = audit.pan_hash(needle)
+        pan_scanned = timed(
+            "  same, full scan",
+            lambda: sum(1 for name in audit.segments() for r in audit._scan(name) if r[1] == pan_hash),
+            f"({total}/{total} segments)",
+        )
+
+        print()
+        print(f"max RSS {max_rss_mb():.0f} MB (after writing: {rss_after_write:.0f} MB)")
+
+        if indexed != scanned or by_pan != pan_scanned:
+            print("ERROR: indexed and full-scan results differ")
+            sys.exit(1)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
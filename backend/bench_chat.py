@@ -0,0 +1,392 @@
+# bench_chat.py
+"""
+Chat load benchmark: synthetic customer journeys end to end.
+
+Generates seeded journeys (straight approvals, counter offers taken or
+declined, rejections, and typos that trigger re-prompts) and drives them
+concurrently through one of:
+
+- engine: commit_turn() directly, no HTTP framework
+- asgi:   main:app in-process over httpx's ASGI transport
+- http:   main:app on a local uvicorn port (or any running server, --url)
+
+Re-prompt turns call the Master Agent against a local fake OpenAI server
+(--llm off to disable). Every turn carries a turn_id; in a share of
+journeys (--double-submit) the deciding turn is sent twice at once, like
+a double click, and both answers must match. Approved journeys poll
+their sanction letter until it is rendered. Reports per-stage latency (p50/p95/p99),
+throughput, letter render time and process memory growth per stored
+session, and writes everything as JSON (--out) for comparison with an
+earlier run (--baseline).
+
+Usage:
+    python bench_chat.py [--mode asgi] [--journeys 200] [--concurrency 20]
+                         [--out results.json] [--baseline previous.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import string
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from bench_ttfb import AppServer, free_port, percentile
+
+FIRST_NAMES = ["Rahul", "Priya", "Amit", "Sneha", "Vikram", "Anita", "Karan", "Meera"]
+LAST_NAMES = ["Sharma", "Nair", "Patel", "Iyer", "Singh", "Reddy", "Gupta", "Das"]
+
+# Journey mix: (profile, weight)
+PROFILES = [
+    ("approve", 5),
+    ("counter_accept", 2),
+    ("counter_decline", 1),
+    ("reject", 1),
+    ("typos", 1),
+]
+
+TERMINAL_STAGES = ("COMPLETED", "REJECTED")
+LETTER_POLL_SECONDS = 0.05
+LETTER_TIMEOUT_SECONDS = 120
+
+
+# ---------- Journeys ----------
+def random_pan(rng: random.Random) -> str:
+    letters = string.ascii_uppercase
+    return (
+        "".join(rng.choices(letters, k=5))
+        + "".join(rng.choices(string.digits, k=4))
+        + rng.choice(letters)
+    )
+
+
+def make_journey(rng: random.Random) -> Dict[str, Any]:
+    profile = rng.choices([p for p, _ in PROFILES], [w for _, w in PROFILES])[0]
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    income = rng.randrange(40_000, 200_000, 1_000)
+    emi = rng.choice([0, 0, income // 10])
+    tenure = rng.choice([12, 24, 36, 48, 60])
+
+    if profile in ("counter_accept", "counter_decline"):
+        # Over-asks, so the requested offer fails but a smaller one fits.
+        amount = income * 40
+    elif profile == "reject":
+        income = rng.randrange(5_000, 12_000, 500)
+        amount = rng.randrange(500_000, 2_000_000, 50_000)
+    else:
+        amount = income * rng.randrange(2, 8)
+
+    messages = [name, random_pan(rng), str(income), str(emi) if emi else "none",
+                str(amount), str(tenure)]
+
+    if profile == "typos":
+        # One invalid answer in front of a random step.
+        step = rng.randrange(len(messages))
+        messages.insert(step, ["hi", "ABC123", "lots", "some", "a lot", "soon"][step])
+    elif profile == "counter_accept":
+        messages.append("1")
+    elif profile == "counter_decline":
+        messages.append("no")
+
+    return {"profile": profile, "messages": messages}
+
+
+# ---------- Drivers ----------
+class EngineDriver:
+    """
+    Calls commit_turn() directly: the stage engine, validators, eligibility
+    and the session store, without request parsing or the Master Agent.
+    """
+
+    def __init__(self, main):
+        self.main = main
+
+    async def send(self, session_id: str, message: str, turn_id: str) -> Dict[str, Any]:
+        response, _ = await self.main.commit_turn(session_id, message, turn_id)
+        return response.model_dump()
+
+    async def letter_status(self, data: Dict[str, Any]) -> Optional[str]:
+        try:
+            job = await self.main.letter_job_status(data["job_id"])
+        except self.main.HTTPException:
+            return None
+        return job.status
+
+    async def aclose(self) -> None:
+        pass
+
+
+class HTTPDriver:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    async def send(self, session_id: str, message: str, turn_id: str) -> Dict[str, Any]:
+        response = await self.client.post(
+            "/chat", json={"session_id": session_id, "message": message, "turn_id": turn_id}
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def letter_status(self, data: Dict[str, Any]) -> Optional[str]:
+        response = await self.client.get(data["status_url"])
+        return response.json()["status"] if response.status_code == 200 else None
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+async def run_journey(driver, journey: Dict[str, Any], samples, letters, outcomes, errors):
+    session_id = str(uuid.uuid4())
+    stage = "ASK_NAME"
+
+    last = len(journey["messages"]) - 1
+    for i, message in enumerate(journey["messages"]):
+        turn_id = str(uuid.uuid4())
+        start = time.perf_counter()
+        try:
+            if i == last and journey.get("double_submit"):
+                response, again = await asyncio.gather(
+                    driver.send(session_id, message, turn_id),
+                    driver.send(session_id, message, turn_id),
+                )
+                if again != response:
+                    errors.append(f"{journey['profile']} at {stage}: double submit answered twice")
+            else:
+                response = await driver.send(session_id, message, turn_id)
+        except Exception as exc:
+            errors.append(f"{journey['profile']} at {stage}: {type(exc).__name__}: {exc}")
+            return
+        samples[stage].append((time.perf_counter() - start) * 1000)
+
+        stage = response["stage"]
+        if stage in TERMINAL_STAGES:
+            break
+
+    outcomes[f"{journey['profile']} -> {stage}"] += 1
+
+    if response.get("ui_action") != "SANCTION_LETTER_PENDING":
+        return
+
+    start = time.perf_counter()
+    while time.perf_counter() - start < LETTER_TIMEOUT_SECONDS:
+        status = await driver.letter_status(response["data"])
+        if status == "READY":
+            letters.append((time.perf_counter() - start) * 1000)
+            return
+        if status == "FAILED":
+            break
+        await asyncio.sleep(LETTER_POLL_SECONDS)
+    errors.append(f"{journey['profile']}: letter {status or 'not found'}")
+
+
+async def run_load(driver, journeys: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    samples: Dict[str, List[float]] = defaultdict(list)
+    letters: List[float] = []
+    outcomes: Counter = Counter()
+    errors: List[str] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(journey):
+        async with semaphore:
+            await run_journey(driver, journey, samples, letters, outcomes, errors)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(j) for j in journeys))
+    elapsed = time.perf_counter() - start
+    await driver.aclose()
+
+    return {
+        "elapsed": elapsed,
+        "samples": samples,
+        "letters": letters,
+        "outcomes": outcomes,
+        "errors": errors,
+    }
+
+
+async def run_with_worker(main, driver, journeys: List[Dict[str, Any]], concurrency: int):
+    if main is None:
+        return await run_load(driver, journeys, concurrency)
+
+    await main.start_job_worker()
+    try:
+        return await run_load(driver, journeys, concurrency)
+    finally:
+        await main.stop_job_worker()
+
+
+# ---------- Report ----------
+def latency(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+        "max_ms": round(max(values), 3),
+    }
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    def change(new: float, old: float) -> str:
+        return f"{(new - old) / old * 100:+6.1f}%" if old else "     n/a"
+
+    print(f"\nagainst baseline ({baseline['config']['mode']}, "
+          f"{baseline['config']['journeys']} journeys)")
+    old, new = baseline["summary"]["turns_per_sec"], results["summary"]["turns_per_sec"]
+    print(f"{'turns/sec':13s} {old:10,.0f} -> {new:10,.0f}  {change(new, old)}")
+    for stage, stats in results["stages"].items():
+        before = baseline["stages"].get(stage, {})
+        if "p95_ms" in stats and "p95_ms" in before:
+            print(f"{stage:13s} p95 {before['p95_ms']:8.2f} -> {stats['p95_ms']:8.2f} ms  "
+                  f"{change(stats['p95_ms'], before['p95_ms'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mode", choices=["engine", "asgi", "http"], default="asgi")
+    parser.add_argument("--url", help="benchmark a running server instead (http mode)")
+    parser.add_argument("--journeys", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--double-submit", type=float, default=0.1,
+                        help="share of journeys that send their deciding turn twice")
+    parser.add_argument("--llm", choices=["stub", "off"], default="stub")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    journeys = [make_journey(rng) for _ in range(args.journeys)]
+    # Own generator, so the journeys themselves don't depend on the share.
+    double_rng = random.Random(args.seed)
+    for journey in journeys:
+        journey["double_submit"] = double_rng.random() < args.double_submit
+
+    fake = None
+    if args.llm == "stub" and not args.url:
+        from fake_openai import FakeOpenAIServer
+
+        fake = FakeOpenAIServer(free_port(), latency=args.llm_latency).__enter__()
+        os.environ["OPENAI_BASE_URL"] = fake.base_url
+        os.environ["OPENAI_API_KEY"] = "fake"
+        os.environ["MASTER_AGENT_ENABLED"] = "1"
+
+    main_module = None
+    if not args.url:
+        # Keep benchmark letters, jobs and decisions out of the real stores.
+        scratch = tempfile.mkdtemp(prefix="bench_chat_")
+        os.environ.setdefault("LETTER_OUTPUT_DIR", scratch)
+        os.environ.setdefault("LETTER_INDEX_PATH", os.path.join(scratch, "letters.sqlite3"))
+        os.environ.setdefault("JOB_QUEUE_PATH", os.path.join(scratch, "jobs.sqlite3"))
+        os.environ.setdefault("AUDIT_LOG_DIR", os.path.join(scratch, "audit"))
+        import main as main_module
+
+    rss_before = max_rss_mb()
+    server = None
+    if args.mode == "engine":
+        driver = EngineDriver(main_module)
+    elif args.mode == "asgi":
+        driver = HTTPDriver(httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=main_module.app), base_url="http://bench", timeout=60
+        ))
+    else:
+        if not args.url:
+            server = AppServer(free_port()).__enter__()
+        driver = HTTPDriver(httpx.AsyncClient(base_url=args.url or server.base_url, timeout=60))
+
+    # Without a server nothing runs the app's startup, so start its job
+    # worker here.
+    embedded = main_module if args.mode in ("engine", "asgi") else None
+    try:
+        run = asyncio.run(run_with_worker(embedded, driver, journeys, args.concurrency))
+    finally:
+        if server is not None:
+            server.__exit__()
+        if fake is not None:
+            fake.__exit__()
+
+    turns = sum(len(v) for v in run["samples"].values())
+    results = {
+        "config": {
+            "mode": args.mode,
+            "url": args.url,
+            "journeys": args.journeys,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "double_submit": args.double_submit,
+            "llm": args.llm,
+            "llm_latency": args.llm_latency,
+        },
+        "summary": {
+            "turns": turns,
+            "elapsed_s": round(run["elapsed"], 3),
+            "turns_per_sec": round(turns / run["elapsed"], 1),
+            "journeys_per_sec": round(args.journeys / run["elapsed"], 1),
+            "errors": len(run["errors"]),
+        },
+        "stages": {stage: latency(v) for stage, v in run["samples"].items()},
+        "letters": latency(run["letters"]),
+        "outcomes": dict(sorted(run["outcomes"].items())),
+    }
+    if main_module is not None:
+        sessions = main_module.SESSIONS.stats()
+        growth = max_rss_mb() - rss_before
+        results["memory"] = {
+            "sessions": sessions,
+            "max_rss_growth_mb": round(growth, 2),
+            "bytes_per_session": round(growth * 1024 * 1024 / max(sessions["size"], 1)),
+        }
+        results["engine"] = main_module.ENGINE.stats()
+
+    summary = results["summary"]
+    print(
+        f"{args.mode}: {args.journeys:,} journeys  {turns:,} turns  in {summary['elapsed_s']:.1f}s  "
+        f"({summary['turns_per_sec']:,.0f} turns/sec, {summary['journeys_per_sec']:,.1f} "
+        f"journeys/sec, concurrency {args.concurrency})"
+    )
+    for stage, stats in list(results["stages"].items()) + [("letter", results["letters"])]:
+        if stats["count"]:
+            print(
+                f"{stage:13s} {stats['count']:6,}  p50 {stats['p50_ms']:8.2f} ms  "
+                f"p95 {stats['p95_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms"
+            )
+    if "memory" in results:
+        memory = results["memory"]
+        print(f"sessions      {memory['sessions']['size']:,} stored  "
+              f"max RSS +{memory['max_rss_growth_mb']:.1f} MB "
+              f"(~{memory['bytes_per_session']:,} bytes/session)")
+    for outcome, count in results["outcomes"].items():
+        print(f"  {count:6,}  {outcome}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+    for error in run["errors"][:20]:
+        print(error)
+    sys.exit(1 if run["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
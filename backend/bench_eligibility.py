@@ -0,0 +1,68 @@
+# bench_eligibility.py
+"""
+Eligibility micro-benchmark.
+
+Reports the per-call cost of the scalar Credit Worker, the annuity
+factor lookup against computing pow() on every call, the counter-offer
+grid search, and batch throughput of check_eligibility_batch.
+
+Usage:
+    python bench_eligibility.py [--calls 200000] [--rows 1000000]
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+from annuity import annuity_factor, _compute_factor
+from batch_eligibility import check_eligibility_batch
+from offers import find_counter_offers
+from workers import check_eligibility
+
+APPLICANT = {
+    "monthly_income": 85000,
+    "existing_emi": 6000,
+    "requested_amount": 300000,
+    "tenure": 36,
+}
+
+
+def per_call_ns(stmt, calls: int) -> float:
+    return min(timeit.repeat(stmt, number=calls, repeat=3)) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rows = [
+        ("check_eligibility()", lambda: check_eligibility(APPLICANT)),
+        ("annuity_factor() table hit", lambda: annuity_factor(12.0, 36)),
+        ("annuity_factor() LRU hit", lambda: annuity_factor(10.5, 36)),
+        ("pow() per call (no table)", lambda: _compute_factor(12.0, 36)),
+    ]
+    offer_calls = max(args.calls // 100, 1)
+    offer_ns = per_call_ns(lambda: find_counter_offers(60000, 10000, 1500000, 24), offer_calls)
+    for label, stmt in rows:
+        print(f"{label:30s} {per_call_ns(stmt, args.calls):8.0f} ns/call")
+    print(f"{'find_counter_offers() grid':30s} {offer_ns / 1000:8.1f} us/call")
+
+    rng = np.random.default_rng(3)
+    columns = (
+        rng.integers(0, 300_000, args.rows),
+        rng.integers(0, 80_000, args.rows),
+        rng.integers(10_000, 2_000_000, args.rows),
+        rng.integers(1, 85, args.rows),
+    )
+    seconds = min(timeit.repeat(lambda: check_eligibility_batch(*columns), number=1, repeat=3))
+    print(
+        f"{'check_eligibility_batch()':30s} {args.rows / seconds / 1e6:8.1f} M rows/sec "
+        f"({seconds * 1e9 / args.rows:.0f} ns/row)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# bench_kyc.py
+"""
+KYC benchmark: batch verification throughput and cache hits.
+
+Verifies --pans PANs (a share of them repeated, like customers
+restarting a journey) against the fake provider with --latency-ms of
+simulated provider time:
+
+- serially, one verify() at a time, uncached (the old ASK_PAN path)
+- through verify_many() at each --concurrency level, cold cache
+- the same batch again, warm cache
+
+and reports PANs/sec and provider calls. Exits non-zero if a cached
+result differs from the provider's.
+
+Usage:
+    python bench_kyc.py [--pans 400] [--latency-ms 50] [--concurrency 8 32]
+"""
+
+import argparse
+import asyncio
+import random
+import string
+import sys
+import time
+from typing import List
+
+from kyc import CachedVerifier, FakeProviderVerifier
+
+
+def random_pans(count: int, repeat_share: float, seed: int = 5) -> List[str]:
+    rng = random.Random(seed)
+    pans: List[str] = []
+    for _ in range(count):
+        if pans and rng.random() < repeat_share:
+            pans.append(rng.choice(pans))
+        elif rng.random() < 0.05:
+            pans.append("".join(rng.choices(string.ascii_uppercase, k=7)))  # fails the check
+        else:
+            pans.append(
+                "".join(rng.choices(string.ascii_uppercase, k=5))
+                + "".join(rng.choices(string.digits, k=4))
+                + rng.choice(string.ascii_uppercase)
+            )
+    return pans
+
+
+async def run(args) -> bool:
+    pans = random_pans(args.pans, args.repeat_share)
+    print(f"{len(pans)} PANs ({len(set(pans))} distinct), provider latency {args.latency_ms} ms")
+
+    provider = FakeProviderVerifier(args.latency_ms)
+    start = time.perf_counter()
+    expected = [await provider.verify(pan) for pan in pans]
+    elapsed = time.perf_counter() - start
+    print(f"{'serial, uncached':24s} {len(pans) / elapsed:8.1f} PANs/sec  {provider.calls:5} provider calls")
+
+    ok = True
+    for concurrency in args.concurrency:
+        verifier = CachedVerifier(FakeProviderVerifier(args.latency_ms), concurrency=concurrency)
+        for label in ("cold", "warm"):
+            start = time.perf_counter()
+            results = await verifier.verify_many(pans, concurrency=concurrency)
+            elapsed = time.perf_counter() - start
+            stats = verifier.stats()
+            print(
+                f"{f'verify_many x{concurrency}, {label}':24s} {len(pans) / elapsed:8.1f} PANs/sec  "
+                f"{stats['provider_calls']:5} provider calls  "
+                f"{stats['hits']} hits  {stats['coalesced']} coalesced"
+            )
+            ok = ok and results == expected
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pans", type=int, default=400)
+    parser.add_argument("--latency-ms", type=int, default=50)
+    parser.add_argument("--repeat-share", type=float, default=0.2,
+                        help="share of PANs that repeat an earlier one")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32])
+    args = parser.parse_args()
+
+    if not asyncio.run(run(args)):
+        print("ERROR: cached results differ from the provider's")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
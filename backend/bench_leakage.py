@@ -0,0 +1,128 @@
+# bench_leakage.py
+"""
+Leakage filter benchmark and corpus check.
+
+Runs a fixed corpus of harmless replies (which must pass) and leaking
+replies (which must be caught, by the expected phrase) through the
+compiled LeakageFilter, whole and streamed in 1-8 character chunks,
+and through the legacy per-phrase substring check. Reports false
+positives, misses and replies/second. Exits non-zero if the compiled
+filter gets any corpus entry wrong; test_leakage_filter.py runs the same
+corpus check with the test suite.
+
+Usage:
+    python bench_leakage.py [--replies 20000] [--chunk 4]
+"""
+
+import argparse
+import sys
+import time
+from typing import Callable, List
+
+from leakage_filter import FORBIDDEN_PHRASES, LeakageFilter
+
+SAFE_CORPUS = [
+    "Thank you for sharing that. Could you please provide your monthly income?",
+    "We offer rapid approvals for working professionals across India.",
+    "This loan can help you meet your working capital needs.",
+    "Our partner ecosystem lets you repay through any bank account.",
+    "Happy to help! Please share the loan amount you have in mind.",
+    "We're an agency-free lender, so there are no brokers involved.",
+    "Therapists, teachers and capitalists are all welcome to apply.",
+    "Could you confirm the tenure you would like, in months?",
+    "Great, that sounds like a reasonable plan for your family.",
+    "Many of our customers are salaried, self-employed or homemakers.",
+    "A brisk and banded repayment plan keeps things simple.",
+    "We'll guide you step by step; it only takes a few minutes.",
+    "Please share your PAN so we can continue with your application.",
+    "Our toolkit-free process means you only need to chat with us.",
+    "Napier Road branch customers can also apply online.",
+]
+
+LEAKY_CORPUS = [
+    ("Our eligibility engine will decide shortly.", "eligibility"),
+    ("I am an AI agent built to help you.", "agent"),
+    ("The API returned an error, please retry.", "api"),
+    ('{"approved": true}', "{"),
+    ("Your FOIR is within limits.", "foir"),
+    ("Please wait while I verify your PAN.", "verify"),
+    ("You fall in a low RISK  BAND today.", "risk band"),
+    ("Our systems are processing your request.", "system"),
+    ("The credit worker has finished.", "worker"),
+    ("Let me call the next tool.", "tool"),
+    ("Sending your JSON payload now.", "json"),
+    ("Verification is complete.", "verification"),
+    ("Options: [1] 12 months", "["),
+    ("Your api_key has been saved.", "api"),
+    ("You are now chatting with agent_x.", "agent"),
+    ("Running tool_call now.", "tool"),
+]
+
+
+def legacy_blocks(reply: str) -> bool:
+    return any(term in reply.lower() for term in FORBIDDEN_PHRASES)
+
+
+def streamed_rule(leak_filter: LeakageFilter, reply: str, chunk: int):
+    stream = leak_filter.stream()
+    for i in range(0, len(reply), chunk):
+        stream.feed(reply[i:i + chunk])
+    stream.flush()
+    return stream.rule
+
+
+def throughput(check: Callable[[str], object], replies: List[str]) -> float:
+    start = time.perf_counter()
+    for reply in replies:
+        check(reply)
+    return len(replies) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--replies", type=int, default=20_000)
+    parser.add_argument("--chunk", type=int, default=4, help="streamed chunk size (chars)")
+    args = parser.parse_args()
+
+    leak_filter = LeakageFilter()
+    errors = []
+
+    def results(reply: str):
+        yield "scan", leak_filter.scan(reply)
+        # Every chunking exercises a different split of the held-back tail.
+        for chunk in range(1, 9):
+            yield f"stream/{chunk}", streamed_rule(leak_filter, reply, chunk)
+
+    for reply in SAFE_CORPUS:
+        for mode, rule in results(reply):
+            if rule is not None:
+                errors.append(f"false positive ({mode}, {rule!r}): {reply}")
+
+    for reply, expected in LEAKY_CORPUS:
+        for mode, rule in results(reply):
+            if rule != expected:
+                errors.append(f"expected {expected!r}, got {rule!r} ({mode}): {reply}")
+
+    legacy_fp = sum(legacy_blocks(r) for r in SAFE_CORPUS)
+    legacy_missed = sum(not legacy_blocks(r) for r, _ in LEAKY_CORPUS)
+
+    corpus = SAFE_CORPUS + [r for r, _ in LEAKY_CORPUS]
+    replies = (corpus * (args.replies // len(corpus) + 1))[:args.replies]
+
+    print(f"corpus            {len(SAFE_CORPUS)} safe, {len(LEAKY_CORPUS)} leaking")
+    print(f"legacy substring  {legacy_fp} false positives, {legacy_missed} missed")
+    print(f"compiled filter   {len(errors)} errors")
+    for label, check in (
+        ("legacy substring", legacy_blocks),
+        ("compiled scan", leak_filter.scan),
+        (f"streamed ({args.chunk}-char)", lambda r: streamed_rule(leak_filter, r, args.chunk)),
+    ):
+        print(f"{label:17s} {throughput(check, replies):10,.0f} replies/sec")
+
+    for error in errors:
+        print(error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
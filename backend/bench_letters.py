@@ -0,0 +1,129 @@
+# bench_letters.py
+"""
+Sanction letter rendering micro-benchmark.
+
+Compares the legacy build -> re-read -> re-write pipeline against the
+single-pass in-memory render, reporting per-letter latency and bytes
+written to disk. Also reports single-threaded letters/second with the
+template rebuilt per letter versus the cached SanctionLetterTemplate.
+
+Usage:
+    python bench_letters.py [--letters 50]
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from letter_render import SanctionLetterTemplate, render_sanction_pdf
+from workers import get_letter_template, write_atomic
+
+SAMPLE = {
+    "name": "Rahul Sharma",
+    "today": "01 Jan 2026",
+    "amount": 250000,
+    "rate": 12.0,
+    "tenure": 24,
+}
+
+
+# ---------- Pipelines ----------
+def legacy_pipeline(file_path: str) -> int:
+    """
+    Pre-optimisation path: build to disk, parse, re-encrypt, overwrite.
+    Returns bytes written.
+    """
+    from pypdf import PdfReader, PdfWriter
+    from reportlab.platypus import SimpleDocTemplate
+    from reportlab.lib.pagesizes import A4
+
+    doc = SimpleDocTemplate(
+        file_path,
+        pagesize=A4,
+        leftMargin=36,
+        rightMargin=36,
+        topMargin=28,
+        bottomMargin=36,
+    )
+    doc.build(get_letter_template().build_elements(**SAMPLE))
+    written = os.path.getsize(file_path)
+
+    reader = PdfReader(file_path)
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    writer.encrypt("rahul")
+
+    with open(file_path, "wb") as f:
+        writer.write(f)
+
+    return written + os.path.getsize(file_path)
+
+
+def single_pass_pipeline(file_path: str) -> int:
+    pdf_bytes = render_sanction_pdf(get_letter_template().build_elements(**SAMPLE), "rahul")
+    write_atomic(file_path, pdf_bytes)
+    return len(pdf_bytes)
+
+
+def uncached_template_pipeline(file_path: str) -> int:
+    """
+    Rebuilds styles and re-decodes the logo for every letter.
+    """
+    template = SanctionLetterTemplate()
+    pdf_bytes = render_sanction_pdf(template.build_elements(**SAMPLE), "rahul")
+    write_atomic(file_path, pdf_bytes)
+    return len(pdf_bytes)
+
+
+# ---------- Runner ----------
+def measure(pipeline: Callable[[str], int], letters: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    written = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = os.path.join(tmp, "letter.pdf")
+        pipeline(file_path)  # warm-up
+
+        for _ in range(letters):
+            start = time.perf_counter()
+            written += pipeline(file_path)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": statistics.median(latencies),
+        "bytes_per_letter": written / letters,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--letters", type=int, default=50)
+    args = parser.parse_args()
+
+    for label, pipeline in (
+        ("legacy (build/re-read/re-write)", legacy_pipeline),
+        ("single-pass (in-memory encrypt)", single_pass_pipeline),
+    ):
+        r = measure(pipeline, args.letters)
+        print(
+            f"{label:34s} mean {r['mean_ms']:7.2f} ms  "
+            f"p50 {r['p50_ms']:7.2f} ms  "
+            f"written {r['bytes_per_letter']:9,.0f} B/letter"
+        )
+
+    print()
+    for label, pipeline in (
+        ("template rebuilt per letter", uncached_template_pipeline),
+        ("cached template", single_pass_pipeline),
+    ):
+        r = measure(pipeline, args.letters)
+        print(f"{label:34s} {1000 / r['mean_ms']:7.1f} letters/sec (single-threaded)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# bench_llm.py
+"""
+Master agent benchmark against a local fake OpenAI server.
+
+Fires concurrent run_master_agent calls drawn from a small set of
+distinct prompts (as re-prompts at a stage look in production) and
+reports latency, upstream calls, response-cache metrics and the async
+client's peak queue depth / in-flight counts, retries and 429s.
+
+Usage:
+    python bench_llm.py [--requests 200] [--distinct 20] [--latency 0.3]
+    python bench_llm.py --requests 300 --distinct 300 --rate-limit 40
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import time
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def drive(requests: int, distinct: int):
+    import agents
+
+    history = [
+        {"role": "assistant", "content": "What is your monthly income?"},
+    ]
+    latencies = []
+
+    async def one(i: int):
+        start = time.perf_counter()
+        await agents.run_master_agent(
+            session_id=f"bench-{i}",
+            current_stage="ASK_INCOME",
+            history=history,
+            user_message=f"not sure, maybe around {i % distinct} lakhs",
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    peak = {"queued": 0, "in_flight": 0}
+
+    async def sample():
+        while True:
+            stats = agents.llm.stats()
+            for key in peak:
+                peak[key] = max(peak[key], stats[key])
+            await asyncio.sleep(0.01)
+
+    sampler = asyncio.create_task(sample())
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    sampler.cancel()
+
+    client = dict(agents.llm.stats(), peak_queued=peak["queued"], peak_in_flight=peak["in_flight"])
+    return latencies, elapsed, agents.RESPONSE_CACHE.stats(), client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--rate-limit", type=int, default=None,
+                        help="fake upstream requests/sec before answering 429")
+    args = parser.parse_args()
+
+    from fake_openai import FakeOpenAIServer
+
+    port = free_port()
+    with FakeOpenAIServer(port, latency=args.latency, rate_limit=args.rate_limit) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "fake"
+
+        latencies, elapsed, cache, client = asyncio.run(drive(args.requests, args.distinct))
+
+        latencies.sort()
+        print(f"requests          {args.requests} ({args.distinct} distinct prompts)")
+        print(f"upstream calls    {server.requests} served, {server.rejected} rejected (429)")
+        print(f"cache             {cache}")
+        print(f"client            {client}")
+        print(f"throughput        {args.requests / elapsed:.1f} req/sec")
+        print(
+            f"latency ms        p50 {statistics.median(latencies):.1f}  "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# bench_sessions.py
+"""
+Session memory benchmark: bytes per live session, dicts vs records.
+
+Builds --sessions sessions that have each played a typical approved
+journey (name, PAN, income, EMI, amount, tenure, then a revisit of the
+completed stage), in two layouts:
+
+- the old nested dicts: stage string, customer dict and a history list
+  of {"role", "content"} dicts trimmed to the last 12 messages
+- records.Session: __slots__ records, the Stage enum and the History
+  ring buffer
+
+and reports traced bytes per session for each (tracemalloc). User
+messages are fresh strings per session, as they arrive off the wire.
+Exits non-zero if the two layouts disagree on any session's state.
+
+Usage:
+    python bench_sessions.py [--sessions 100000]
+"""
+
+import argparse
+import random
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from records import HISTORY_WINDOW, Session
+
+# Replies as the stage handlers produce them: literals are shared by every
+# session, formatted ones are built per turn.
+REPLIES = [
+    "Thanks {name}. I’ll start your loan application.\n\n"
+    "Please share your PAN number for identity verification.",
+    "✅ Your PAN has been successfully verified.\n\n"
+    "I’ll now gather a few financial details to evaluate your loan eligibility.\n"
+    "What is your monthly income?",
+    "Got it.\n\n"
+    "Do you currently have any existing EMIs? "
+    "If yes, enter the amount. Otherwise, type 'none'.",
+    "Thanks.\n\nHow much loan amount are you looking for?",
+    "Noted.\n\nWhat loan tenure do you prefer? (For example: 12, 24, or 36 months)",
+    "Thanks. I’m now running a quick eligibility and credit assessment "
+    "based on the details you shared.\n\n"
+    "🎉 Congratulations! Your loan of ₹{amount:,} for {tenure} months has been approved.",
+    "Your loan process is already complete.\n\n"
+    "📄 You can download your sanction letter below.",
+]
+STAGES = ["ASK_PAN", "ASK_INCOME", "ASK_EMI", "ASK_AMOUNT", "ASK_TENURE", "COMPLETED", "COMPLETED"]
+
+Journey = Tuple[Dict[str, Any], List[Tuple[str, str, str]]]
+
+
+def journey(rng: random.Random, i: int) -> Journey:
+    """
+    One customer's details and their (message, reply, next stage) turns.
+    """
+    customer = {
+        "name": f"Customer {i:06d}",
+        "pan": f"ABCDE{i % 10000:04d}F",
+        "income": rng.randrange(30, 300) * 1000,
+        "emi": rng.choice((0, 0, 5000, 12000)),
+        "amount": rng.randrange(1, 40) * 50_000,
+    }
+    tenure = rng.choice((12, 24, 36))
+    messages = [
+        customer["name"], customer["pan"], str(customer["income"]),
+        str(customer["emi"]) if customer["emi"] else "none",
+        str(customer["amount"]), str(tenure), "hi",
+    ]
+    replies = [
+        reply.format(name=customer["name"], amount=customer["amount"], tenure=tenure)
+        if "{" in reply else reply
+        for reply in REPLIES
+    ]
+    # Copied, like text decoded from a request body.
+    turns = [(message.encode().decode(), reply, stage) for message, reply, stage in zip(messages, replies, STAGES)]
+    return customer, turns
+
+
+def as_dict(customer: Dict[str, Any], turns) -> Dict[str, Any]:
+    session = {"stage": "ASK_NAME", "customer": {}, "history": []}
+    for (message, reply, stage), field in zip(turns, list(customer) + [None] * 2):
+        session["history"].append({"role": "user", "content": message})
+        if field is not None:
+            session["customer"][field] = customer[field]
+        session["stage"] = stage
+        session["history"].append({"role": "assistant", "content": reply})
+        del session["history"][:-HISTORY_WINDOW]
+    session["version"] = len(turns)
+    return session
+
+
+def as_record(customer: Dict[str, Any], turns) -> Session:
+    session = Session()
+    for (message, reply, stage), field in zip(turns, list(customer) + [None] * 2):
+        session.history.append("user", message)
+        if field is not None:
+            setattr(session.customer, field, customer[field])
+        session.stage = stage
+        session.history.append("assistant", reply)
+    session.version = len(turns)
+    return session
+
+
+def measure(build: Callable, journeys: List[Journey]) -> Tuple[Dict[str, Any], float]:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = {f"s{i}": build(customer, turns) for i, (customer, turns) in enumerate(journeys)}
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return sessions, used / len(journeys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    journeys = [journey(rng, i) for i in range(args.sessions)]
+
+    dicts, dict_bytes = measure(as_dict, journeys)
+    print(f"{'dicts':8s} {dict_bytes:8.0f} bytes/session  {dict_bytes * args.sessions / 1e6:7.1f} MB")
+    records, record_bytes = measure(as_record, journeys)
+    print(f"{'records':8s} {record_bytes:8.0f} bytes/session  {record_bytes * args.sessions / 1e6:7.1f} MB")
+    print(f"{dict_bytes / record_bytes:.1f}x smaller")
+
+    for session_id, old in dicts.items():
+        new = records[session_id]
+        expected = Session.from_dict(old).to_dict()
+        if new.to_dict() != expected or new.history.messages() != old["history"]:
+            print(f"ERROR: {session_id} differs between layouts")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
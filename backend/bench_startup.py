@@ -0,0 +1,166 @@
+# bench_startup.py
+"""
+Cold start benchmark: import profile and time to first useful response.
+
+1. Import profile: `python -X importtime -c "import main"`, reporting the
+   total and the heaviest modules main pulls in.
+2. Cold starts: launches uvicorn main:app in a fresh process, with the
+   background warm-up on and off, and measures the time until it
+   accepts connections, then (after --think seconds, like a customer
+   typing) the latency of
+   - the first ASK_NAME turn
+   - the first Master Agent nudge (re-prompt, against a fake OpenAI)
+   - the first sanction letter (approval to rendered)
+
+Usage:
+    python bench_startup.py [--runs 3] [--think 2] [--top 12]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List, Tuple
+
+import httpx
+
+from bench_ttfb import free_port
+from fake_openai import FakeOpenAIServer
+
+JOURNEY = ["Rahul Sharma", "ABCDE1234F", "80000", "none", "200000", "24"]
+POLL_SECONDS = 0.01
+TIMEOUT_SECONDS = 60
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+# ---------- Import Profile ----------
+def import_profile(env: Dict[str, str]) -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    Returns main's cumulative import time and main's direct imports by
+    cumulative time, both in ms.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    total, modules = 0.0, []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match is None:
+            continue
+        _, cumulative, indent, name = match.groups()
+        if name == "main":
+            total = int(cumulative) / 1000
+        elif len(indent) == 3:
+            modules.append((name, int(cumulative) / 1000))
+    return total, sorted(modules, key=lambda m: m[1], reverse=True)
+
+
+# ---------- Cold Start ----------
+def wait_for(check) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < TIMEOUT_SECONDS:
+        try:
+            if check():
+                return (time.perf_counter() - started) * 1000
+        except httpx.TransportError:
+            pass
+        time.sleep(POLL_SECONDS)
+    raise TimeoutError("server did not respond in time")
+
+
+def timed(call) -> float:
+    started = time.perf_counter()
+    call()
+    return (time.perf_counter() - started) * 1000
+
+
+def cold_start(env: Dict[str, str], think: float) -> Dict[str, float]:
+    # A fresh letter store and job queue, so the journey's letter is
+    # really rendered.
+    scratch = tempfile.mkdtemp(prefix="bench_startup_")
+    env = {
+        **env,
+        "LETTER_OUTPUT_DIR": scratch,
+        "LETTER_INDEX_PATH": os.path.join(scratch, "letters.sqlite3"),
+        "JOB_QUEUE_PATH": os.path.join(scratch, "jobs.sqlite3"),
+        "AUDIT_LOG_DIR": os.path.join(scratch, "audit"),
+    }
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=TIMEOUT_SECONDS) as client:
+            def chat(session_id: str, message: str) -> Dict:
+                response = client.post("/chat", json={"session_id": session_id, "message": message})
+                response.raise_for_status()
+                return response.json()
+
+            timings = {"accepting": wait_for(lambda: client.get("/metrics"))}
+            time.sleep(think)
+
+            # A valid name moves on to ASK_PAN without involving the agent;
+            # "hmm" is a re-prompt, answered with a nudge.
+            session_id = str(uuid.uuid4())
+            timings["first_turn"] = timed(lambda: chat(session_id, JOURNEY[0]))
+            timings["first_nudge"] = timed(lambda: chat(str(uuid.uuid4()), "hmm"))
+
+            for message in JOURNEY[1:-1]:
+                chat(session_id, message)
+            started = time.perf_counter()
+            status_url = chat(session_id, JOURNEY[-1])["data"]["status_url"]
+            wait_for(lambda: client.get(status_url).json()["status"] == "READY")
+            timings["first_letter"] = (time.perf_counter() - started) * 1000
+            return timings
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--think", type=float, default=2.0,
+                        help="seconds between the server accepting and the first turn")
+    parser.add_argument("--top", type=int, default=12, help="modules to list in the import profile")
+    args = parser.parse_args()
+
+    with FakeOpenAIServer(free_port(), latency=0.05) as fake:
+        env = {
+            **os.environ,
+            "OPENAI_BASE_URL": fake.base_url,
+            "OPENAI_API_KEY": "fake",
+            "MASTER_AGENT_ENABLED": "1",
+        }
+
+        total, modules = import_profile(env)
+        print(f"import main      {total:8.1f} ms")
+        for name, ms in modules[:args.top]:
+            print(f"  {name:22s} {ms:8.1f} ms")
+
+        print()
+        for warmup in ("1", "0"):
+            runs = [
+                cold_start({**env, "WARMUP_ENABLED": warmup}, args.think)
+                for _ in range(args.runs)
+            ]
+            label = "warm-up on " if warmup == "1" else "warm-up off"
+            print(
+                f"{label}  " + "  ".join(
+                    f"{name} {statistics.median(r[name] for r in runs):6.0f} ms"
+                    for name in ("accepting", "first_turn", "first_nudge", "first_letter")
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
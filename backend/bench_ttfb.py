@@ -0,0 +1,120 @@
+# bench_ttfb.py
+"""
+Chat time-to-first-byte benchmark: /chat versus /chat/stream.
+
+Runs main:app and a fake OpenAI server (time to first token plus a
+per-token gap) on local ports, sends re-prompt turns that bring in the
+Master Agent, and reports time-to-first-byte and total time per path.
+
+Usage:
+    python bench_ttfb.py [--requests 40] [--concurrency 4]
+                         [--latency 0.3] [--token-latency 0.03]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import threading
+import time
+import uuid
+from typing import Dict, List
+
+import httpx
+import uvicorn
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class AppServer:
+    """
+    Runs main:app on a background thread.
+    """
+
+    def __init__(self, port: int):
+        self.base_url = f"http://127.0.0.1:{port}"
+        self._server = uvicorn.Server(
+            uvicorn.Config("main:app", host="127.0.0.1", port=port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> "AppServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+async def measure(client: httpx.AsyncClient, url: str, i: int) -> Dict[str, float]:
+    # A fresh session at ASK_NAME; a one-word name is a re-prompt. Distinct
+    # messages keep the response cache out of the measurement.
+    body = {"session_id": str(uuid.uuid4()), "message": f"hmm{i}"}
+
+    start = time.perf_counter()
+    ttfb = None
+    async with client.stream("POST", url, json=body) as response:
+        async for _ in response.aiter_raw():
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return {"ttfb": ttfb * 1000, "total": total * 1000}
+
+
+async def run_path(base_url: str, path: str, requests: int, concurrency: int, offset: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        async def one(i: int):
+            async with semaphore:
+                return await measure(client, path, offset + i)
+
+        return await asyncio.gather(*(one(i) for i in range(requests)))
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[max(int(len(values) * q) - 1, 0)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.03)
+    args = parser.parse_args()
+
+    from fake_openai import FakeOpenAIServer
+
+    fake = FakeOpenAIServer(free_port(), latency=args.latency, token_latency=args.token_latency)
+    with fake:
+        os.environ["OPENAI_BASE_URL"] = fake.base_url
+        os.environ["OPENAI_API_KEY"] = "fake"
+        os.environ["MASTER_AGENT_ENABLED"] = "1"
+
+        with AppServer(free_port()) as app:
+            for offset, path in enumerate(("/chat", "/chat/stream")):
+                results = asyncio.run(
+                    run_path(app.base_url, path, args.requests, args.concurrency,
+                             offset * args.requests)
+                )
+                ttfb = [r["ttfb"] for r in results]
+                total = [r["total"] for r in results]
+                print(
+                    f"{path:13s} ttfb p50 {statistics.median(ttfb):7.1f} ms  "
+                    f"p95 {percentile(ttfb, 0.95):7.1f} ms   "
+                    f"total p50 {statistics.median(total):7.1f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# bench_workers.py
+"""
+Multi-worker load test.
+
+Starts `uvicorn main:app --workers N` against a shared SQLite session
+store for each N, drives complete loan journeys at fixed concurrency
+over HTTP and reports throughput per worker count.
+
+Usage:
+    python bench_workers.py [--workers 1 2 4] [--journeys 200] [--concurrency 32]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+JOURNEY = ["{name}", "ABCDE1234F", "85000", "none", "150000", "24"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def journey_name(i: int) -> str:
+    # Names must be alphabetic for the ASK_NAME validator.
+    suffix = ""
+    while True:
+        i, r = divmod(i, 26)
+        suffix += string.ascii_lowercase[r]
+        if i == 0:
+            return f"Bench User{suffix}"
+
+
+async def run_journey(client: httpx.AsyncClient, i: int) -> int:
+    session_id = uuid.uuid4().hex
+    turns = 0
+    for message in JOURNEY:
+        r = await client.post(
+            "/chat",
+            json={"session_id": session_id, "message": message.format(name=journey_name(i))},
+        )
+        r.raise_for_status()
+        turns += 1
+    return turns
+
+
+async def drive(base_url: str, journeys: int, concurrency: int) -> float:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i: int) -> int:
+            async with semaphore:
+                return await run_journey(client, i)
+
+        start = time.perf_counter()
+        turns = sum(await asyncio.gather(*(one(i) for i in range(journeys))))
+        elapsed = time.perf_counter() - start
+
+    return turns / elapsed
+
+
+def wait_ready(base_url: str, proc: subprocess.Popen) -> None:
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            httpx.get(f"{base_url}/docs", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("uvicorn did not start in time")
+
+
+def bench(workers: int, journeys: int, concurrency: int) -> float:
+    with tempfile.TemporaryDirectory() as workdir:
+        # Letters and the session DB go to a scratch directory.
+        shutil.copytree(os.path.join(BACKEND_DIR, "static"), os.path.join(workdir, "static"))
+        port = free_port()
+        env = dict(
+            os.environ,
+            SESSION_BACKEND="sqlite",
+            SESSION_DB_PATH=os.path.join(workdir, "sessions.sqlite3"),
+        )
+        proc = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "main:app",
+                "--app-dir", BACKEND_DIR,
+                "--port", str(port),
+                "--workers", str(workers),
+                "--log-level", "warning",
+            ],
+            cwd=workdir,
+            env=env,
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            wait_ready(base_url, proc)
+            return asyncio.run(drive(base_url, journeys, concurrency))
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--journeys", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in args.workers:
+        throughput = bench(workers, args.journeys, args.concurrency)
+        baseline = baseline or throughput
+        print(
+            f"workers={workers:2d}  {throughput:8.1f} turns/sec  "
+            f"x{throughput / baseline:.2f} vs {args.workers[0]} worker(s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
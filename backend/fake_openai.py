@@ -0,0 +1,188 @@
+# fake_openai.py
+"""
+Local fake of the OpenAI chat completions endpoint.
+
+Used by the benchmarks to exercise agents.py without network access or
+API spend. Point the client at it with OPENAI_BASE_URL.
+
+`latency` is the time to the first token and `token_latency` the gap
+between tokens; streamed requests (stream=true) get SSE chunks in the
+OpenAI format. Optionally enforces a per-second request limit, answering
+429 with Retry-After and x-ratelimit-* headers like the real API.
+
+Usage:
+    python fake_openai.py [--port 9100] [--latency 0.3] [--token-latency 0.02]
+                          [--rate-limit 20]
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=fake python main.py
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import threading
+import time
+import uuid
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+FAKE_REPLY = (
+    "Thank you for sharing that. Could you please provide the requested "
+    "detail so I can continue with your personal loan application?"
+)
+
+
+def create_app(
+    latency: float = 0.3,
+    reply: str = FAKE_REPLY,
+    rate_limit: Optional[int] = None,
+    token_latency: float = 0.0,
+) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+    app.state.latency = latency
+    app.state.token_latency = token_latency
+    app.state.reply = reply
+    app.state.requests = 0
+    app.state.rejected = 0
+
+    window = {"second": 0, "count": 0}
+
+    def rate_limit_headers(now: float) -> dict:
+        reset_ms = max(int((math.floor(now) + 1 - now) * 1000), 1)
+        return {
+            "x-ratelimit-limit-requests": str(rate_limit * 60),
+            "x-ratelimit-remaining-requests": str(max(rate_limit - window["count"], 0)),
+            "x-ratelimit-reset-requests": f"{reset_ms}ms",
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        headers = {}
+
+        if rate_limit:
+            now = time.time()
+            if int(now) != window["second"]:
+                window["second"], window["count"] = int(now), 0
+            window["count"] += 1
+            headers = rate_limit_headers(now)
+
+            if window["count"] > rate_limit:
+                app.state.rejected += 1
+                headers["retry-after-ms"] = headers["x-ratelimit-reset-requests"][:-2]
+                return JSONResponse(
+                    status_code=429,
+                    headers=headers,
+                    content={"error": {"message": "Rate limit reached", "type": "requests"}},
+                )
+
+        app.state.requests += 1
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model", "fake")
+        tokens = [t + " " for t in app.state.reply.split(" ")]
+        tokens[-1] = tokens[-1].rstrip()
+
+        if body.get("stream"):
+            return StreamingResponse(
+                stream_tokens(completion_id, model, tokens),
+                headers=headers,
+                media_type="text/event-stream",
+            )
+
+        await asyncio.sleep(app.state.latency + app.state.token_latency * len(tokens))
+
+        return JSONResponse(headers=headers, content={
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": app.state.reply},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    async def stream_tokens(completion_id: str, model: str, tokens):
+        def chunk(delta, finish_reason=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        await asyncio.sleep(app.state.latency)
+        yield chunk({"role": "assistant", "content": ""})
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(app.state.token_latency)
+            yield chunk({"content": token})
+        yield chunk({}, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests, "rejected": app.state.rejected}
+
+    return app
+
+
+class FakeOpenAIServer:
+    """
+    Runs the fake server on a background thread for in-process benchmarks.
+    """
+
+    def __init__(self, port: int, **options):
+        self.app = create_app(**options)
+        self.port = port
+        self.base_url = f"http://127.0.0.1:{port}/v1"
+        self._server = uvicorn.Server(
+            uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+    @property
+    def requests(self) -> int:
+        return self.app.state.requests
+
+    @property
+    def rejected(self) -> int:
+        return self.app.state.rejected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake OpenAI server")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=None, help="requests per second")
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_app(
+            latency=args.latency,
+            token_latency=args.token_latency,
+            rate_limit=args.rate_limit,
+        ),
+        host="127.0.0.1",
+        port=args.port,
+    )
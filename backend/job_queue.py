@@ -0,0 +1,317 @@
+# job_queue.py
+"""
+Durable Job Queue
+
+SQLite-backed queue for post-approval work (sanction letters, and any
+follow-up that must survive a crash). Shared by every API worker and
+job_worker.py process on one box.
+
+- enqueue() is idempotent per (kind, key): while a job with the same key
+  is queued or running, enqueueing again returns that job
+- Workers claim jobs under a lease; a job whose worker died is claimed
+  again once the lease runs out
+- Failed attempts are retried with exponential backoff, up to
+  JOB_MAX_ATTEMPTS, after which the job is marked FAILED
+- Backpressure: enqueue() raises QueueFull once JOB_QUEUE_MAX jobs of
+  a kind are waiting or running (0 = unbounded)
+- Calls block on SQLite (and on other processes' write locks); async
+  callers run them in a thread. One connection per queue, serialized by
+  a lock.
+
+Usage:
+    python job_queue.py stats
+    python job_queue.py retry <job_id>
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, Optional
+
+# ---------- Config ----------
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "jobs.sqlite3")
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "256"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2"))
+JOB_RETRY_MAX_SECONDS = 300
+JOB_HISTORY_DAYS = int(os.getenv("JOB_HISTORY_DAYS", "7"))
+
+JOB_QUEUED = "QUEUED"
+JOB_RUNNING = "RUNNING"
+JOB_DONE = "DONE"
+JOB_FAILED = "FAILED"
+
+
+class QueueFull(Exception):
+    """Raised when too many jobs of a kind are already waiting."""
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+class JobQueue:
+    def __init__(
+        self,
+        path: str = JOB_QUEUE_PATH,
+        max_backlog: int = JOB_QUEUE_MAX,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        lease_seconds: int = JOB_LEASE_SECONDS,
+        retry_base_seconds: float = JOB_RETRY_BASE_SECONDS,
+    ):
+        self.max_backlog = max_backlog
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.retry_base_seconds = retry_base_seconds
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Survives a process crash; only a power cut can lose the last commits.
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " key TEXT,"
+            " payload TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " max_attempts INTEGER NOT NULL,"
+            " run_after REAL NOT NULL,"
+            " lease_until REAL,"
+            " result TEXT,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        # At most one live job per key; finished ones don't count, so the
+        # same work can be queued again later (e.g. a collected letter).
+        self._conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS jobs_live_key ON jobs (kind, key)"
+            " WHERE status IN ('QUEUED', 'RUNNING')"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after)"
+        )
+        self._conn.commit()
+
+    # ---------- Producers ----------
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        key: Optional[str] = None,
+        job_id: Optional[str] = None,
+    ) -> str:
+        """
+        Queues a job and returns its id (`job_id` if given, for callers
+        that hand the id out before queueing), or the id of the live job
+        that already has this key.
+        """
+        with self._lock:
+            if key is not None:
+                live = self._live(kind, key)
+                if live is not None:
+                    return live
+
+            if self.full(kind):
+                raise QueueFull(f"{self.max_backlog} {kind} jobs already queued")
+
+            job_id = job_id or new_job_id()
+            now = time.time()
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs"
+                " (id, kind, key, payload, status, max_attempts, run_after, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, key, json.dumps(payload), JOB_QUEUED,
+                 self.max_attempts, now, now, now),
+            )
+            self._conn.commit()
+
+            if cursor.rowcount == 0:
+                # Another process queued the same key in between.
+                return self._live(kind, key)
+            return job_id
+
+    def _live(self, kind: str, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE kind = ? AND key = ? AND status IN (?, ?)",
+                (kind, key, JOB_QUEUED, JOB_RUNNING),
+            ).fetchone()
+        return row["id"] if row else None
+
+    def full(self, kind: str) -> bool:
+        return bool(self.max_backlog) and self.backlog(kind) >= self.max_backlog
+
+    def backlog(self, kind: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE kind = ? AND status IN (?, ?)",
+                (kind, JOB_QUEUED, JOB_RUNNING),
+            ).fetchone()[0]
+
+    # ---------- Consumers ----------
+    def claim(self, kinds: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """
+        Leases the next due job of one of `kinds`, or returns None. Jobs
+        whose lease ran out (their worker died) are due again.
+        """
+        kinds = list(kinds)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?, updated_at = ?"
+                " WHERE id = ("
+                "  SELECT id FROM jobs"
+                f" WHERE kind IN ({', '.join('?' * len(kinds))})"
+                "  AND ((status = ? AND run_after <= ?)"
+                "   OR (status = ? AND lease_until < ? AND attempts < max_attempts))"
+                "  ORDER BY run_after LIMIT 1)"
+                " RETURNING id, kind, key, payload, attempts, created_at",
+                (JOB_RUNNING, now + self.lease_seconds, now, *kinds,
+                 JOB_QUEUED, now, JOB_RUNNING, now),
+            ).fetchone()
+            self._conn.commit()
+
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def complete(self, job: Dict[str, Any], result: Dict[str, Any]) -> None:
+        self._finish(job, JOB_DONE, result=json.dumps(result))
+
+    def fail(self, job: Dict[str, Any], error: str) -> bool:
+        """
+        Records a failed attempt. Returns True if the job will be retried.
+        """
+        if job["attempts"] >= self.max_attempts:
+            self._finish(job, JOB_FAILED, error=error)
+            return False
+
+        delay = min(
+            self.retry_base_seconds * 2 ** (job["attempts"] - 1), JOB_RETRY_MAX_SECONDS
+        )
+        self._finish(job, JOB_QUEUED, error=error, run_after=time.time() + delay)
+        return True
+
+    def release(self, job: Dict[str, Any]) -> None:
+        """
+        Hands back a job its worker is abandoning (shutdown), due again
+        right away and without using up an attempt.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts - 1, lease_until = NULL,"
+                " run_after = ?, updated_at = ?"
+                " WHERE id = ? AND status = ? AND attempts = ?",
+                (JOB_QUEUED, now, now, job["id"], JOB_RUNNING, job["attempts"]),
+            )
+            self._conn.commit()
+
+    def _finish(
+        self,
+        job: Dict[str, Any],
+        status: str,
+        result: Optional[str] = None,
+        error: Optional[str] = None,
+        run_after: Optional[float] = None,
+    ) -> None:
+        now = time.time()
+        # Only the attempt that holds the lease may settle the job.
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, lease_until = NULL,"
+                " run_after = COALESCE(?, run_after), updated_at = ?"
+                " WHERE id = ? AND status = ? AND attempts = ?",
+                (status, result, error, run_after, now, job["id"], JOB_RUNNING, job["attempts"]),
+            )
+            self._conn.commit()
+
+    def sweep(self, history_days: int = JOB_HISTORY_DAYS) -> Dict[str, int]:
+        """
+        Fails jobs that ran out of lease on their last attempt and drops
+        finished jobs older than `history_days`.
+        """
+        now = time.time()
+        with self._lock:
+            abandoned = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = 'worker lost', lease_until = NULL, updated_at = ?"
+                " WHERE status = ? AND lease_until < ? AND attempts >= max_attempts",
+                (JOB_FAILED, now, JOB_RUNNING, now),
+            ).rowcount
+            purged = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (JOB_DONE, JOB_FAILED, now - history_days * 86400),
+            ).rowcount
+            self._conn.commit()
+        return {"abandoned": abandoned, "purged": purged}
+
+    # ---------- Inspection ----------
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, key, status, attempts, result, error, created_at, updated_at"
+                " FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def retry(self, job_id: str, from_status: str = JOB_FAILED) -> bool:
+        """
+        Puts a FAILED job (or, with from_status=JOB_DONE, a finished one
+        whose output has since been lost) back in the queue with fresh
+        attempts.
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = 0, run_after = ?, updated_at = ?"
+                    " WHERE id = ? AND status = ?",
+                    (JOB_QUEUED, now, now, job_id, from_status),
+                )
+            except sqlite3.IntegrityError:
+                # The same work has been queued again since.
+                return False
+            finally:
+                self._conn.commit()
+        return cursor.rowcount == 1
+
+    def stats(self) -> Dict[str, int]:
+        counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_DONE: 0, JOB_FAILED: 0}
+        with self._lock:
+            for status, count in self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ):
+                counts[status] = count
+        return {status.lower(): count for status, count in counts.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Job queue maintenance")
+    parser.add_argument("command", choices=["stats", "retry", "sweep"])
+    parser.add_argument("job_id", nargs="?")
+    args = parser.parse_args()
+
+    queue = JobQueue()
+    if args.command == "stats":
+        print(queue.stats())
+    elif args.command == "sweep":
+        print(queue.sweep())
+    else:
+        print("requeued" if args.job_id and queue.retry(args.job_id) else "not a failed job")
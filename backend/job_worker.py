@@ -0,0 +1,249 @@
+# job_worker.py
+"""
+Job Worker
+
+Consumes the durable job queue (job_queue.py): post-approval work such
+as sanction letter rendering, kept out of the /chat request.
+
+- Runs up to --concurrency jobs at once; CPU-bound steps (PDF rendering)
+  go to a process pool of the same size
+- A failed job is retried with backoff (see job_queue.py); a job
+  interrupted by a crash is picked up again when its lease runs out
+- If a render process dies, the pool is rebuilt for the next job and
+  the attempt fails like any other (counted, with backoff)
+- SIGHUP (or reload_template()) recycles the render processes so they
+  pick up new branding assets
+- Embedded in the API process by default; with JOB_WORKER_EMBEDDED=0
+  the API only queues jobs and one or more of these consume them
+
+Usage:
+    python job_worker.py [--concurrency 2]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from job_queue import JobQueue, JOB_DONE, JOB_FAILED, JOB_QUEUED
+from letter_store import LetterStore
+from workers import generate_sanction_letter, get_letter_template
+
+logger = logging.getLogger(__name__)
+
+# ---------- Config ----------
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "0.5"))
+JOB_SWEEP_SECONDS = 600
+
+SANCTION_LETTER = "sanction_letter"
+
+
+# ---------- Handlers ----------
+async def sanction_letter(worker: "JobWorker", payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Renders the letter into the store and indexes it. Rendering a key
+    that is already on disk is a no-op, so a retried job is safe.
+    """
+    key = payload["letter_key"]
+    store = worker.letter_store
+    await worker.run_in_pool(
+        generate_sanction_letter,
+        {
+            "customer_name": payload["customer_name"],
+            "approved_amount": payload["approved_amount"],
+            "interest_rate": payload["interest_rate"],
+            "tenure_months": payload["tenure_months"],
+            "sanction_date": payload["sanction_date"],
+            "output_path": store.path_for(key),
+            # Links are signed when the letter is fetched, not here.
+            "letter_url": "",
+        },
+    )
+    await asyncio.to_thread(store.record, key)
+    return {"letter_key": key}
+
+
+HANDLERS: Dict[str, Callable[["JobWorker", Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+    SANCTION_LETTER: sanction_letter,
+}
+
+
+# ---------- Worker ----------
+class JobWorker:
+    def __init__(
+        self,
+        queue: Optional[JobQueue] = None,
+        letter_store: Optional[LetterStore] = None,
+        concurrency: int = JOB_WORKER_CONCURRENCY,
+        poll_seconds: float = JOB_POLL_SECONDS,
+    ):
+        self.queue = queue or JobQueue()
+        self.letter_store = letter_store or LetterStore()
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks = set()
+        self._observers: List[Callable[[Dict[str, Any], str, float], None]] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> int:
+        return len(self._tasks)
+
+    def observe(self, observer: Callable[[Dict[str, Any], str, float], None]) -> None:
+        """
+        Registers `observer(job, status, seconds)`, called after every
+        attempt with the job's new status and its age in seconds.
+        """
+        self._observers.append(observer)
+
+    # ---------- Process Pool ----------
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Each process compiles the letter template once on start.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.concurrency,
+                initializer=get_letter_template,
+            )
+        return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        # Jobs already running in it still finish; new ones get a fresh pool.
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False)
+
+    async def run_in_pool(self, fn: Callable, *args: Any) -> Any:
+        executor = self._get_executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise
+
+    def reload_template(self) -> None:
+        """
+        Recycles the render processes so they rebuild the letter template
+        from the current branding assets. Running renders still complete.
+        This process never builds the template (ReportLab stays unloaded).
+        """
+        if self._executor is not None:
+            self._discard_executor(self._executor)
+
+    async def warm_up(self) -> None:
+        """
+        Starts every pool process ahead of the first job.
+        """
+        # Submitted together, so no process is idle yet and each task
+        # starts a process of its own.
+        await asyncio.gather(*(self.run_in_pool(os.getpid) for _ in range(self.concurrency)))
+
+    # ---------- Consuming ----------
+    def notify(self) -> None:
+        """
+        Wakes the loop right away instead of at the next poll (for jobs
+        queued by this process).
+        """
+        if self._wake is not None:
+            self._wake.set()
+
+    async def run(self) -> None:
+        self._wake = asyncio.Event()
+        last_sweep = 0.0
+        logger.info("Job worker %s consuming %s", self.name, ", ".join(HANDLERS))
+
+        while not self._stopping:
+            # Queue calls wait on SQLite; the API's event loop may be ours.
+            if time.monotonic() - last_sweep > JOB_SWEEP_SECONDS:
+                await asyncio.to_thread(self.queue.sweep)
+                last_sweep = time.monotonic()
+
+            while len(self._tasks) < self.concurrency:
+                job = await asyncio.to_thread(self.queue.claim, HANDLERS)
+                if job is None:
+                    break
+                task = asyncio.create_task(self._execute(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._finished)
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+        # Unfinished jobs go back to the queue for the next worker.
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        # A slot freed up; claim the next job without waiting for a poll.
+        self.notify()
+
+    async def _execute(self, job: Dict[str, Any]) -> None:
+        try:
+            result = await HANDLERS[job["kind"]](self, job["payload"])
+        except asyncio.CancelledError:
+            self.queue.release(job)
+            raise
+        except BrokenProcessPool:
+            # A render process died. The next attempt gets a new pool, and
+            # the attempt counts, so an input that kills every renderer
+            # backs off and ends FAILED like any other failure.
+            logger.warning("Render pool broke during job %s (attempt %d)", job["id"], job["attempts"])
+            retrying = await asyncio.to_thread(self.queue.fail, job, "render process died")
+            status = JOB_QUEUED if retrying else JOB_FAILED
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed on attempt %d", job["id"], job["kind"], job["attempts"])
+            retrying = await asyncio.to_thread(
+                self.queue.fail, job, f"{type(exc).__name__}: {exc}"
+            )
+            status = JOB_QUEUED if retrying else JOB_FAILED
+        else:
+            await asyncio.to_thread(self.queue.complete, job, result)
+            status = JOB_DONE
+
+        for observer in self._observers:
+            observer(job, status, time.time() - job["created_at"])
+
+    def stop(self) -> None:
+        """
+        Asks run() to return. Jobs still running are handed back to the
+        queue for another worker.
+        """
+        self._stopping = True
+        self.notify()
+
+
+async def serve(concurrency: int) -> None:
+    worker = JobWorker(concurrency=concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    loop.add_signal_handler(signal.SIGHUP, worker.reload_template)
+    await worker.run()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Consume the post-approval job queue")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.concurrency))
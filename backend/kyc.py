@@ -0,0 +1,200 @@
+# kyc.py
+"""
+KYC Verification
+
+PAN verification behind a pluggable provider and a result cache.
+
+- KYCVerifier interface: verify(pan) -> {"verified": bool, "reason": str}
+- Providers: "local" (the KYC worker's format check, instant) and
+  "fake" (the same, behind simulated provider latency, for load tests)
+- CachedVerifier keeps positive and negative results in a bounded LRU
+  with TTLs, keyed on a PAN hash; concurrent checks of one PAN share a
+  single provider call, and provider calls are capped at KYC_CONCURRENCY
+- verify_many() fans a batch (bulk onboarding) out at that cap
+
+Provider errors propagate and are never cached.
+"""
+
+import asyncio
+import hashlib
+import os
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from single_flight import SingleFlight
+from workers import verify_customer
+
+# ---------- Config ----------
+KYC_PROVIDER = os.getenv("KYC_PROVIDER", "local")
+KYC_FAKE_LATENCY_MS = int(os.getenv("KYC_FAKE_LATENCY_MS", "300"))
+KYC_CONCURRENCY = int(os.getenv("KYC_CONCURRENCY", "8"))
+KYC_CACHE_SIZE = int(os.getenv("KYC_CACHE_SIZE", "10000"))
+KYC_CACHE_TTL_SECONDS = int(os.getenv("KYC_CACHE_TTL_SECONDS", "86400"))
+# Failures are cached briefly: long enough to absorb a customer retyping
+# the same PAN, short enough that a fix at the provider shows up soon.
+KYC_NEGATIVE_TTL_SECONDS = int(os.getenv("KYC_NEGATIVE_TTL_SECONDS", "600"))
+
+
+# ---------- Interface ----------
+class KYCVerifier:
+    """
+    Base interface. verify() returns the provider's answer and raises only
+    when the provider could not give one.
+    """
+
+    async def verify(self, pan: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def verify_many(
+        self,
+        pans: Iterable[str],
+        concurrency: int = KYC_CONCURRENCY,
+    ) -> List[Dict[str, Any]]:
+        """
+        Verifies a batch, at most `concurrency` at a time. Results are in
+        input order; a PAN the provider failed on gets verified=False.
+        """
+        pans = list(pans)
+        results: List[Dict[str, Any]] = [{}] * len(pans)
+        queue = iter(enumerate(pans))
+
+        async def worker():
+            for i, pan in queue:
+                try:
+                    results[i] = await self.verify(pan)
+                except Exception as exc:
+                    results[i] = {"verified": False, "reason": f"Verification unavailable: {exc}"}
+
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(pans)))))
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+# ---------- Providers ----------
+class LocalVerifier(KYCVerifier):
+    async def verify(self, pan: str) -> Dict[str, Any]:
+        return verify_customer({"pan": pan})
+
+
+class FakeProviderVerifier(LocalVerifier):
+    """
+    Stands in for an external KYC API: the local check after
+    `latency_ms` of simulated network and provider time.
+    """
+
+    def __init__(self, latency_ms: int = KYC_FAKE_LATENCY_MS):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    async def verify(self, pan: str) -> Dict[str, Any]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return await super().verify(pan)
+
+    def stats(self) -> Dict[str, int]:
+        return {"provider_calls": self.calls}
+
+
+# ---------- Cache ----------
+class CachedVerifier(KYCVerifier):
+    def __init__(
+        self,
+        provider: KYCVerifier,
+        max_entries: int = KYC_CACHE_SIZE,
+        ttl_seconds: int = KYC_CACHE_TTL_SECONDS,
+        negative_ttl_seconds: int = KYC_NEGATIVE_TTL_SECONDS,
+        concurrency: int = KYC_CONCURRENCY,
+    ):
+        self.provider = provider
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+
+        # Keyed so the cache never holds a PAN, or a plain hash of one.
+        self._key = secrets.token_bytes(16)
+        self._entries: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._flights = SingleFlight()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._in_provider = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def coalesced(self) -> int:
+        return self._flights.coalesced
+
+    def _cache_key(self, pan: str) -> bytes:
+        return hashlib.blake2b(pan.strip().upper().encode("utf-8"), digest_size=16, key=self._key).digest()
+
+    def _get(self, key: bytes):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        result, expires_at = entry
+        if time.monotonic() > expires_at:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return result
+
+    def _put(self, key: bytes, result: Dict[str, Any]) -> None:
+        ttl = self.ttl_seconds if result.get("verified") else self.negative_ttl_seconds
+        self._entries[key] = (result, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def verify(self, pan: str) -> Dict[str, Any]:
+        key = self._cache_key(pan)
+        cached = self._get(key)
+        if cached is not None:
+            self.hits += 1
+            return dict(cached)
+
+        async def miss() -> Dict[str, Any]:
+            self.misses += 1
+            async with self._slots:
+                self._in_provider += 1
+                try:
+                    result = await self.provider.verify(pan)
+                finally:
+                    self._in_provider -= 1
+            self._put(key, result)
+            return result
+
+        return dict(await self._flights.run(key, miss))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "inflight": len(self._flights),
+            "in_provider": self._in_provider,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            **self.provider.stats(),
+        }
+
+
+# ---------- Factory ----------
+def create_verifier(provider: str = KYC_PROVIDER) -> KYCVerifier:
+    if provider == "local":
+        verifier = LocalVerifier()
+    elif provider == "fake":
+        verifier = FakeProviderVerifier()
+    else:
+        raise ValueError(f"Unknown KYC_PROVIDER: {provider!r}")
+
+    if KYC_CACHE_SIZE <= 0:
+        return verifier
+    return CachedVerifier(verifier)
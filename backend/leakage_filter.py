@@ -0,0 +1,164 @@
+# leakage_filter.py
+"""
+Leakage Filter
+
+Keeps internal vocabulary out of customer-facing agent replies:
+
+- The forbidden phrases compile once into a single word-boundary-aware
+  regex, so each reply is lowercased once and scanned in one pass
+  ("api" blocks "API", "APIs" and "api_key" but not "rapid" or "capital")
+- Streamed replies are checked incrementally (LeakageStream), holding
+  back only the tail that could still grow into a match
+- Reports which phrase fired, with per-phrase counters for metrics
+"""
+
+import re
+from collections import Counter
+from typing import Dict, Optional, Sequence
+
+FORBIDDEN_PHRASES = (
+    "{", "}", "[", "]",
+    "verify", "verification",
+    "eligibility", "engine",
+    "tool", "agent", "worker",
+    "json", "api", "system",
+    "foir", "risk band",
+)
+
+# Spacing allowed between the words of a multi-word phrase. Bounded so
+# that a match has a maximum length, which streaming relies on.
+MAX_PHRASE_GAP = 3
+
+
+def _phrase_pattern(phrase: str) -> str:
+    words = [re.escape(w) for w in phrase.lower().split()]
+    return rf"\s{{1,{MAX_PHRASE_GAP}}}".join(words)
+
+
+def compile_phrases(phrases: Sequence[str], flags: int = 0) -> "re.Pattern[str]":
+    """
+    Symbols match anywhere; words only as whole words, plural allowed
+    ("agents", "APIs") but not longer words ("agency"). Word edges are
+    letters and digits only, not \\b: "_" is a word character to \\b, so
+    "api_key" and "agent_x" would slip through. A flat, non-capturing
+    alternation keeps the regex engine on its fast path.
+    """
+    symbols = [re.escape(p) for p in phrases if not re.search(r"\w", p)]
+    words = sorted(
+        (_phrase_pattern(p) for p in phrases if re.search(r"\w", p)),
+        key=len,
+        reverse=True,
+    )
+
+    alternatives = []
+    if symbols:
+        alternatives.append("[" + "".join(symbols) + "]")
+    if words:
+        alternatives.append(
+            r"(?<![A-Za-z0-9])(?:" + "|".join(words) + r")s?(?![A-Za-z0-9])"
+        )
+    return re.compile("|".join(alternatives), flags)
+
+
+class LeakageFilter:
+    def __init__(self, phrases: Sequence[str] = FORBIDDEN_PHRASES):
+        self.phrases = tuple(phrases)
+        # scan() lowercases once and uses the case-sensitive pattern (the
+        # faster one); streams keep original offsets via IGNORECASE.
+        self.pattern = compile_phrases(self.phrases)
+        self.stream_pattern = compile_phrases(self.phrases, re.IGNORECASE)
+        self._by_text = {" ".join(p.lower().split()): p for p in self.phrases}
+        # Longest possible match: phrase + plural "s" + widest gaps.
+        self.max_match = max(
+            len(p) + 1 + (MAX_PHRASE_GAP - 1) * p.count(" ")
+            for p in self.phrases
+        )
+
+        self.scanned = 0
+        self.fired: Counter = Counter()
+
+    def scan(self, text: str) -> Optional[str]:
+        """
+        Returns the first forbidden phrase found in `text`, or None.
+        """
+        self.scanned += 1
+        match = self.pattern.search(text.lower())
+        if match is None:
+            return None
+        return self._fire(match)
+
+    def stream(self) -> "LeakageStream":
+        self.scanned += 1
+        return LeakageStream(self)
+
+    def _fire(self, match: "re.Match[str]") -> str:
+        text = " ".join(match.group().lower().split())
+        phrase = self._by_text.get(text) or self._by_text[text[:-1]]
+        self.fired[phrase] += 1
+        return phrase
+
+    def stats(self) -> Dict[str, int]:
+        return {"scanned": self.scanned, **{f"fired:{p}": n for p, n in self.fired.items()}}
+
+
+class LeakageStream:
+    """
+    Incremental scan of one streamed reply. feed() returns the text that
+    is now known to be safe to show; a match touching the end of what has
+    arrived is deferred until the next chunk (or flush) settles its word
+    boundary. Once tripped, `rule` names the phrase and nothing more is
+    released.
+    """
+
+    def __init__(self, leak_filter: LeakageFilter):
+        self._filter = leak_filter
+        self._pending = ""
+        # Last released character: searches start after it, but it still
+        # decides whether a word boundary opens the pending text.
+        self._context = ""
+        self.rule: Optional[str] = None
+
+    @property
+    def tripped(self) -> bool:
+        return self.rule is not None
+
+    def feed(self, chunk: str) -> str:
+        if self.tripped:
+            return ""
+
+        self._pending += chunk
+        window = self._context + self._pending
+        hold = len(window) - self._filter.max_match
+
+        match = self._filter.stream_pattern.search(window, len(self._context))
+        if match is not None:
+            if match.end() < len(window):
+                self._trip(match)
+                return ""
+            hold = min(hold, match.start())
+
+        cut = hold - len(self._context)
+        if cut <= 0:
+            return ""
+        safe, self._pending = self._pending[:cut], self._pending[cut:]
+        self._context = safe[-1]
+        return safe
+
+    def flush(self) -> str:
+        if self.tripped:
+            return ""
+
+        # End of stream is a word boundary, so deferred matches are final.
+        match = self._filter.stream_pattern.search(
+            self._context + self._pending, len(self._context)
+        )
+        if match is not None:
+            self._trip(match)
+            return ""
+
+        safe, self._pending = self._pending, ""
+        return safe
+
+    def _trip(self, match: "re.Match[str]") -> None:
+        self.rule = self._filter._fire(match)
+        self._pending = ""
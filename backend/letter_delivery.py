@@ -0,0 +1,252 @@
+# letter_delivery.py
+"""
+Sanction Letter Delivery
+
+Builds download responses for stored letters:
+
+- Strong ETags with If-None-Match -> 304
+- Single byte ranges (Range / If-Range) -> 206, unsatisfiable -> 416
+- Disk hits go through FileResponse, which hands the file to the server
+  for zero-copy sending when it supports the ASGI pathsend extension
+- Letters downloaded in the last LETTER_HOT_CACHE_SECONDS are served
+  from memory (LetterHotCache), so repeat downloads skip the disk
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from starlette.background import BackgroundTask
+
+# ---------- Config ----------
+LETTER_HOT_CACHE_MB = int(os.getenv("LETTER_HOT_CACHE_MB", "64"))
+LETTER_HOT_CACHE_SECONDS = int(os.getenv("LETTER_HOT_CACHE_SECONDS", "300"))
+LETTER_HOT_CACHE_MAX_ENTRY_KB = int(os.getenv("LETTER_HOT_CACHE_MAX_ENTRY_KB", "1024"))
+
+DOWNLOAD_NAME = "sanction_letter.pdf"
+CONTENT_DISPOSITION = f'inline; filename="{DOWNLOAD_NAME}"'
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class CachedLetter:
+    __slots__ = ("body", "etag", "last_modified", "expires_at")
+
+    def __init__(self, body: bytes, etag: str, last_modified: str, expires_at: float):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+
+# ---------- Hot Cache ----------
+class LetterHotCache:
+    """
+    Byte-budgeted LRU of recently downloaded letters. Entries expire
+    LETTER_HOT_CACHE_SECONDS after they were loaded.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = LETTER_HOT_CACHE_MB * 1024 * 1024,
+        ttl_seconds: int = LETTER_HOT_CACHE_SECONDS,
+        max_entry_bytes: int = LETTER_HOT_CACHE_MAX_ENTRY_KB * 1024,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_entry_bytes = max_entry_bytes
+
+        self._entries: "OrderedDict[str, CachedLetter]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl_seconds > 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str) -> Optional[CachedLetter]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < time.monotonic():
+            self._drop(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def read(self, path: str) -> Optional[bytes]:
+        """
+        Reads a letter small enough to cache, or None. Blocking; call it
+        off the event loop.
+        """
+        try:
+            if os.path.getsize(path) > self.max_entry_bytes:
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # Collected between the response and now.
+            return None
+
+    def put(self, key: str, body: bytes, etag: str, last_modified: str) -> None:
+        if not self.enabled or key in self._entries:
+            return
+
+        self._entries[key] = CachedLetter(
+            body, etag, last_modified, time.monotonic() + self.ttl_seconds
+        )
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        if key in self._entries:
+            self._drop(key)
+
+    def _drop(self, key: str) -> None:
+        self._bytes -= len(self._entries.pop(key).body)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# ---------- Responses ----------
+def stat_etag(key: str, stat_result: os.stat_result) -> str:
+    # A key's content only changes if it is collected and rendered again,
+    # which gives the file a new mtime.
+    return f'"{key[:16]}-{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Returns the inclusive (start, end) of a single byte range, None to
+    serve the whole file (absent, malformed or multi-range headers), or
+    raises ValueError when the range cannot be satisfied.
+    """
+    match = _RANGE.match(header.strip())
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    return if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]
+
+
+def cached_letter_response(
+    request: Request,
+    entry: CachedLetter,
+    headers: Dict[str, str],
+) -> Response:
+    headers = {
+        **headers,
+        "etag": entry.etag,
+        "last-modified": entry.last_modified,
+        "accept-ranges": "bytes",
+        "content-disposition": CONTENT_DISPOSITION,
+    }
+    if not_modified(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+
+    body = entry.body
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range in (entry.etag, entry.last_modified)):
+        try:
+            byte_range = parse_range(range_header, len(body))
+        except ValueError:
+            return Response(status_code=416, headers={"content-range": f"bytes */{len(body)}"})
+
+        if byte_range is not None:
+            start, end = byte_range
+            headers["content-range"] = f"bytes {start}-{end}/{len(body)}"
+            return Response(
+                body[start:end + 1],
+                status_code=206,
+                headers=headers,
+                media_type="application/pdf",
+            )
+
+    return Response(body, headers=headers, media_type="application/pdf")
+
+
+def file_letter_response(
+    request: Request,
+    key: str,
+    path: str,
+    headers: Dict[str, str],
+    hot_cache: LetterHotCache,
+) -> Response:
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        # Collected after the store lookup.
+        raise HTTPException(status_code=404, detail="Letter no longer available")
+    etag = stat_etag(key, stat_result)
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    headers = {**headers, "etag": etag, "last-modified": last_modified}
+
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    response = FileResponse(
+        path,
+        headers={**headers, "content-disposition": CONTENT_DISPOSITION},
+        media_type="application/pdf",
+        stat_result=stat_result,
+    )
+    if hot_cache.enabled:
+        response.background = BackgroundTask(
+            warm_hot_cache, hot_cache, key, path, etag, last_modified
+        )
+    return response
+
+
+async def warm_hot_cache(
+    hot_cache: LetterHotCache, key: str, path: str, etag: str, last_modified: str
+) -> None:
+    # Runs after the response. The file is read in a worker thread; the
+    # cache itself is only touched on the event loop, so it needs no lock.
+    if key in hot_cache:
+        return
+    body = await asyncio.to_thread(hot_cache.read, path)
+    if body is not None:
+        hot_cache.put(key, body, etag, last_modified)
@@ -0,0 +1,222 @@
+# letter_render.py
+"""
+Sanction Letter Rendering
+
+The ReportLab half of the Document Worker: the precompiled letter
+template and the encrypted PDF render. Kept out of workers.py so that
+importing the workers (as the API does) never loads ReportLab; it is
+imported by the render processes on first use.
+"""
+
+from io import BytesIO
+import os
+from typing import Any, List
+
+from reportlab.platypus import (
+    SimpleDocTemplate,
+    Paragraph,
+    Table,
+    TableStyle,
+    Spacer,
+    Flowable,
+    HRFlowable,
+)
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.lib import colors
+from reportlab.lib.pdfencrypt import StandardEncryption
+
+from workers import NBFC_NAME, LOGO_PATH, LOGO_WIDTH, LOGO_HEIGHT, LOGO_RESOLUTION
+
+
+class LogoFlowable(Flowable):
+    """
+    Draws a pre-decoded logo, so the PNG is never re-read per letter.
+    """
+
+    def __init__(self, image: ImageReader, width: float, height: float):
+        Flowable.__init__(self)
+        self.image = image
+        self.width = width
+        self.height = height
+        self.hAlign = "CENTER"
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.drawImage(self.image, 0, 0, self.width, self.height)
+
+
+class SanctionLetterTemplate:
+    """
+    Precompiled sanction letter layout.
+
+    The stylesheet, decoded logo, table styles and static text blocks
+    are built once; build_elements() only fills in the borrower fields.
+    Call reload() when branding assets change.
+    """
+
+    def __init__(self, logo_path: str = LOGO_PATH):
+        self.logo_path = logo_path
+        self.reload()
+
+    def reload(self) -> None:
+        # ---------- STYLES ----------
+        styles = getSampleStyleSheet()
+
+        styles.add(
+            ParagraphStyle(
+                name="TitleCenter",
+                alignment=TA_CENTER,
+                fontSize=18,
+                leading=22,
+                fontName="Helvetica-Bold",
+                spaceAfter=8,
+            )
+        )
+
+        styles.add(
+            ParagraphStyle(
+                name="SubTitleCenter",
+                alignment=TA_CENTER,
+                fontSize=12,
+                leading=14,
+                fontName="Helvetica-Bold",
+                spaceAfter=16,
+            )
+        )
+
+        styles.add(
+            ParagraphStyle(
+                name="BodyTextCustom",
+                alignment=TA_LEFT,
+                fontSize=11,
+                leading=14,
+                spaceAfter=10,
+            )
+        )
+
+        self.styles = styles
+
+        self.table_style = TableStyle(
+            [
+                ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+                ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
+                ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
+                ("PADDING", (0, 0), (-1, -1), 8),
+            ]
+        )
+
+        # ---------- LOGO ----------
+        # Decoded and downscaled once; the source PNG is far larger
+        # than the 140x50pt box it is drawn into.
+        self.logo = None
+        if os.path.exists(self.logo_path):
+            from PIL import Image as PILImage
+
+            with PILImage.open(self.logo_path) as src:
+                scaled = src.convert("RGB").resize(
+                    (LOGO_WIDTH * LOGO_RESOLUTION, LOGO_HEIGHT * LOGO_RESOLUTION),
+                    PILImage.LANCZOS,
+                )
+            self.logo = ImageReader(scaled)
+
+        # ---------- STATIC BLOCKS ----------
+        self.header = []
+        if self.logo is not None:
+            self.header.append(LogoFlowable(self.logo, LOGO_WIDTH, LOGO_HEIGHT))
+            self.header.append(Spacer(1, 6))
+
+        self.header += [
+            Paragraph("LOAN SANCTION LETTER", styles["TitleCenter"]),
+            Paragraph(NBFC_NAME, styles["SubTitleCenter"]),
+            HRFlowable(width="100%", thickness=0.8, color=colors.grey),
+            Spacer(1, 16),
+        ]
+
+        self.kfs_heading = [
+            Spacer(1, 20),
+            Paragraph("KEY FACT SHEET", styles["BodyTextCustom"]),
+            Spacer(1, 6),
+        ]
+
+        self.footer = [
+            Spacer(1, 20),
+            Paragraph(
+                "This loan is sanctioned subject to completion of documentation, "
+                "verification, and internal credit policies of the company. "
+                "This is a system-generated document and does not require a physical signature.",
+                styles["BodyTextCustom"],
+            ),
+            Spacer(1, 30),
+            HRFlowable(width="100%", thickness=0.6, color=colors.lightgrey),
+            Spacer(1, 16),
+            Paragraph(f"For {NBFC_NAME}", styles["BodyTextCustom"]),
+            Paragraph("Authorized Credit Team", styles["BodyTextCustom"]),
+        ]
+
+    def build_elements(
+        self,
+        name: str,
+        today: str,
+        amount: int,
+        rate: float,
+        tenure: int,
+    ) -> List[Any]:
+        """
+        Builds the platypus flowables for a single sanction letter.
+        """
+        # ---------- BORROWER DETAILS ----------
+        borrower_table = Table(
+            [
+                ["Borrower Name", name],
+                ["Sanction Date", today],
+                ["Loan Type", "Personal Loan"],
+            ],
+            colWidths=[160, 340],
+        )
+        borrower_table.setStyle(self.table_style)
+
+        # ---------- KEY FACT SHEET ----------
+        kfs_table = Table(
+            [
+                ["Approved Amount", f"INR {amount:,}"],
+                ["Interest Rate", f"{rate:.2f}% per annum"],
+                ["Tenure", f"{tenure} months"],
+                ["Repayment Mode", "Monthly EMI"],
+                ["Interest Type", "Fixed"],
+            ],
+            colWidths=[200, 300],
+        )
+        kfs_table.setStyle(self.table_style)
+
+        return [
+            *self.header,
+            borrower_table,
+            *self.kfs_heading,
+            kfs_table,
+            *self.footer,
+        ]
+
+
+def render_sanction_pdf(elements: List[Any], password: str) -> bytes:
+    """
+    Renders and encrypts the letter in a single in-memory pass.
+    """
+    buffer = BytesIO()
+
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        leftMargin=36,
+        rightMargin=36,
+        topMargin=28,
+        bottomMargin=36,
+        encrypt=StandardEncryption(password, ownerPassword=password, strength=128),
+    )
+    doc.build(elements)
+
+    return buffer.getvalue()
@@ -0,0 +1,295 @@
+# letter_store.py
+"""
+Sanction Letter Store
+
+Content-addressed storage for rendered sanction letters.
+
+- Letters are keyed by an HMAC of (customer name, PAN, amount, rate,
+  tenure, sanction date): same-name customers never collide, and a
+  retried approval for the same offer reuses the existing PDF
+- The key doubles as the file name; downloads go through signed,
+  expiring tokens (sign / verify) rather than the file path
+- A SQLite index (shared by all workers) records what exists; lookup()
+  checks it instead of trusting URLs kept in sessions
+- gc() removes letters past LETTER_STORE_MAX_AGE_DAYS, then the least
+  recently used until the store fits in LETTER_STORE_MAX_MB. lookup()
+  refreshes a letter's access time at most every ACCESS_TOUCH_SECONDS,
+  so reads rarely write
+- Index calls block on SQLite; async callers run them in a thread
+
+Usage:
+    python letter_store.py gc [--max-mb 1024] [--max-age-days 30]
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from workers import OUTPUT_DIR
+
+# ---------- Config ----------
+LETTER_INDEX_PATH = os.getenv("LETTER_INDEX_PATH", "letters.sqlite3")
+LETTER_STORE_SECRET = os.getenv("LETTER_STORE_SECRET")
+LETTER_STORE_MAX_MB = int(os.getenv("LETTER_STORE_MAX_MB", "1024"))
+LETTER_STORE_MAX_AGE_DAYS = int(os.getenv("LETTER_STORE_MAX_AGE_DAYS", "30"))
+LETTER_LINK_TTL_SECONDS = int(os.getenv("LETTER_LINK_TTL_SECONDS", "3600"))
+
+# Files on disk that the index doesn't know about yet may still be
+# waiting for their render to be recorded; leave them alone this long.
+ORPHAN_GRACE_SECONDS = 3600
+
+# LRU order only needs to be roughly right; coarser access times spare
+# every read and download a write.
+ACCESS_TOUCH_SECONDS = 300
+
+
+class LetterStore:
+    GC_EVERY = 64
+
+    def __init__(
+        self,
+        root: str = OUTPUT_DIR,
+        index_path: str = LETTER_INDEX_PATH,
+        secret: Optional[str] = LETTER_STORE_SECRET,
+        max_bytes: int = LETTER_STORE_MAX_MB * 1024 * 1024,
+        max_age_seconds: int = LETTER_STORE_MAX_AGE_DAYS * 86400,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._records = 0
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(index_path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS letters ("
+            " key TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS letters_accessed_at ON letters (accessed_at)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+        self._secret = (secret or self._shared_secret()).encode("utf-8")
+
+    def _shared_secret(self) -> str:
+        # First worker to start picks the key; the rest read the same one.
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta (name, value) VALUES ('secret', ?)",
+            (secrets.token_hex(32),),
+        )
+        self._conn.commit()
+        return self._conn.execute(
+            "SELECT value FROM meta WHERE name = 'secret'"
+        ).fetchone()[0]
+
+    # ---------- Keys & Paths ----------
+    def key_for(
+        self,
+        customer_name: str,
+        pan: str,
+        approved_amount: int,
+        interest_rate: float,
+        tenure_months: int,
+        sanction_date: str,
+    ) -> str:
+        payload = json.dumps([
+            " ".join(customer_name.lower().split()),
+            pan.upper(),
+            int(approved_amount),
+            f"{float(interest_rate):.4f}",
+            int(tenure_months),
+            sanction_date,
+        ])
+        return hmac.new(self._secret, payload.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        # Two-character shards keep directories small.
+        return os.path.join(self.root, key[:2], f"{key}.pdf")
+
+    def url_for(self, key: str) -> str:
+        return f"/letters/download/{self.sign(key)}"
+
+    # ---------- Download Tokens ----------
+    def sign(self, key: str, ttl_seconds: int = LETTER_LINK_TTL_SECONDS) -> str:
+        expires = int(time.time()) + ttl_seconds
+        return f"{key}.{expires}.{self._signature(key, expires)}"
+
+    def verify(self, token: str) -> Optional[Tuple[str, int]]:
+        """
+        Returns (key, expires) for a valid, unexpired token, else None.
+        """
+        try:
+            key, expires, signature = token.split(".")
+            expires = int(expires)
+        except ValueError:
+            return None
+
+        if expires < time.time():
+            return None
+        if not hmac.compare_digest(signature, self._signature(key, expires)):
+            return None
+        return key, expires
+
+    def _signature(self, key: str, expires: int) -> str:
+        message = f"letter:{key}.{expires}".encode("utf-8")
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()[:32]
+
+    # ---------- Index ----------
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the stored letter for `key`, or None if it was never
+        rendered or has since been collected.
+        """
+        if not key:
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, created_at, accessed_at FROM letters WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        if not os.path.exists(self.path_for(key)):
+            self._forget(key)
+            return None
+
+        size, created_at, accessed_at = row
+        now = time.time()
+        if now - accessed_at > ACCESS_TOUCH_SECONDS:
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE letters SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+                self._conn.commit()
+
+        return {
+            "key": key,
+            "letter_url": self.url_for(key),
+            "size": size,
+            "created_at": created_at,
+        }
+
+    def record(self, key: str) -> None:
+        """
+        Indexes a letter once its file has been written.
+        """
+        now = time.time()
+        size = os.path.getsize(self.path_for(key))
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO letters (key, size, created_at, accessed_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET size = excluded.size,"
+                " accessed_at = excluded.accessed_at",
+                (key, size, now, now),
+            )
+            self._conn.commit()
+
+            self._records += 1
+            collect = self._records % self.GC_EVERY == 0
+        if collect:
+            self.gc()
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM letters WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _remove(self, key: str) -> None:
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+        self._forget(key)
+
+    # ---------- Garbage Collection ----------
+    def gc(self) -> Dict[str, int]:
+        with self._lock:
+            return self._gc()
+
+    def _gc(self) -> Dict[str, int]:
+        expired = [
+            key for (key,) in self._conn.execute(
+                "SELECT key FROM letters WHERE created_at < ?",
+                (time.time() - self.max_age_seconds,),
+            )
+        ]
+        for key in expired:
+            self._remove(key)
+
+        evicted = 0
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM letters").fetchone()[0]
+        if total > self.max_bytes:
+            for key, size in self._conn.execute(
+                "SELECT key, size FROM letters ORDER BY accessed_at"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._remove(key)
+                total -= size
+                evicted += 1
+
+        return {
+            "expired": len(expired),
+            "evicted": evicted,
+            "orphans": self._remove_orphans(),
+            "bytes": total,
+        }
+
+    def _remove_orphans(self) -> int:
+        removed = 0
+        cutoff = time.time() - ORPHAN_GRACE_SECONDS
+
+        for shard in os.scandir(self.root):
+            if not shard.is_dir() or len(shard.name) != 2:
+                continue
+            for entry in os.scandir(shard.path):
+                key = entry.name[:-len(".pdf")]
+                if (
+                    entry.name.endswith(".pdf")
+                    and entry.stat().st_mtime < cutoff
+                    and self._conn.execute(
+                        "SELECT 1 FROM letters WHERE key = ?", (key,)
+                    ).fetchone() is None
+                ):
+                    os.remove(entry.path)
+                    removed += 1
+
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM letters"
+            ).fetchone()
+        return {"letters": count, "bytes": total}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sanction letter store maintenance")
+    parser.add_argument("command", choices=["gc", "stats"])
+    parser.add_argument("--max-mb", type=int, default=LETTER_STORE_MAX_MB)
+    parser.add_argument("--max-age-days", type=int, default=LETTER_STORE_MAX_AGE_DAYS)
+    args = parser.parse_args()
+
+    store = LetterStore(
+        max_bytes=args.max_mb * 1024 * 1024,
+        max_age_seconds=args.max_age_days * 86400,
+    )
+    print(store.gc() if args.command == "gc" else store.stats())
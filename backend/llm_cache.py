@@ -0,0 +1,124 @@
+# llm_cache.py
+"""
+LLM Response Cache
+
+Caches master-agent replies keyed on the normalized messages sent to the
+model (system prompt and stage, the history window, the user message),
+with TTL and LRU eviction. Identical prompts that arrive while one is
+already in flight share that single upstream call (single_flight).
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from single_flight import SingleFlight
+
+# ---------- Config ----------
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "600"))
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def cache_key(messages: List[Dict[str, str]]) -> str:
+    """
+    Key for exactly the prompt the model sees: two sessions share an entry
+    only if every message sent (not just the latest few) matches.
+    """
+    payload = json.dumps(
+        [(m.get("role"), normalize(m.get("content") or "")) for m in messages],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_SIZE,
+        ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._flights = SingleFlight()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def coalesced(self) -> int:
+        return self._flights.coalesced
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def lookup(self, key: str):
+        """
+        get() that counts toward hit/miss stats, for callers that produce
+        the value themselves (streamed replies).
+        """
+        value = self.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[str]],
+    ) -> str:
+        """
+        Returns the cached reply, joins an identical in-flight call, or
+        runs `compute` once. Empty replies (upstream failures) are not cached.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        async def miss() -> str:
+            self.misses += 1
+            value = await compute()
+            if value:
+                self.put(key, value)
+            return value
+
+        return await self._flights.run(key, miss)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "inflight": len(self._flights),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
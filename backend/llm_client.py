@@ -0,0 +1,289 @@
+# llm_client.py
+"""
+Async LLM Client
+
+Native async OpenAI access for the Master Agent:
+
+- One pooled HTTP connection pool shared by every call
+- Concurrency cap (OPENAI_MAX_CONCURRENCY) with visible queue depth
+- Token-bucket pacing that follows the upstream x-ratelimit-* headers
+- Retry with full-jitter backoff that honours Retry-After, bounded by
+  OPENAI_TIMEOUT_SECONDS end to end
+- Token streaming (chat_stream), retried only until the first token
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# ---------- Config ----------
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+OPENAI_REQUESTS_PER_SECOND = float(os.getenv("OPENAI_REQUESTS_PER_SECOND", "50"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "8"))
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """
+    Parses OpenAI reset durations such as "1s", "6m0s" or "120ms".
+    """
+    parts = _DURATION_PART.findall(value or "")
+    if not parts:
+        return None
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+# ---------- Pacing ----------
+class TokenBucket:
+    """
+    Paces requests to `rate` per second with bursts up to `burst`.
+    observe() re-tunes the bucket from upstream rate-limit headers.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def block_for(self, seconds: float) -> None:
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        limit = headers.get("x-ratelimit-limit-requests")
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        reset = parse_duration(headers.get("x-ratelimit-reset-requests", ""))
+
+        try:
+            if limit is not None:
+                # OpenAI request limits are per minute.
+                self.rate = max(float(limit) / 60.0, 0.1)
+                self.burst = max(self.rate, 1.0)
+            if remaining is not None:
+                remaining = float(remaining)
+                self._refill(time.monotonic())
+                self._tokens = min(self._tokens, remaining)
+                if remaining <= 0 and reset:
+                    self.block_for(reset)
+        except ValueError:
+            pass
+
+
+# ---------- Client ----------
+class LLMClient:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: str = "gpt-4o-mini",
+        timeout_seconds: float = 30,
+        max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+        requests_per_second: float = OPENAI_REQUESTS_PER_SECOND,
+        max_retries: int = OPENAI_MAX_RETRIES,
+    ):
+        self.model = model
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+
+        # Retries are ours, so the SDK's own retry loop is disabled.
+        self._client = AsyncOpenAI(
+            api_key=api_key,
+            max_retries=0,
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=max_concurrency,
+                    max_keepalive_connections=max_concurrency,
+                ),
+            ),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.bucket = TokenBucket(requests_per_second)
+
+        self.queued = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    async def chat(self, messages: List[Dict[str, str]], **params: Any) -> str:
+        """
+        Returns the completion text. Raises the last upstream error once
+        retries or the OPENAI_TIMEOUT_SECONDS budget are exhausted.
+        """
+        deadline = time.monotonic() + self.timeout_seconds
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout_seconds)
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        try:
+            return await self._chat_with_retry(messages, deadline, params)
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        **params: Any,
+    ) -> AsyncIterator[str]:
+        """
+        Yields completion text deltas as they arrive. Failures before the
+        first token are retried like chat(); later ones are raised as-is.
+        Close the iterator (contextlib.aclosing) to release the slot early.
+        """
+        deadline = time.monotonic() + self.timeout_seconds
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout_seconds)
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        try:
+            raw = await self._create_with_retry(messages, deadline, dict(params, stream=True))
+            stream = raw.parse()
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def _chat_with_retry(self, messages, deadline: float, params) -> str:
+        raw = await self._create_with_retry(messages, deadline, params)
+        response = raw.parse()
+        return (response.choices[0].message.content or "").strip()
+
+    async def _create_with_retry(self, messages, deadline: float, params):
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise openai.APITimeoutError(request=None)
+
+            self.requests += 1
+            try:
+                raw = await self._client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=messages,
+                    timeout=remaining,
+                    **params,
+                )
+            except RETRYABLE_ERRORS as exc:
+                delay = self._backoff(exc, attempt)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    self.failures += 1
+                    raise
+
+                attempt += 1
+                self.retries += 1
+                logger.warning(
+                    "LLM call failed (%s); retry %d in %.2fs",
+                    type(exc).__name__, attempt, delay,
+                )
+                await asyncio.sleep(delay)
+                continue
+            except openai.OpenAIError:
+                self.failures += 1
+                raise
+
+            self.bucket.observe(raw.headers)
+            return raw
+
+    def _backoff(self, exc: Exception, attempt: int) -> float:
+        delay = random.uniform(0, min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * 2 ** attempt))
+
+        response = getattr(exc, "response", None)
+        if response is not None:
+            if isinstance(exc, openai.RateLimitError):
+                self.rate_limited += 1
+            self.bucket.observe(response.headers)
+            retry_after = retry_after_seconds(response.headers)
+            if retry_after is not None:
+                # Hold every caller back, not just this one.
+                self.bucket.block_for(retry_after)
+                delay = retry_after + random.uniform(0, OPENAI_BACKOFF_BASE)
+
+        return delay
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+        }
+
+    async def aclose(self) -> None:
+        await self._client.close()
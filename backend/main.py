@@ -1,16 +1,37 @@
 # main.py
+import asyncio
+import inspect
+import json
 import logging
+import os
 import re
-from typing import Dict, Any, Optional
+import signal
+import time
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from urllib.parse import quote
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 import uvicorn
 
-from workers import verify_customer, check_eligibility, generate_sanction_letter
+from workers import check_eligibility, LOAN_INTEREST_RATE, MAX_LOAN_AMOUNT, MAX_LOAN_TENURE
+from policy import load_policy
+from kyc import create_verifier
+from offers import find_counter_offers
+from job_queue import JobQueue, QueueFull, JOB_DONE, JOB_FAILED, JOB_QUEUED, new_job_id
+from job_worker import JobWorker, SANCTION_LETTER
+from letter_store import LetterStore
+from audit_log import AuditLog
+from letter_delivery import LetterHotCache, cached_letter_response, file_letter_response
+from records import Session, Stage
+from session_store import create_session_store, SessionConflict
+from session_locks import SessionLocks, SessionBusy
+from stage_engine import StageEngine, Turn
+from metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware, SlowRequestProfiler
 
 # ---------- Setup ----------
 load_dotenv()
@@ -18,12 +39,6 @@ logging.basicConfig(level=logging.INFO)
 
 app = FastAPI(title="NBFC Agentic Loan Assistant API")
 
-app.mount(
-    "/generated_letters",
-    StaticFiles(directory="generated_letters"),
-    name="generated_letters"
-)
-
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -31,10 +46,76 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ---------- Metrics ----------
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_seconds", "HTTP request duration", ("method", "route", "status")
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "chat_stage_seconds", "Stage handler time per chat turn", ("stage",)
+)
+TRANSITIONS = REGISTRY.counter(
+    "chat_transitions_total", "Chat turns by stage and the stage they moved to",
+    ("stage", "next_stage"),
+)
+WORKER_SECONDS = REGISTRY.histogram(
+    "worker_seconds", "Time spent in worker calls", ("worker",)
+)
+LETTER_JOB_SECONDS = REGISTRY.histogram(
+    "letter_job_seconds", "Sanction letter jobs, queued to finished", ("status",)
+)
+TURN_REPLAYS = REGISTRY.counter(
+    "chat_turn_replays_total", "Retried turns answered from the session without re-running"
+)
+DECISIONS = REGISTRY.counter(
+    "loan_decisions_total", "Loan decisions by outcome and reason", ("decision", "reason")
+)
+
+# Opt-in (PROFILE_SLOW_MS): folded-stack profiles of slow requests.
+PROFILER = SlowRequestProfiler()
+
+app.add_middleware(MetricsMiddleware, histogram=HTTP_SECONDS, profiler=PROFILER)
+
+
+@app.on_event("startup")
+async def start_profiler():
+    # Samples the thread it starts on, so it must start on the event loop.
+    PROFILER.start()
+
+# ---------- Master Agent ----------
+# Re-prompts (input a stage rejected) get a conversational nudge from the
+# Master Agent after the stage-machine text. Off unless an LLM is configured.
+MASTER_AGENT_ENABLED = os.getenv("MASTER_AGENT_ENABLED", "0") == "1"
+
+# The agents module (and the OpenAI SDK behind it) is loaded after
+# startup by the warm-up, or by the first turn that needs it.
+AGENTS = None
+
+
+def load_agents():
+    global AGENTS
+    if AGENTS is None:
+        import agents
+
+        AGENTS = agents
+    return AGENTS
+
+
+async def master_agent():
+    if AGENTS is not None:
+        return AGENTS
+    return await asyncio.to_thread(load_agents)
+
+REPROMPT_STAGES = {
+    "ASK_NAME", "ASK_PAN", "ASK_INCOME", "ASK_EMI",
+    "ASK_AMOUNT", "ASK_TENURE", "CHOOSE_OFFER",
+}
+
 # ---------- Models ----------
 class ChatRequest(BaseModel):
     session_id: str
     message: str
+    # Client-generated, one per message; a retry reuses it.
+    turn_id: Optional[str] = Field(None, max_length=64)
 
 
 class ChatResponse(BaseModel):
@@ -44,29 +125,335 @@ class ChatResponse(BaseModel):
     data: Optional[Dict[str, Any]] = None
 
 
+class LetterJobResponse(BaseModel):
+    job_id: str
+    status: str
+    letter_url: Optional[str] = None
+
+
+# ---------- Stage Engine ----------
+# Stage handlers register themselves below; the table is validated once
+# every handler is in place.
+ENGINE = StageEngine(initial="ASK_NAME")
+
+
+def observe_turn(stage: str, next_stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage)
+    TRANSITIONS.inc(stage, next_stage)
+
+
+ENGINE.observe(observe_turn)
+
 # ---------- Session Store ----------
-SESSIONS: Dict[str, Dict[str, Any]] = {}
+# With SESSION_BACKEND=sqlite every worker shares one session table, so
+# main:app can run under `uvicorn --workers N` or as several instances.
+SESSIONS = create_session_store()
+SESSION_CONFLICT_RETRIES = int(os.getenv("SESSION_CONFLICT_RETRIES", "3"))
+
+# Turns for one session run one at a time, in order; a double-click or a
+# retry waits for the turn in progress instead of racing it.
+SESSION_LOCKS = SessionLocks()
+
+
+def new_session() -> Session:
+    return Session(Stage(ENGINE.initial))
+
+
+async def session_io(fn: Callable, *args: Any) -> Any:
+    # A file-backed store can wait on another worker's write lock; keep
+    # that wait off the event loop.
+    if SESSIONS.blocking:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
 
 
-def get_session(session_id: str):
-    if session_id not in SESSIONS:
-        SESSIONS[session_id] = {
-            "stage": "ASK_NAME",
-            "customer": {},
-            "history": []
-        }
-    return SESSIONS[session_id]
+async def get_session(session_id: str) -> Session:
+    session = await session_io(SESSIONS.get, session_id)
+    if session is None:
+        session = new_session()
+    return session
+
+
+# ---------- KYC ----------
+# Results are cached per PAN, so a customer restarting a rejected journey
+# with the same PAN doesn't wait on the provider again.
+KYC = create_verifier()
+
+
+# ---------- Letter Rendering ----------
+# Letters are rendered off the request by the job worker, from a durable
+# queue: a crash or a failed render delays a letter but never loses it.
+# With JOB_WORKER_EMBEDDED=0 this process only queues jobs and separate
+# `python job_worker.py` processes render them.
+JOB_WORKER_EMBEDDED = os.getenv("JOB_WORKER_EMBEDDED", "1") == "1"
+
+LETTER_STORE = LetterStore()
+JOB_QUEUE = JobQueue()
+JOB_WORKER = JobWorker(JOB_QUEUE, LETTER_STORE) if JOB_WORKER_EMBEDDED else None
+JOB_WORKER_TASKS = set()
+
+# Letter job statuses reported by /letters/jobs.
+LETTER_PENDING = "PENDING"
+LETTER_READY = "READY"
+LETTER_FAILED = "FAILED"
+
+
+def observe_letter_job(job: Dict[str, Any], status: str, seconds: float):
+    if status != JOB_QUEUED:
+        LETTER_JOB_SECONDS.observe(seconds, status)
+
+
+if JOB_WORKER is not None:
+    JOB_WORKER.observe(observe_letter_job)
+
+
+@app.on_event("startup")
+async def start_job_worker():
+    if JOB_WORKER is not None:
+        task = asyncio.create_task(JOB_WORKER.run())
+        JOB_WORKER_TASKS.add(task)
+        task.add_done_callback(JOB_WORKER_TASKS.discard)
+
+
+@app.on_event("startup")
+async def reload_letter_template_on_sighup():
+    # Same trigger as a standalone job_worker.py: new branding on SIGHUP.
+    # Signal handlers need the main thread (not so under a test client).
+    if JOB_WORKER is None or not hasattr(signal, "SIGHUP"):
+        return
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, JOB_WORKER.reload_template)
+    except (RuntimeError, NotImplementedError):
+        logging.info("Not on the main thread; SIGHUP template reload disabled")
+
+
+@app.on_event("shutdown")
+async def stop_job_worker():
+    if JOB_WORKER is not None:
+        JOB_WORKER.stop()
+        await asyncio.gather(*JOB_WORKER_TASKS, return_exceptions=True)
+
+
+# ---------- Warm-up ----------
+# Heavy dependencies (the job worker's render processes with ReportLab, the
+# Master Agent with the OpenAI SDK) load in the background once the
+# server is accepting traffic, instead of delaying the first ASK_NAME.
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+WARMUP_SECONDS = REGISTRY.gauge(
+    "warmup_seconds", "Time the background warm-up took after startup"
+)
+WARMUP_TASKS = set()
+
+
+async def warm_up() -> None:
+    start = time.perf_counter()
+    try:
+        # Nudges can come from the first turn; letters only at the last.
+        if MASTER_AGENT_ENABLED:
+            await master_agent()
+        if JOB_WORKER is not None:
+            await JOB_WORKER.warm_up()
+    except Exception:
+        logging.warning("Warm-up failed; dependencies will load on first use", exc_info=True)
+        return
+
+    WARMUP_SECONDS.set(time.perf_counter() - start)
+    logging.info("Warm-up finished in %.2fs", time.perf_counter() - start)
+
+
+@app.on_event("startup")
+async def start_warm_up():
+    if WARMUP_ENABLED:
+        task = asyncio.create_task(warm_up())
+        WARMUP_TASKS.add(task)
+        task.add_done_callback(WARMUP_TASKS.discard)
+
+
+async def submit_sanction_letter(turn: Turn) -> Optional[str]:
+    """
+    Gives the letter for the session's approved offer a job id and queues
+    its render once the turn has committed, so a turn replayed after a
+    session conflict (or a scripted replay) queues nothing. A letter
+    already in the store for the same offer is reused as-is. Returns the
+    job id, or None if the letter queue is full.
+    """
+    session = turn.session
+    c = session.customer
+    offer = session.offer
+    sanction_date = offer.setdefault("sanction_date", datetime.now().strftime("%d %b %Y"))
+    key = LETTER_STORE.key_for(
+        c.name,
+        c.pan,
+        offer["approved_amount"],
+        offer["interest_rate"],
+        offer["tenure_months"],
+        sanction_date,
+    )
+    session.letter_key = key
+
+    letter = await asyncio.to_thread(LETTER_STORE.lookup, key)
+    if letter is not None:
+        # Nothing to queue; the status endpoint answers from the session.
+        session.letter_job = new_job_id()
+        session.letter_url = letter["letter_url"]
+        return session.letter_job
+
+    if await asyncio.to_thread(JOB_QUEUE.full, SANCTION_LETTER):
+        return None
+
+    job_id = session.letter_job = new_job_id()
+    payload = {
+        "letter_key": key,
+        "customer_name": c.name,
+        "approved_amount": offer["approved_amount"],
+        "interest_rate": offer["interest_rate"],
+        "tenure_months": offer["tenure_months"],
+        "sanction_date": sanction_date,
+    }
+
+    async def enqueue():
+        # Idempotent on the letter key: a double submit joins the live job.
+        try:
+            await asyncio.to_thread(
+                JOB_QUEUE.enqueue, SANCTION_LETTER, payload, key=key, job_id=job_id
+            )
+        except QueueFull:
+            # Filled up since the check; the next turn at COMPLETED queues it.
+            logging.warning("Letter queue full; job %s not queued", job_id)
+            return
+        if JOB_WORKER is not None:
+            JOB_WORKER.notify()
+
+    turn.after_commit.append(enqueue)
+    return job_id
+
+
+def letter_pending_response(reply: str, session_id: str, job_id: str) -> ChatResponse:
+    return ChatResponse(
+        reply=reply,
+        stage="COMPLETED",
+        ui_action="SANCTION_LETTER_PENDING",
+        data={
+            "job_id": job_id,
+            "status_url": f"/letters/jobs/{job_id}?session_id={quote(session_id)}",
+        },
+    )
+
+
+# ---------- Approval ----------
+# Eligibility and counter offers both run under this policy
+# (CREDIT_POLICY_PATH to deploy one picked with policy_sim.py).
+CREDIT_POLICY = load_policy()
+logging.info("Credit policy: %s", CREDIT_POLICY)
+
+
+async def approve_loan(
+    turn: Turn,
+    approved_amount: int,
+    tenure: int,
+) -> Optional[str]:
+    """
+    Records the approved offer and queues its sanction letter.
+    Returns the letter job id, or None if the letter queue is full.
+    """
+    turn.session.offer = {
+        "approved_amount": approved_amount,
+        "interest_rate": LOAN_INTEREST_RATE,
+        "tenure_months": tenure,
+    }
+    return await submit_sanction_letter(turn)
+
+
+def approval_reply(approved_amount: int, tenure: int) -> str:
+    return (
+        "🎉 Good news! Your loan has been approved.\n\n"
+        f"✅ Approved Amount: ₹{approved_amount:,}\n"
+        f"✅ Tenure: {tenure} months\n"
+        f"✅ Interest Rate: {LOAN_INTEREST_RATE:g}% per annum\n\n"
+        "Based on your profile, your EMI comfortably fits within "
+        "our internal affordability checks.\n\n"
+        "📄 Your sanction letter is being prepared and will be "
+        "available to download shortly."
+    )
+
+
+QUEUE_FULL_REPLY = (
+    "We’re seeing unusually high demand right now. "
+    "Please send your last reply again in a moment "
+    "to complete your application."
+)
+
+
+def counter_offer_reply(amount: int, tenure: int, offers: List[Dict[str, Any]]) -> str:
+    lines = [
+        f"{i}. ₹{o['amount']:,} over {o['tenure_months']} months (EMI ₹{o['emi']:,})"
+        for i, o in enumerate(offers, start=1)
+    ]
+    return (
+        f"We can’t approve ₹{amount:,} over {tenure} months, "
+        "but you qualify for the following offers:\n\n"
+        + "\n".join(lines)
+        + "\n\nReply with the option number to accept, or type 'no' to decline."
+    )
+
+
+# ---------- Decision Audit ----------
+AUDIT_LOG = AuditLog()
+
+
+@app.on_event("shutdown")
+def close_audit_log():
+    AUDIT_LOG.close()
+
+
+def log_decision(
+    turn: Turn,
+    decision: str,
+    reason: str,
+    eligibility: Optional[Dict[str, Any]] = None,
+    tenure: int = 0,
+    pan: Optional[str] = None,
+) -> None:
+    """
+    Counts the decision and appends it to the audit log once the turn has
+    committed, so a turn replayed after a session conflict logs it once.
+    """
+    c = turn.session.customer
+    eligibility = eligibility or {}
+    entry = {
+        "outcome": decision,
+        "reason": reason,
+        "risk_band": eligibility.get("risk_band"),
+        "pan": pan or c.pan or "",
+        "requested_amount": eligibility.get("requested_amount", c.amount or 0),
+        "approved_amount": eligibility.get("approved_amount", 0),
+        "monthly_income": c.income or 0,
+        "existing_emi": c.emi or 0,
+        "tenure": tenure,
+        "foir": eligibility.get("foir"),
+    }
+
+    def log():
+        DECISIONS.inc(decision, reason)
+        AUDIT_LOG.record(**entry)
+
+    turn.after_commit.append(log)
+
+
+# ---------- Validators ----------
+# Compiled once; every turn only runs the match.
+GREETINGS = frozenset({"hi", "hello", "hey", "yo", "bro", "hii", "hai"})
+NAME_PATTERN = re.compile(r"[a-zA-Z ]+")
+PAN_PATTERN = re.compile(r"[A-Z]{5}[0-9]{4}[A-Z]")
 
 
-# ---------- Name Validation ----------
 def is_valid_name(text: str) -> bool:
     text = text.strip().lower()
 
-    invalid = {"hi", "hello", "hey", "yo", "bro", "hii", "hai"}
-    if text in invalid:
+    if text in GREETINGS:
         return False
 
-    if not re.match(r"^[a-zA-Z ]+$", text):
+    if not NAME_PATTERN.fullmatch(text):
         return False
 
     if len(text.split()) < 2:
@@ -75,174 +462,549 @@ def is_valid_name(text: str) -> bool:
     return True
 
 
+def parse_pan(text: str) -> Optional[str]:
+    pan = text.replace(" ", "").upper()
+    return pan if PAN_PATTERN.fullmatch(pan) else None
+
+
 # ---------- Chat ----------
+async def commit_turn(
+    session_id: str,
+    text: str,
+    turn_id: Optional[str] = None,
+) -> Tuple[ChatResponse, Optional[Dict[str, Any]]]:
+    """
+    Runs and commits one stage-machine turn, after any earlier turn of the
+    same session. Also returns the Master Agent arguments when the turn
+    was a re-prompt that should get a nudge.
+
+    A turn_id the session last committed is not run again: the stored
+    response is returned as it was (without a nudge).
+    """
+    try:
+        async with SESSION_LOCKS.hold(session_id):
+            return await run_turn(session_id, text, turn_id)
+    except SessionBusy:
+        raise HTTPException(
+            status_code=429,
+            detail="Still working on your previous message. Please wait a moment.",
+        )
+
+
+async def run_turn(
+    session_id: str,
+    text: str,
+    turn_id: Optional[str],
+) -> Tuple[ChatResponse, Optional[Dict[str, Any]]]:
+    # Optimistic concurrency: if another turn committed first (another
+    # worker process), replay this message against the fresh session
+    # instead of overwriting it.
+    for _ in range(SESSION_CONFLICT_RETRIES):
+        session = await get_session(session_id)
+        if turn_id is not None and turn_id == session.last_turn_id:
+            TURN_REPLAYS.inc()
+            return ChatResponse.model_validate_json(session.last_response), None
+
+        stage = str(session.stage)
+        history = session.history.messages()
+        after_commit: List[Callable[[], Any]] = []
+
+        response = await ENGINE.run(Turn(session_id, session, text, after_commit))
+        if turn_id is not None:
+            session.last_turn_id = turn_id
+            session.last_response = response.model_dump_json()
+
+        try:
+            await session_io(SESSIONS.put, session_id, session)
+        except SessionConflict:
+            continue
+
+        for action in after_commit:
+            result = action()
+            if inspect.isawaitable(result):
+                await result
+
+        nudge = None
+        if (
+            MASTER_AGENT_ENABLED
+            and stage in REPROMPT_STAGES
+            and response.stage == stage
+            and response.ui_action is None
+        ):
+            nudge = {
+                "session_id": session_id,
+                "current_stage": stage,
+                "history": history,
+                "user_message": text,
+            }
+        return response, nudge
+
+    raise HTTPException(
+        status_code=409,
+        detail="This session is being updated by another request. Please retry.",
+    )
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(req: ChatRequest):
-    session = get_session(req.session_id)
-    text = req.message.strip()
-    stage = session["stage"]
-
-    session["history"].append({"role": "user", "content": text})
-
-    # ---------- ASK NAME ----------
-    if stage == "ASK_NAME":
-        if not is_valid_name(text):
-            reply = "To get started, please enter your full name (for example: Rahul Sharma)."
-        else:
-            session["customer"]["name"] = text
-            session["stage"] = "ASK_PAN"
-            reply = (
-                f"Thanks {text}. I’ll start your loan application.\n\n"
-                "Please share your PAN number for identity verification."
-            )
+    response, nudge = await commit_turn(req.session_id, req.message.strip(), req.turn_id)
+
+    if nudge is not None:
+        agents = await master_agent()
+        result = await agents.run_master_agent(**nudge)
+        response.reply += "\n\n" + result["assistant_reply"]
+    return response
+
+
+def sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Server-sent events form of /chat. The stage-machine reply is the first
+    "delta"; Master Agent tokens follow as further deltas. "reset" carries
+    the full text to show instead of what was streamed, and "done" the
+    final ChatResponse (stage, ui_action, data).
+    """
+    response, nudge = await commit_turn(req.session_id, req.message.strip(), req.turn_id)
+
+    async def events():
+        yield sse("delta", {"text": response.reply})
+
+        if nudge is not None:
+            agents = await master_agent()
+            agent_reply = ""
+            async for event, text in agents.stream_master_agent(**nudge):
+                if event == "reset":
+                    agent_reply = text
+                    yield sse("reset", {"text": f"{response.reply}\n\n{text}"})
+                else:
+                    yield sse("delta", {"text": text if agent_reply else "\n\n" + text})
+                    agent_reply += text
+            response.reply += "\n\n" + agent_reply
+
+        yield sse("done", response.model_dump())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---------- Stages ----------
+@ENGINE.stage("ASK_NAME", next=("ASK_PAN",))
+async def ask_name(turn: Turn) -> ChatResponse:
+    if not is_valid_name(turn.text):
+        return ChatResponse(
+            reply="To get started, please enter your full name (for example: Rahul Sharma).",
+            stage="ASK_NAME",
+        )
 
-    # ---------- ASK PAN ----------
-    elif stage == "ASK_PAN":
-        pan = text.replace(" ", "").upper()
-
-        if not re.match(r"^[A-Z]{5}[0-9]{4}[A-Z]$", pan):
-            reply = "Please enter a valid PAN number (example: ABCDE1234F)."
-        else:
-            result = verify_customer({"pan": pan})
-
-            if not result["verified"]:
-                session["stage"] = "REJECTED"
-                reply = "❌ PAN verification failed. Please double-check the PAN number."
-            else:
-                session["customer"]["pan"] = pan
-                session["stage"] = "ASK_INCOME"
-                reply = (
-                    "✅ Your PAN has been successfully verified.\n\n"
-                    "I’ll now gather a few financial details to evaluate your loan eligibility.\n"
-                    "What is your monthly income?"
-                )
-
-    # ---------- ASK INCOME ----------
-    elif stage == "ASK_INCOME":
-        if not text.isdigit():
-            reply = "Please enter your monthly income as a number (for example: 50000)."
-        else:
-            session["customer"]["income"] = int(text)
-            session["stage"] = "ASK_EMI"
-            reply = (
-                "Got it.\n\n"
-                "Do you currently have any existing EMIs? "
-                "If yes, enter the amount. Otherwise, type 'none'."
-            )
+    turn.session.customer.name = turn.text
+    return ChatResponse(
+        reply=(
+            f"Thanks {turn.text}. I’ll start your loan application.\n\n"
+            "Please share your PAN number for identity verification."
+        ),
+        stage="ASK_PAN",
+    )
 
-    # ---------- ASK EMI ----------
-    elif stage == "ASK_EMI":
-        if text.lower() == "none":
-            session["customer"]["emi"] = 0
-        elif text.isdigit():
-            session["customer"]["emi"] = int(text)
-        else:
-            return ChatResponse(
-                reply="Please enter a valid EMI amount or type 'none'.",
-                stage=stage
-            )
 
-        session["stage"] = "ASK_AMOUNT"
-        reply = (
+@ENGINE.stage("ASK_PAN", next=("ASK_INCOME", "REJECTED"))
+async def ask_pan(turn: Turn) -> ChatResponse:
+    pan = parse_pan(turn.text)
+    if pan is None:
+        return ChatResponse(
+            reply="Please enter a valid PAN number (example: ABCDE1234F).",
+            stage="ASK_PAN",
+        )
+
+    with WORKER_SECONDS.time("verify_customer"):
+        result = await KYC.verify(pan)
+
+    if not result["verified"]:
+        log_decision(turn, "rejected", "PAN verification failed", pan=pan)
+        return ChatResponse(
+            reply="❌ PAN verification failed. Please double-check the PAN number.",
+            stage="REJECTED",
+        )
+
+    turn.session.customer.pan = pan
+    return ChatResponse(
+        reply=(
+            "✅ Your PAN has been successfully verified.\n\n"
+            "I’ll now gather a few financial details to evaluate your loan eligibility.\n"
+            "What is your monthly income?"
+        ),
+        stage="ASK_INCOME",
+    )
+
+
+@ENGINE.stage("ASK_INCOME", next=("ASK_EMI",))
+async def ask_income(turn: Turn) -> ChatResponse:
+    if not turn.text.isdigit():
+        return ChatResponse(
+            reply="Please enter your monthly income as a number (for example: 50000).",
+            stage="ASK_INCOME",
+        )
+
+    turn.session.customer.income = int(turn.text)
+    return ChatResponse(
+        reply=(
+            "Got it.\n\n"
+            "Do you currently have any existing EMIs? "
+            "If yes, enter the amount. Otherwise, type 'none'."
+        ),
+        stage="ASK_EMI",
+    )
+
+
+@ENGINE.stage("ASK_EMI", next=("ASK_AMOUNT",))
+async def ask_emi(turn: Turn) -> ChatResponse:
+    if turn.text.lower() == "none":
+        turn.session.customer.emi = 0
+    elif turn.text.isdigit():
+        turn.session.customer.emi = int(turn.text)
+    else:
+        return ChatResponse(
+            reply="Please enter a valid EMI amount or type 'none'.",
+            stage="ASK_EMI",
+        )
+
+    return ChatResponse(
+        reply=(
             "Thanks.\n\n"
             "How much loan amount are you looking for?"
+        ),
+        stage="ASK_AMOUNT",
+    )
+
+
+@ENGINE.stage("ASK_AMOUNT", next=("ASK_TENURE",))
+async def ask_amount(turn: Turn) -> ChatResponse:
+    # Length first, as for the tenure: a pasted run of digits is never parsed.
+    text = turn.text
+    if (
+        not text.isdigit()
+        or len(text) > len(str(MAX_LOAN_AMOUNT))
+        or int(text) > MAX_LOAN_AMOUNT
+    ):
+        return ChatResponse(
+            reply=(
+                "Please enter the loan amount as a number (for example: 100000), "
+                f"up to {MAX_LOAN_AMOUNT:,}."
+            ),
+            stage="ASK_AMOUNT",
         )
 
-    # ---------- ASK AMOUNT ----------
-    elif stage == "ASK_AMOUNT":
-        if not text.isdigit():
-            reply = "Please enter the loan amount as a number (for example: 100000)."
-        else:
-            session["customer"]["amount"] = int(text)
-            session["stage"] = "ASK_TENURE"
-            reply = (
-                "Noted.\n\n"
-                "What loan tenure do you prefer? "
-                "(For example: 12, 24, or 36 months)"
+    turn.session.customer.amount = int(text)
+    return ChatResponse(
+        reply=(
+            "Noted.\n\n"
+            "What loan tenure do you prefer? "
+            "(For example: 12, 24, or 36 months)"
+        ),
+        stage="ASK_TENURE",
+    )
+
+
+@ENGINE.stage("ASK_TENURE", next=("CHOOSE_OFFER", "COMPLETED", "REJECTED"))
+async def ask_tenure(turn: Turn) -> ChatResponse:
+    # Length first, so a pasted run of digits is never parsed.
+    text = turn.text
+    if not text.isdigit() or len(text) > 4 or int(text) > MAX_LOAN_TENURE:
+        return ChatResponse(
+            reply=f"Please enter the tenure in months (numbers only, up to {MAX_LOAN_TENURE}).",
+            stage="ASK_TENURE",
+        )
+
+    session = turn.session
+    tenure = int(text)
+    c = session.customer
+
+    reply_prefix = (
+        "Thanks. I’m now running a quick eligibility and credit assessment "
+        "based on the details you shared.\n\n"
+    )
+
+    with WORKER_SECONDS.time("check_eligibility"):
+        eligibility = check_eligibility({
+            "monthly_income": c.income,
+            "existing_emi": c.emi,
+            "requested_amount": c.amount,
+            "tenure": tenure,
+            "interest_rate": LOAN_INTEREST_RATE,
+        }, CREDIT_POLICY)
+
+    if not eligibility["eligible"]:
+        with WORKER_SECONDS.time("find_counter_offers"):
+            offers = find_counter_offers(
+                c.income, c.emi, c.amount, tenure, policy=CREDIT_POLICY
             )
 
-    # ---------- ASK TENURE ----------
-    elif stage == "ASK_TENURE":
-        if not text.isdigit():
-            reply = "Please enter the tenure in months (numbers only)."
-        else:
-            tenure = int(text)
-            c = session["customer"]
-
-            reply_prefix = (
-                "Thanks. I’m now running a quick eligibility and credit assessment "
-                "based on the details you shared.\n\n"
+        if offers:
+            log_decision(turn, "counter_offer", eligibility["reason"], eligibility, tenure)
+            session.counter_offers = offers
+            return ChatResponse(
+                reply=reply_prefix + counter_offer_reply(c.amount, tenure, offers),
+                stage="CHOOSE_OFFER",
+                ui_action="SHOW_COUNTER_OFFERS",
+                data={"offers": offers},
             )
 
-            eligibility = check_eligibility({
-                "monthly_income": c["income"],
-                "existing_emi": c["emi"],
-                "requested_amount": c["amount"],
-                "tenure": tenure,
-            })
-
-            if not eligibility["eligible"]:
-                session["stage"] = "REJECTED"
-                reply = (
-                    reply_prefix +
-                    f"❌ At the moment, your application does not meet our criteria.\n\n"
-                    f"Reason: {eligibility['reason']}.\n\n"
-                    "You may improve eligibility by choosing a longer tenure "
-                    "or reducing the loan amount."
-                )
-            else:
-                approved_amount = eligibility["approved_amount"]
-
-                letter = generate_sanction_letter({
-                    "customer_name": c["name"],
-                    "approved_amount": approved_amount,
-                    "interest_rate": 12.0,
-                    "tenure_months": tenure,
-                })
-
-                session["stage"] = "COMPLETED"
-                session["letter_url"] = letter["letter_url"]
-
-                reply = (
-                    reply_prefix +
-                    "🎉 Good news! Your loan has been approved.\n\n"
-                    f"✅ Approved Amount: ₹{approved_amount:,}\n"
-                    f"✅ Tenure: {tenure} months\n"
-                    "✅ Interest Rate: 12% per annum\n\n"
-                    "Based on your profile, your EMI comfortably fits within "
-                    "our internal affordability checks.\n\n"
-                    "📄 You can download your sanction letter below."
-                )
-
-                return ChatResponse(
-                    reply=reply,
-                    stage="COMPLETED",
-                    ui_action="SHOW_SANCTION_DOWNLOAD",
-                    data={"letter_url": letter["letter_url"]},
-                )
-
-    # ---------- COMPLETED ----------
-    elif stage == "COMPLETED":
+        log_decision(turn, "rejected", eligibility["reason"], eligibility, tenure)
         return ChatResponse(
             reply=(
-                "Your loan process is already complete.\n\n"
-                "📄 You can download your sanction letter below."
+                reply_prefix +
+                f"❌ At the moment, your application does not meet our criteria.\n\n"
+                f"Reason: {eligibility['reason']}.\n\n"
+                "You may improve eligibility by choosing a longer tenure "
+                "or reducing the loan amount."
             ),
-            stage="COMPLETED",
-            ui_action="SHOW_SANCTION_DOWNLOAD",
-            data={"letter_url": session.get("letter_url")},
+            stage="REJECTED",
         )
 
-    # ---------- REJECTED ----------
+    approved_amount = eligibility["approved_amount"]
+    job_id = await approve_loan(turn, approved_amount, tenure)
+
+    if job_id is None:
+        return ChatResponse(reply=reply_prefix + QUEUE_FULL_REPLY, stage="ASK_TENURE")
+
+    log_decision(turn, "approved", "Eligible as requested", eligibility, tenure)
+
+    return letter_pending_response(
+        reply_prefix + approval_reply(approved_amount, tenure), turn.session_id, job_id
+    )
+
+
+@ENGINE.stage("CHOOSE_OFFER", next=("COMPLETED", "REJECTED"))
+async def choose_offer(turn: Turn) -> ChatResponse:
+    session = turn.session
+    offers = session.counter_offers
+    text = turn.text
+
+    if text.lower() in ("no", "none"):
+        log_decision(turn, "rejected", "Counter offer declined")
+        return ChatResponse(
+            reply=(
+                "Understood. We haven’t proceeded with your application.\n\n"
+                "If you’d like, you can restart the journey with updated details."
+            ),
+            stage="REJECTED",
+        )
+
+    if not text.isdigit() or not 1 <= int(text) <= len(offers):
+        return ChatResponse(
+            reply=(
+                f"Please reply with an option number between 1 and {len(offers)}, "
+                "or type 'no' to decline."
+            ),
+            stage="CHOOSE_OFFER",
+        )
+
+    offer = offers[int(text) - 1]
+    c = session.customer
+    tenure = offer["tenure_months"]
+
+    # Re-confirm against the live rules before sanctioning.
+    with WORKER_SECONDS.time("check_eligibility"):
+        eligibility = check_eligibility({
+            "monthly_income": c.income,
+            "existing_emi": c.emi,
+            "requested_amount": offer["amount"],
+            "tenure": tenure,
+            "interest_rate": LOAN_INTEREST_RATE,
+        }, CREDIT_POLICY)
+
+    if not eligibility["eligible"]:
+        log_decision(
+            turn, "rejected", "Counter offer no longer available", eligibility, tenure
+        )
+        return ChatResponse(
+            reply=(
+                "❌ At the moment, this offer is no longer available.\n\n"
+                "If you’d like, you can restart the journey with updated details."
+            ),
+            stage="REJECTED",
+        )
+
+    c.amount = offer["amount"]
+    approved_amount = eligibility["approved_amount"]
+    job_id = await approve_loan(turn, approved_amount, tenure)
+
+    if job_id is None:
+        return ChatResponse(reply=QUEUE_FULL_REPLY, stage="CHOOSE_OFFER")
+
+    log_decision(turn, "approved", "Counter offer accepted", eligibility, tenure)
+
+    return letter_pending_response(
+        approval_reply(approved_amount, tenure), turn.session_id, job_id
+    )
+
+
+@ENGINE.stage("COMPLETED")
+async def completed(turn: Turn) -> ChatResponse:
+    session = turn.session
+
+    # The store is the source of truth: a letter that was collected
+    # since (or never recorded) is rendered again.
+    letter = await asyncio.to_thread(LETTER_STORE.lookup, session.letter_key or "")
+
+    if letter is None:
+        session.letter_url = None
+        job = await asyncio.to_thread(JOB_QUEUE.get, session.letter_job or "")
+        # Still queued or rendering: wait. Otherwise (failed for good,
+        # rendered but since collected, or purged) queue it again.
+        if job is None or job["status"] in (JOB_DONE, JOB_FAILED):
+            await submit_sanction_letter(turn)
+
+        if not session.letter_url:
+            return letter_pending_response(
+                "Your loan has been approved.\n\n"
+                "📄 Your sanction letter is still being prepared. "
+                "It will be available to download shortly.",
+                turn.session_id,
+                session.letter_job,
+            )
     else:
-        reply = (
+        session.letter_url = letter["letter_url"]
+
+    return ChatResponse(
+        reply=(
+            "Your loan process is already complete.\n\n"
+            "📄 You can download your sanction letter below."
+        ),
+        stage="COMPLETED",
+        ui_action="SHOW_SANCTION_DOWNLOAD",
+        data={"letter_url": session.letter_url},
+    )
+
+
+@ENGINE.stage("REJECTED")
+async def rejected(turn: Turn) -> ChatResponse:
+    return ChatResponse(
+        reply=(
             "We’re unable to proceed further with this application at the moment.\n\n"
             "If you’d like, you can restart the journey with updated details."
-        )
+        ),
+        stage="REJECTED",
+    )
+
 
-    session["history"].append({"role": "assistant", "content": reply})
-    return ChatResponse(reply=reply, stage=session["stage"])
+ENGINE.validate()
 
+# Sessions keep their stage as a records.Stage, so the two must agree.
+if set(ENGINE.stages) != {stage.value for stage in Stage}:
+    raise RuntimeError("records.Stage does not match the registered stages")
+
+
+# ---------- Letter Status ----------
+@app.get("/letters/jobs/{job_id}", response_model=LetterJobResponse)
+async def letter_job_status(job_id: str, session_id: Optional[str] = None):
+    job = await asyncio.to_thread(JOB_QUEUE.get, job_id)
+
+    if job is None and session_id:
+        # Served from the store without a job: answer from the session.
+        session = await session_io(SESSIONS.get, session_id)
+        if session is not None and session.letter_job == job_id:
+            letter = await asyncio.to_thread(LETTER_STORE.lookup, session.letter_key or "")
+            letter_url = letter["letter_url"] if letter else None
+            return LetterJobResponse(
+                job_id=job_id,
+                status=LETTER_READY if letter_url else LETTER_PENDING,
+                letter_url=letter_url,
+            )
+
+    if job is None or job["kind"] != SANCTION_LETTER:
+        raise HTTPException(status_code=404, detail="Unknown letter job")
+
+    if job["status"] == JOB_DONE:
+        letter = await asyncio.to_thread(LETTER_STORE.lookup, job["key"])
+        if letter is not None:
+            return LetterJobResponse(
+                job_id=job_id,
+                status=LETTER_READY,
+                letter_url=letter["letter_url"],
+            )
+        # Collected since it was rendered: render it again under the same
+        # job. False means the same letter is already queued by another job.
+        if await asyncio.to_thread(JOB_QUEUE.retry, job_id, JOB_DONE) and JOB_WORKER is not None:
+            JOB_WORKER.notify()
+        return LetterJobResponse(job_id=job_id, status=LETTER_PENDING)
+
+    return LetterJobResponse(
+        job_id=job_id,
+        status=LETTER_FAILED if job["status"] == JOB_FAILED else LETTER_PENDING,
+    )
+
+
+# ---------- Letter Download ----------
+# Letters are only reachable through signed, expiring links minted by the
+# letter store; generated_letters/ itself is not served.
+LETTER_HOT_CACHE = LetterHotCache()
+
+
+@app.api_route("/letters/download/{token}", methods=["GET", "HEAD"])
+async def download_letter(token: str, request: Request) -> Response:
+    verified = LETTER_STORE.verify(token)
+    if verified is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired letter link")
+
+    key, expires = verified
+    headers = {"cache-control": f"private, max-age={max(expires - int(time.time()), 0)}"}
+
+    cached = LETTER_HOT_CACHE.get(key)
+    if cached is not None:
+        return cached_letter_response(request, cached, headers)
+
+    if await asyncio.to_thread(LETTER_STORE.lookup, key) is None:
+        raise HTTPException(status_code=404, detail="Letter no longer available")
+
+    return file_letter_response(
+        request, key, LETTER_STORE.path_for(key), headers, LETTER_HOT_CACHE
+    )
+
+
+# ---------- Metrics Endpoint ----------
+# Live state is read at scrape time rather than tracked per request.
+# The store-backed counts query SQLite, so /metrics refreshes them in a
+# worker thread before rendering; the in-memory reads stay on the loop.
+SESSIONS_LIVE = REGISTRY.gauge("sessions_live", "Sessions currently stored")
+REGISTRY.gauge("sessions_in_turn", "Sessions with a chat turn running or queued",
+               read=lambda: len(SESSION_LOCKS))
+LETTER_QUEUE_PENDING = REGISTRY.gauge("letter_queue_pending",
+                                      "Sanction letters queued or rendering")
+REGISTRY.gauge("kyc_cache_entries", "PAN verification results cached",
+               read=lambda: KYC.stats().get("size", 0))
+REGISTRY.gauge("kyc_in_provider", "PAN verifications waiting on the KYC provider",
+               read=lambda: KYC.stats().get("in_provider", 0))
+REGISTRY.gauge("letter_hot_cache_bytes", "Bytes held by the letter hot cache",
+               read=lambda: LETTER_HOT_CACHE.stats()["bytes"])
+
+if MASTER_AGENT_ENABLED:
+    REGISTRY.gauge("llm_in_flight", "LLM calls in flight",
+                   read=lambda: AGENTS.llm.stats()["in_flight"] if AGENTS else 0)
+    REGISTRY.gauge("llm_queued", "LLM calls waiting for a concurrency slot",
+                   read=lambda: AGENTS.llm.stats()["queued"] if AGENTS else 0)
+
+
+def count_stored() -> Tuple[int, int]:
+    return len(SESSIONS), JOB_QUEUE.backlog(SANCTION_LETTER)
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    try:
+        sessions, pending = await asyncio.to_thread(count_stored)
+    except Exception:
+        logging.warning("Store-backed gauges not refreshed", exc_info=True)
+    else:
+        SESSIONS_LIVE.set(sessions)
+        LETTER_QUEUE_PENDING.set(pending)
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,363 @@
+# metrics.py
+"""
+Metrics & Profiling
+
+Lightweight in-process instrumentation, exposed in the Prometheus text
+format by the /metrics endpoint.
+
+- Counter, Gauge and Histogram with fixed label names; observing is a
+  dict lookup plus a bisect, cheap enough for every turn
+- Gauges can read their value from a callback at scrape time (live
+  sessions, in-flight LLM calls) instead of being updated on the hot path
+- MetricsMiddleware times every HTTP request by route template
+- SlowRequestProfiler (opt-in, PROFILE_SLOW_MS) samples the event loop
+  thread's stack and dumps a folded-stack flame profile for requests
+  slower than the threshold (render with flamegraph.pl or speedscope)
+
+Metrics are per process and meant to be updated from the event loop;
+with several uvicorn workers, scrape each one.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Counter, deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ---------- Config ----------
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers sub-millisecond stage handlers up to slow LLM calls.
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# ---------- Metric Types ----------
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Gauge(Metric):
+    """
+    Set directly, or give `read` to compute the value at scrape time.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        read: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._read = read
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def samples(self) -> List[str]:
+        if self._read is not None:
+            try:
+                self._values[()] = self._read()
+            except Exception:
+                logger.warning("Gauge %s callback failed", self.name, exc_info=True)
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class _Series:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], _Series] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            # Last slot is the +Inf bucket.
+            series = self._series[labels] = _Series(len(self.buckets) + 1)
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.sum += value
+
+    def time(self, *labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series.counts) if series else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, series in self._series.items():
+            cumulative = 0
+            bounds = [_number(b) for b in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, series.counts):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            suffix = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_number(series.sum)}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+# ---------- Registry ----------
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} registered twice")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = (), read=None) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, read))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ---------- Slow Request Profiler ----------
+class SlowRequestProfiler:
+    """
+    Samples the event loop thread's Python stack every `interval_ms` into
+    a rolling window. When a request takes longer than `threshold_ms`, the
+    samples taken during it are written to `directory` as folded stacks
+    ("frame;frame;frame count" lines).
+
+    Requests share the loop, so a profile also shows whatever else ran
+    concurrently; that is usually what made the request slow.
+    """
+
+    WINDOW_SECONDS = 60
+    DUMP_COOLDOWN_SECONDS = 5
+
+    def __init__(
+        self,
+        threshold_ms: float = PROFILE_SLOW_MS,
+        interval_ms: float = PROFILE_INTERVAL_MS,
+        directory: str = PROFILE_DIR,
+    ):
+        self.threshold_ms = threshold_ms
+        self.interval = interval_ms / 1000
+        self.directory = directory
+        self.dumps = 0
+
+        self._samples: deque = deque(maxlen=int(self.WINDOW_SECONDS / self.interval))
+        self._thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._last_dump = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def start(self) -> None:
+        """
+        Starts sampling the calling thread (the event loop's).
+        """
+        if not self.enabled or self._thread_id is not None:
+            return
+        self._thread_id = threading.get_ident()
+        threading.Thread(target=self._run, name="slow-request-profiler", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self._samples.append((time.monotonic(), ";".join(reversed(stack))))
+
+    def maybe_dump(self, label: str, started: float, elapsed: float) -> Optional[str]:
+        """
+        Writes the profile for a request that started at `started`
+        (time.monotonic()) and took `elapsed` seconds, if it was slow.
+        """
+        now = time.monotonic()
+        if (
+            elapsed * 1000 < self.threshold_ms
+            or now - self._last_dump < self.DUMP_COOLDOWN_SECONDS
+        ):
+            return None
+        self._last_dump = now
+
+        stacks = _Counter(stack for at, stack in list(self._samples) if at >= started)
+        if not stacks:
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_")
+        path = os.path.join(
+            self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}-{elapsed * 1000:.0f}ms.folded"
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        self.dumps += 1
+        logger.warning("Slow request %s took %.0f ms; profile written to %s",
+                       label, elapsed * 1000, path)
+        return path
+
+
+# ---------- ASGI Middleware ----------
+class MetricsMiddleware:
+    """
+    Records request duration by method, route template and status, and
+    hands slow requests to the profiler.
+    """
+
+    def __init__(self, app, histogram: Histogram, profiler: Optional[SlowRequestProfiler] = None):
+        self.app = app
+        self.histogram = histogram
+        self.profiler = profiler if profiler is not None and profiler.enabled else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.monotonic() - started
+            # Templates, not raw paths, keep label cardinality bounded
+            # (download tokens, job ids).
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            self.histogram.observe(elapsed, scope["method"], path, str(status))
+
+            if self.profiler is not None and elapsed * 1000 >= self.profiler.threshold_ms:
+                await asyncio.to_thread(
+                    self.profiler.maybe_dump, f"{scope['method']} {path}", started, elapsed
+                )
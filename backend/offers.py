@@ -0,0 +1,120 @@
+# offers.py
+"""
+Counter-Offer Optimizer
+
+When a requested (amount, tenure) fails affordability, evaluates the
+whole grid of standard tenures x amount ladder in one vectorized
+eligibility call and returns the best approvable alternatives:
+
+- SAME_AMOUNT_LONGER_TENURE: requested amount at the shortest tenure that fits
+- MAX_AMOUNT_SAME_TENURE:    largest amount that fits the requested tenure
+- MAX_AMOUNT_ANY_TENURE:     largest amount on the grid, at its shortest tenure
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+from annuity import annuity_factor
+from batch_eligibility import check_eligibility_batch, RISK_BANDS
+from policy import CreditPolicy, DEFAULT_POLICY
+from workers import LOAN_INTEREST_RATE, MAX_LOAN_TENURE
+
+# ---------- Config ----------
+STANDARD_TENURES = np.array([12, 18, 24, 36, 48, 60, 72, 84], dtype=np.int64)
+AMOUNT_LADDER_PERCENT = np.arange(95, 5, -5, dtype=np.int64)  # 95% .. 10%
+AMOUNT_ROUNDING = 5000
+
+SAME_AMOUNT_LONGER_TENURE = "SAME_AMOUNT_LONGER_TENURE"
+MAX_AMOUNT_SAME_TENURE = "MAX_AMOUNT_SAME_TENURE"
+MAX_AMOUNT_ANY_TENURE = "MAX_AMOUNT_ANY_TENURE"
+
+
+def amount_ladder(requested_amount: int) -> np.ndarray:
+    """
+    Requested amount followed by rounded-down fractions of it, descending.
+    Rungs are computed in Python ints (int64 would wrap from about 2e17)
+    and returned as float64, the dtype the batch engine scores in.
+    """
+    amount = int(requested_amount)
+    rungs = {
+        amount * int(p) // (100 * AMOUNT_ROUNDING) * AMOUNT_ROUNDING
+        for p in AMOUNT_LADDER_PERCENT
+    }
+    ladder = [amount] + sorted((r for r in rungs if 0 < r < amount), reverse=True)
+    return np.array(ladder, dtype=np.float64)
+
+
+def find_counter_offers(
+    monthly_income: float,
+    existing_emi: float,
+    requested_amount: int,
+    requested_tenure: int,
+    interest_rate: float = LOAN_INTEREST_RATE,
+    policy: CreditPolicy = DEFAULT_POLICY,
+) -> List[Dict[str, Any]]:
+    """
+    Ranked, de-duplicated approvable offers. Empty if nothing on the grid fits.
+    """
+    # An out-of-range requested tenure is dropped; the standard ones remain.
+    requested_tenure = int(requested_tenure)
+    in_range = 0 < requested_tenure <= MAX_LOAN_TENURE
+    tenures = STANDARD_TENURES
+    if in_range:
+        tenures = np.union1d(tenures, [requested_tenure])
+    amounts = amount_ladder(requested_amount)
+
+    # ---------- Grid (tenures x amounts) ----------
+    grid_tenure = np.repeat(tenures, len(amounts))
+    grid_amount = np.tile(amounts, len(tenures))
+    size = grid_tenure.size
+
+    result = check_eligibility_batch(
+        np.full(size, monthly_income, dtype=np.float64),
+        np.full(size, existing_emi, dtype=np.float64),
+        grid_amount,
+        grid_tenure,
+        interest_rate=interest_rate,
+        policy=policy,
+    )
+    eligible = result["eligible"].reshape(len(tenures), len(amounts))
+    risk_band = result["risk_band"].reshape(len(tenures), len(amounts))
+
+    if not eligible.any():
+        return []
+
+    picks = []
+
+    # Shortest tenure that carries the full requested amount.
+    full_amount = np.flatnonzero(eligible[:, 0])
+    if full_amount.size:
+        picks.append((SAME_AMOUNT_LONGER_TENURE, full_amount[0], 0))
+
+    # Largest amount at the requested tenure (amounts are descending).
+    if in_range:
+        t = int(np.searchsorted(tenures, requested_tenure))
+        fits = np.flatnonzero(eligible[t])
+        if fits.size:
+            picks.append((MAX_AMOUNT_SAME_TENURE, t, fits[0]))
+
+    # Largest amount anywhere, preferring the shortest tenure.
+    best_amount = np.flatnonzero(eligible.any(axis=0))[0]
+    picks.append((MAX_AMOUNT_ANY_TENURE, np.flatnonzero(eligible[:, best_amount])[0], best_amount))
+
+    offers = []
+    seen = set()
+    for kind, t, a in picks:
+        key = (int(tenures[t]), int(amounts[a]))
+        if key in seen:
+            continue
+        seen.add(key)
+        offers.append({
+            "kind": kind,
+            "amount": key[1],
+            "tenure_months": key[0],
+            "interest_rate": interest_rate,
+            "emi": round(key[1] * annuity_factor(interest_rate, key[0])),
+            "risk_band": str(RISK_BANDS[risk_band[t, a]]),
+        })
+
+    return offers
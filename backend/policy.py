@@ -0,0 +1,61 @@
+# policy.py
+"""
+Credit Policy
+
+The eligibility thresholds as one parameter object, shared by the scalar
+Credit Worker (workers.check_eligibility), the batch engine
+(batch_eligibility) and the what-if simulator (policy_sim.py), so all
+three apply exactly the same rules.
+
+- CreditPolicy: minimum income, FOIR cap and the LOW/MEDIUM FOIR split
+- DEFAULT_POLICY: the rules as they stand
+- load_policy(): the live policy, from the JSON file at
+  CREDIT_POLICY_PATH if set (e.g. a configuration picked with the
+  simulator), otherwise DEFAULT_POLICY
+
+Usage:
+    CREDIT_POLICY_PATH=policies/tight.json uvicorn main:app
+"""
+
+import json
+import os
+from dataclasses import dataclass, fields
+from typing import Any, Dict
+
+# ---------- Config ----------
+CREDIT_POLICY_PATH = os.getenv("CREDIT_POLICY_PATH", "")
+
+
+@dataclass(frozen=True)
+class CreditPolicy:
+    name: str = "default"
+    min_monthly_income: float = 25000
+    max_foir: float = 0.45
+    low_risk_foir: float = 0.30
+
+    def __post_init__(self):
+        # FOIR divides by income, so a zero income must never pass.
+        if self.min_monthly_income <= 0:
+            raise ValueError("min_monthly_income must be positive")
+        if self.max_foir <= 0:
+            raise ValueError("max_foir must be positive")
+        if not 0 <= self.low_risk_foir <= self.max_foir:
+            raise ValueError("low_risk_foir must be between 0 and max_foir")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CreditPolicy":
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"unknown policy field(s) {sorted(unknown)}")
+        return cls(**data)
+
+
+DEFAULT_POLICY = CreditPolicy()
+
+
+def load_policy(path: str = CREDIT_POLICY_PATH) -> CreditPolicy:
+    if not path:
+        return DEFAULT_POLICY
+    with open(path, encoding="utf-8") as f:
+        return CreditPolicy.from_dict(json.load(f))
@@ -0,0 +1,301 @@
+# policy_sim.py
+"""
+Credit Policy Simulator
+
+What-if replay of past applications under candidate credit policies.
+Every policy is scored against every application with the batch engine
+(the rules the chat path applies, via policy.CreditPolicy), in row chunks
+spread across a process pool, and reported per policy:
+
+- approval rate and approvals
+- total sanctioned amount
+- risk-band mix of approvals, and rejections by reason
+
+Policies come from a JSON file (a list of CreditPolicy fields) or from a
+grid of --min-income x --max-foir x --low-risk-foir values; the default
+grid is 100 points around the live rules (marked * in the report).
+--check-rows re-scores a sample through the scalar Credit Worker and
+exits non-zero on any difference.
+
+Usage:
+    python policy_sim.py applications.csv
+    python policy_sim.py applications.parquet --policies candidates.json --output results.csv
+    python policy_sim.py --synthetic 1000000 --workers 4
+
+Input columns: monthly_income, existing_emi, requested_amount, tenure
+(as for batch_eligibility.py; file input needs pandas).
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from batch_eligibility import INPUT_COLUMNS, REASONS, RISK_BANDS, check_eligibility_batch, read_input
+from policy import CreditPolicy, load_policy
+from workers import LOAN_INTEREST_RATE, check_eligibility
+
+# ---------- Config ----------
+CHUNK_ROWS = 100_000
+DEFAULT_MIN_INCOME = [20000, 25000, 30000, 35000]
+DEFAULT_MAX_FOIR = [0.40, 0.45, 0.50, 0.55, 0.60]
+DEFAULT_LOW_RISK_FOIR = [0.20, 0.25, 0.30, 0.35, 0.40]
+
+# ---------- Tally ----------
+# One row per policy: sanctioned amount, then counts per risk band code,
+# then counts per reason code.
+SANCTIONED = 0
+BANDS = slice(1, 1 + len(RISK_BANDS))
+BAND_LOW, BAND_MEDIUM, BAND_HIGH = 1, 2, 3
+REASON_COLUMNS = slice(1 + len(RISK_BANDS), 1 + len(RISK_BANDS) + len(REASONS))
+TALLY_WIDTH = 1 + len(RISK_BANDS) + len(REASONS)
+
+Columns = Tuple[np.ndarray, ...]
+
+
+# ---------- Input ----------
+def synthetic_applications(rows: int, seed: int = 13) -> Columns:
+    """
+    Random applications, for load tests and trying the tool out.
+    """
+    rng = np.random.default_rng(seed)
+    return (
+        rng.integers(10_000, 300_000, rows),
+        rng.integers(0, 80_000, rows),
+        rng.integers(50_000, 2_000_000, rows),
+        rng.choice(np.array([12, 18, 24, 36, 48, 60, 72, 84]), rows),
+    )
+
+
+def read_applications(path: str) -> Columns:
+    frame = read_input(path)
+    return tuple(frame[col].to_numpy() for col in INPUT_COLUMNS)
+
+
+def read_policies(path: str) -> List[CreditPolicy]:
+    with open(path, encoding="utf-8") as f:
+        return [CreditPolicy.from_dict(entry) for entry in json.load(f)]
+
+
+def policy_grid(
+    min_income: Sequence[float],
+    max_foir: Sequence[float],
+    low_risk_foir: Sequence[float],
+) -> List[CreditPolicy]:
+    """
+    Every combination, skipping those with the LOW band above the FOIR cap.
+    """
+    return [
+        CreditPolicy(
+            name=f"income>={income:g} foir<={cap:g} low<={low:g}",
+            min_monthly_income=income,
+            max_foir=cap,
+            low_risk_foir=low,
+        )
+        for income, cap, low in itertools.product(min_income, max_foir, low_risk_foir)
+        if low <= cap
+    ]
+
+
+# ---------- Worker ----------
+_POLICIES: List[CreditPolicy] = []
+_INTEREST_RATE = LOAN_INTEREST_RATE
+
+
+def init_worker(policies: List[CreditPolicy], interest_rate: float) -> None:
+    global _POLICIES, _INTEREST_RATE
+    _POLICIES = policies
+    _INTEREST_RATE = interest_rate
+
+
+def score_chunk(columns: Columns) -> np.ndarray:
+    """
+    Tallies every policy over one chunk of applications.
+    """
+    tally = np.zeros((len(_POLICIES), TALLY_WIDTH), dtype=np.int64)
+    for i, policy in enumerate(_POLICIES):
+        result = check_eligibility_batch(*columns, interest_rate=_INTEREST_RATE, policy=policy)
+        tally[i, SANCTIONED] = result["approved_amount"].sum()
+        tally[i, BANDS] = np.bincount(result["risk_band"], minlength=len(RISK_BANDS))
+        tally[i, REASON_COLUMNS] = np.bincount(result["reason"], minlength=len(REASONS))
+    return tally
+
+
+# ---------- Simulation ----------
+def chunks(columns: Columns, chunk_rows: int):
+    for start in range(0, len(columns[0]), chunk_rows):
+        yield tuple(col[start:start + chunk_rows] for col in columns)
+
+
+def simulate(
+    columns: Columns,
+    policies: List[CreditPolicy],
+    workers: int,
+    chunk_rows: int = CHUNK_ROWS,
+    interest_rate: float = LOAN_INTEREST_RATE,
+) -> np.ndarray:
+    """
+    Sums score_chunk over all chunks, across `workers` processes (in
+    this process when workers is 1).
+    """
+    tally = np.zeros((len(policies), TALLY_WIDTH), dtype=np.int64)
+
+    if workers <= 1:
+        init_worker(policies, interest_rate)
+        for chunk in chunks(columns, chunk_rows):
+            tally += score_chunk(chunk)
+        return tally
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=init_worker, initargs=(policies, interest_rate)
+    ) as pool:
+        for chunk_tally in pool.map(score_chunk, chunks(columns, chunk_rows)):
+            tally += chunk_tally
+    return tally
+
+
+def check_sample(
+    columns: Columns,
+    policies: List[CreditPolicy],
+    rows: int,
+    interest_rate: float = LOAN_INTEREST_RATE,
+) -> int:
+    """
+    Tallies the first `rows` applications through the scalar Credit
+    Worker and returns the number of policies whose tally differs.
+    """
+    sample = tuple(col[:rows] for col in columns)
+    init_worker(policies, interest_rate)
+    batch = score_chunk(sample)
+
+    reasons, bands = list(REASONS), list(RISK_BANDS)
+    mismatches = 0
+    for i, policy in enumerate(policies):
+        tally = np.zeros(TALLY_WIDTH, dtype=np.int64)
+        for income, emi, requested, tenure in zip(*sample):
+            result = check_eligibility({
+                "monthly_income": int(income),
+                "existing_emi": int(emi),
+                "requested_amount": int(requested),
+                "tenure": int(tenure),
+                "interest_rate": interest_rate,
+            }, policy)
+            tally[SANCTIONED] += result["approved_amount"]
+            tally[BAND_LOW + bands.index(result["risk_band"])] += 1
+            tally[REASON_COLUMNS.start + reasons.index(result["reason"])] += 1
+        mismatches += not np.array_equal(tally, batch[i])
+    return mismatches
+
+
+# ---------- Report ----------
+def summarize(policies: List[CreditPolicy], tally: np.ndarray, rows: int) -> List[Dict[str, Any]]:
+    summary = []
+    for policy, counts in zip(policies, tally):
+        approved = int(counts[BAND_LOW] + counts[BAND_MEDIUM])
+        reasons = dict(zip(REASONS, counts[REASON_COLUMNS].tolist()))
+        summary.append({
+            "policy": policy.name,
+            "min_monthly_income": policy.min_monthly_income,
+            "max_foir": policy.max_foir,
+            "low_risk_foir": policy.low_risk_foir,
+            "applications": rows,
+            "approved": approved,
+            "approval_rate": approved / rows if rows else 0.0,
+            "sanctioned_amount": int(counts[SANCTIONED]),
+            "low_risk_share": int(counts[BAND_LOW]) / approved if approved else 0.0,
+            "medium_risk_share": int(counts[BAND_MEDIUM]) / approved if approved else 0.0,
+            "rejected_low_income": reasons["Monthly income below minimum eligibility threshold"],
+            "rejected_high_foir": reasons["FOIR too high based on existing obligations"],
+            "rejected_bad_tenure": reasons["Invalid loan tenure"],
+        })
+    return summary
+
+
+def print_report(summary: List[Dict[str, Any]], live: CreditPolicy) -> None:
+    print(
+        f"  {'policy':34s} {'approved':>9s} {'sanctioned':>18s} "
+        f"{'LOW':>6s} {'MEDIUM':>6s} {'low income':>11s} {'high FOIR':>10s}"
+    )
+    for row in summary:
+        is_live = (row["min_monthly_income"], row["max_foir"], row["low_risk_foir"]) == (
+            live.min_monthly_income, live.max_foir, live.low_risk_foir
+        )
+        print(
+            f"{'*' if is_live else ' '} {row['policy']:34.34s} {row['approval_rate']:9.1%} "
+            f"{row['sanctioned_amount']:18,} {row['low_risk_share']:6.1%} "
+            f"{row['medium_risk_share']:6.1%} {row['rejected_low_income']:11,} "
+            f"{row['rejected_high_foir']:10,}"
+        )
+
+
+def write_report(path: str, summary: List[Dict[str, Any]]) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(summary[0]))
+        writer.writeheader()
+        writer.writerows(summary)
+
+
+# ---------- CLI ----------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", nargs="?", help="CSV or Parquet of past applications")
+    parser.add_argument("--synthetic", type=int, metavar="ROWS",
+                        help="simulate on random applications instead of a file")
+    parser.add_argument("--policies", metavar="JSON",
+                        help="list of policies to compare (default: the grid below)")
+    parser.add_argument("--min-income", type=float, nargs="+", default=DEFAULT_MIN_INCOME)
+    parser.add_argument("--max-foir", type=float, nargs="+", default=DEFAULT_MAX_FOIR)
+    parser.add_argument("--low-risk-foir", type=float, nargs="+", default=DEFAULT_LOW_RISK_FOIR)
+    parser.add_argument("--interest-rate", type=float, default=LOAN_INTEREST_RATE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--check-rows", type=int, default=1000,
+                        help="applications re-scored by the scalar worker (0 to skip)")
+    parser.add_argument("--output", metavar="CSV", help="also write the report as CSV")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        columns = synthetic_applications(args.synthetic)
+    elif args.input:
+        columns = read_applications(args.input)
+    else:
+        parser.error("an input file or --synthetic is required")
+
+    if args.policies:
+        policies = read_policies(args.policies)
+    else:
+        policies = policy_grid(args.min_income, args.max_foir, args.low_risk_foir)
+    if not policies:
+        parser.error("no valid policies to simulate")
+
+    rows = len(columns[0])
+    start = time.perf_counter()
+    tally = simulate(columns, policies, args.workers, args.chunk_rows, args.interest_rate)
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(policies, tally, rows)
+    print_report(summary, load_policy())
+    if args.output:
+        write_report(args.output, summary)
+    print(
+        f"{rows:,} applications x {len(policies)} policies in {elapsed:.1f}s  "
+        f"({rows * len(policies) / elapsed / 1e6:.1f} M evaluations/sec, {args.workers} workers)",
+        file=sys.stderr,
+    )
+
+    if args.check_rows:
+        mismatches = check_sample(columns, policies, args.check_rows, args.interest_rate)
+        if mismatches:
+            print(f"ERROR: {mismatches} policies differ from the scalar Credit Worker", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# records.py
+"""
+Session Records
+
+Compact, typed conversation state: __slots__ records instead of nested
+dicts, so a live session costs a few hundred bytes rather than a few KB.
+
+- Stage: the journey stages as a str enum (equal to, and serialized as,
+  the stage name)
+- Customer: the details collected so far
+- History: ring buffer of the last HISTORY_WINDOW messages as
+  (role bit, interned text); the window is what the Master Agent reads
+  (agents.build_messages)
+- Session: stage, customer, history, the offer / letter bookkeeping and
+  the last committed turn's id and response (for replaying retries),
+  with to_dict() / from_dict() for stores that serialize (SQLite)
+"""
+
+import sys
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+HISTORY_WINDOW = 12
+
+ROLES = ("user", "assistant")
+
+
+class Stage(str, Enum):
+    ASK_NAME = "ASK_NAME"
+    ASK_PAN = "ASK_PAN"
+    ASK_INCOME = "ASK_INCOME"
+    ASK_EMI = "ASK_EMI"
+    ASK_AMOUNT = "ASK_AMOUNT"
+    ASK_TENURE = "ASK_TENURE"
+    CHOOSE_OFFER = "CHOOSE_OFFER"
+    COMPLETED = "COMPLETED"
+    REJECTED = "REJECTED"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+class Customer:
+    __slots__ = ("name", "pan", "income", "emi", "amount")
+
+    def __init__(
+        self,
+        name: Optional[str] = None,
+        pan: Optional[str] = None,
+        income: Optional[int] = None,
+        emi: Optional[int] = None,
+        amount: Optional[int] = None,
+    ):
+        self.name = name
+        self.pan = pan
+        self.income = income
+        self.emi = emi
+        self.amount = amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class History:
+    """
+    The last `window` messages, oldest first. Roles are one bit each in a
+    single int; texts are interned, so the prompts and replies every
+    session shares are stored once.
+    """
+
+    __slots__ = ("_texts", "_roles", "_next", "_size")
+
+    def __init__(self, window: int = HISTORY_WINDOW):
+        self._texts: List[Optional[str]] = [None] * window
+        self._roles = 0
+        self._next = 0
+        self._size = 0
+
+    def append(self, role: str, text: str) -> None:
+        slot = self._next
+        bit = 1 << slot
+        if ROLES.index(role):
+            self._roles |= bit
+        else:
+            self._roles &= ~bit
+        self._texts[slot] = sys.intern(text)
+        self._next = (slot + 1) % len(self._texts)
+        self._size = min(self._size + 1, len(self._texts))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        window = len(self._texts)
+        for i in range(self._next - self._size, self._next):
+            slot = i % window
+            yield ROLES[self._roles >> slot & 1], self._texts[slot]
+
+    def messages(self) -> List[Dict[str, str]]:
+        """
+        Chat-completion style {"role", "content"} dicts, oldest first.
+        """
+        return [{"role": role, "content": text} for role, text in self]
+
+
+class Session:
+    __slots__ = (
+        "_stage", "customer", "history", "version",
+        "offer", "counter_offers", "letter_key", "letter_job", "letter_url",
+        "last_turn_id", "last_response",
+    )
+
+    def __init__(self, stage: Stage = Stage.ASK_NAME):
+        self.stage = stage
+        self.customer = Customer()
+        self.history = History()
+        self.version: Optional[int] = None
+        self.offer: Optional[Dict[str, Any]] = None
+        self.counter_offers: Optional[List[Dict[str, Any]]] = None
+        self.letter_key: Optional[str] = None
+        self.letter_job: Optional[str] = None
+        self.letter_url: Optional[str] = None
+        # Client turn id of the last committed turn, and its response as JSON.
+        self.last_turn_id: Optional[str] = None
+        self.last_response: Optional[str] = None
+
+    @property
+    def stage(self) -> Stage:
+        return self._stage
+
+    @stage.setter
+    def stage(self, value: str) -> None:
+        # Handlers answer with plain stage names; keep the enum.
+        self._stage = Stage(value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        JSON-ready state, without the version (stores keep that apart).
+        """
+        return {
+            "stage": self.stage.value,
+            "customer": self.customer.to_dict(),
+            "history": [[role, text] for role, text in self.history],
+            "offer": self.offer,
+            "counter_offers": self.counter_offers,
+            "letter_key": self.letter_key,
+            "letter_job": self.letter_job,
+            "letter_url": self.letter_url,
+            "last_turn_id": self.last_turn_id,
+            "last_response": self.last_response,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Session":
+        # Also reads sessions stored as plain dicts (history entries as
+        # {"role", "content"}), which may still be live after an upgrade.
+        session = cls(Stage(data["stage"]))
+        session.customer = Customer(**data.get("customer", {}))
+        for entry in data.get("history", []):
+            if isinstance(entry, dict):
+                entry = (entry["role"], entry["content"])
+            session.history.append(*entry)
+        session.offer = data.get("offer")
+        session.counter_offers = data.get("counter_offers")
+        session.letter_key = data.get("letter_key")
+        session.letter_job = data.get("letter_job")
+        session.letter_url = data.get("letter_url")
+        session.last_turn_id = data.get("last_turn_id")
+        session.last_response = data.get("last_response")
+        return session
@@ -0,0 +1,103 @@
+# replay.py
+"""
+Conversation replay runner.
+
+Plays scripted conversations straight through the stage engine (no HTTP,
+no letter rendering) and checks the stages they pass through.
+
+Each input line is a JSON object:
+    {"messages": ["Rahul Sharma", "ABCDE1234F", ...],
+     "expect_stages": ["ASK_PAN", "ASK_INCOME", ...]}
+
+expect_stages is optional; when present it lists the stage after every
+message. Reports conversations/sec, turns/sec and per-stage handler
+latency. Exits non-zero on any stage mismatch or handler error.
+
+Usage:
+    python replay.py conversations.jsonl [--repeat 100]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+# Replays queue nothing (post-commit actions are dropped), but importing
+# main opens the letter index, job queue and audit log; keep those off
+# the real ones and remove them on exit.
+SCRATCH = tempfile.mkdtemp(prefix="replay_")
+os.environ.setdefault("LETTER_OUTPUT_DIR", SCRATCH)
+os.environ.setdefault("LETTER_INDEX_PATH", os.path.join(SCRATCH, "letters.sqlite3"))
+os.environ.setdefault("JOB_QUEUE_PATH", os.path.join(SCRATCH, "jobs.sqlite3"))
+os.environ.setdefault("AUDIT_LOG_DIR", os.path.join(SCRATCH, "audit"))
+
+import main
+from stage_engine import StageEngineError
+
+
+def read_scripts(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def replay(scripts: List[Dict[str, Any]], repeat: int) -> List[str]:
+    errors = []
+
+    for n in range(repeat):
+        for line, script in enumerate(scripts, start=1):
+            try:
+                responses = await main.ENGINE.run_script(
+                    main.new_session(), script["messages"], session_id=f"replay-{line}"
+                )
+            except StageEngineError as exc:
+                errors.append(f"line {line}: {exc}")
+                continue
+
+            expected = script.get("expect_stages")
+            stages = [r.stage for r in responses]
+            if n == 0 and expected is not None and stages != expected:
+                errors.append(f"line {line}: expected {expected}, got {stages}")
+
+    return errors
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", help="JSONL of scripted conversations")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the file this many times")
+    args = parser.parse_args()
+
+    scripts = read_scripts(args.input)
+    turns = sum(len(s["messages"]) for s in scripts) * args.repeat
+
+    start = time.perf_counter()
+    try:
+        errors = asyncio.run(replay(scripts, args.repeat))
+    finally:
+        main.AUDIT_LOG.close()
+        shutil.rmtree(SCRATCH, ignore_errors=True)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{len(scripts) * args.repeat:,} conversations  {turns:,} turns  in {elapsed:.2f}s  "
+        f"({len(scripts) * args.repeat / elapsed:,.0f} conversations/sec, "
+        f"{turns / elapsed:,.0f} turns/sec)"
+    )
+    for stage, stats in main.ENGINE.stats().items():
+        print(
+            f"{stage:13s} {stats['turns']:8,} turns  p50 {stats['p50_ms']:.3f} ms  "
+            f"p95 {stats['p95_ms']:.3f} ms  max {stats['max_ms']:.3f} ms"
+        )
+
+    for error in errors:
+        print(error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
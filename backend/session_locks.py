@@ -0,0 +1,87 @@
+# session_locks.py
+"""
+Session Turn Locks
+
+Serializes chat turns per session within one process: turns for a
+session run one at a time, in arrival order (asyncio.Lock is FIFO),
+while different sessions stay fully concurrent.
+
+- A session's lock exists only while a turn holds or waits on it and is
+  dropped with the last one, so idle and expired sessions cost nothing
+- The table is capped at SESSION_MAX sessions (the session store's own
+  cap), and each session at SESSION_TURNS_MAX turns, the running one
+  included; beyond either, hold() raises SessionBusy instead of queueing
+
+Across processes (SESSION_BACKEND=sqlite with several workers) the
+session store's optimistic versioning still decides which turn commits.
+
+Usage:
+    async with LOCKS.hold(session_id):
+        ...read, run and commit the turn...
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from session_store import SESSION_MAX
+
+# ---------- Config ----------
+# One running turn plus four waiting behind it.
+SESSION_TURNS_MAX = int(os.getenv("SESSION_TURNS_MAX", "5"))
+
+
+class SessionBusy(Exception):
+    """Raised when a turn can't be queued behind the session's current one."""
+
+
+class _Entry:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class SessionLocks:
+    def __init__(
+        self,
+        max_sessions: int = SESSION_MAX,
+        max_turns: int = SESSION_TURNS_MAX,
+    ):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self._entries: Dict[str, _Entry] = {}
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def hold(self, session_id: str) -> AsyncIterator[None]:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            if len(self._entries) >= self.max_sessions:
+                self.rejected += 1
+                raise SessionBusy("too many sessions with turns in progress")
+            entry = self._entries[session_id] = _Entry()
+        elif entry.users >= self.max_turns:
+            self.rejected += 1
+            raise SessionBusy("too many turns queued for this session")
+
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._entries[session_id]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._entries),
+            "waiting": sum(entry.users - 1 for entry in self._entries.values()),
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,238 @@
+# session_store.py
+"""
+Session Store
+
+Pluggable storage for conversation sessions.
+
+- MemorySessionStore: in-process LRU with idle TTL and a session cap
+- SQLiteSessionStore: file-backed, survives restarts and can be shared
+  by several uvicorn workers / instances on one box
+
+Both hold records.Session objects (which bound their own history) and
+report size / eviction counts. Sessions carry a version that put()
+checks optimistically, so two concurrent turns on the same session can
+never both commit.
+
+Stores with `blocking = True` do file I/O (and may wait on another
+worker's write lock); async callers run their calls in a thread.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from records import Session
+
+# ---------- Config ----------
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.sqlite3")
+
+
+class SessionConflict(Exception):
+    """Raised when a session was updated by another turn since it was read."""
+
+
+# ---------- Interface ----------
+class SessionStore:
+    """
+    Base interface. get() returns None for unknown or expired sessions;
+    put() must be called after every turn that mutates a session.
+
+    put() raises SessionConflict if the stored version no longer matches
+    session.version (None for brand-new sessions), and bumps the version
+    on success.
+    """
+
+    blocking = False
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, session_id: str) -> Optional[Session]:
+        raise NotImplementedError
+
+    def put(self, session_id: str, session: Session) -> None:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# ---------- In-Memory LRU + TTL ----------
+class MemorySessionStore(SessionStore):
+    def __init__(
+        self,
+        max_sessions: int = SESSION_MAX,
+        ttl_seconds: int = SESSION_TTL_SECONDS,
+    ):
+        super().__init__(ttl_seconds)
+        self.max_sessions = max_sessions
+        # Ordered by last access, so the oldest entries are always first.
+        self._sessions: "OrderedDict[str, Tuple[Session, float]]" = OrderedDict()
+
+    def get(self, session_id: str) -> Optional[Session]:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+
+        session, last_seen = entry
+        if time.monotonic() - last_seen > self.ttl_seconds:
+            del self._sessions[session_id]
+            self.expirations += 1
+            return None
+
+        return session
+
+    def put(self, session_id: str, session: Session) -> None:
+        entry = self._sessions.get(session_id)
+        current = entry[0].version if entry is not None else None
+        if entry is not None and entry[0] is not session and current != session.version:
+            raise SessionConflict(session_id)
+
+        session.version = (current or 0) + 1
+        self._sessions[session_id] = (session, time.monotonic())
+        self._sessions.move_to_end(session_id)
+        self._sweep()
+
+    def delete(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def _sweep(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+
+        while self._sessions:
+            _, (_, last_seen) = next(iter(self._sessions.items()))
+            if last_seen >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self.expirations += 1
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+# ---------- SQLite (file-backed) ----------
+class SQLiteSessionStore(SessionStore):
+    SWEEP_EVERY = 256
+    blocking = True
+
+    def __init__(
+        self,
+        path: str = SESSION_DB_PATH,
+        ttl_seconds: int = SESSION_TTL_SECONDS,
+    ):
+        super().__init__(ttl_seconds)
+        self.path = path
+        self._writes = 0
+        # One connection, used from whichever thread runs the call.
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " version INTEGER NOT NULL DEFAULT 1,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)"
+        )
+        self._conn.commit()
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, version, updated_at FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        if row is None:
+            return None
+
+        data, version, updated_at = row
+        if time.time() - updated_at > self.ttl_seconds:
+            self.delete(session_id)
+            self.expirations += 1
+            return None
+
+        session = Session.from_dict(json.loads(data))
+        session.version = version
+        return session
+
+    def put(self, session_id: str, session: Session) -> None:
+        version = session.version
+        data = json.dumps(session.to_dict())
+        now = time.time()
+
+        with self._lock:
+            if version is None:
+                cur = self._conn.execute(
+                    "INSERT INTO sessions (session_id, data, version, updated_at)"
+                    " VALUES (?, ?, 1, ?) ON CONFLICT(session_id) DO NOTHING",
+                    (session_id, data, now),
+                )
+            else:
+                cur = self._conn.execute(
+                    "UPDATE sessions SET data = ?, version = version + 1, updated_at = ?"
+                    " WHERE session_id = ? AND version = ?",
+                    (data, now, session_id, version),
+                )
+            self._conn.commit()
+
+            if cur.rowcount != 1:
+                raise SessionConflict(session_id)
+            session.version = (version or 0) + 1
+
+            self._writes += 1
+            if self._writes % self.SWEEP_EVERY == 0:
+                self._sweep()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def _sweep(self) -> None:
+        cur = self._conn.execute(
+            "DELETE FROM sessions WHERE updated_at < ?",
+            (time.time() - self.ttl_seconds,),
+        )
+        self._conn.commit()
+        self.expirations += cur.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+# ---------- Factory ----------
+def create_session_store(backend: str = SESSION_BACKEND) -> SessionStore:
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend!r}")
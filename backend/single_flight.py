@@ -0,0 +1,54 @@
+# single_flight.py
+"""
+Single-Flight Calls
+
+Coalesces concurrent calls for the same key: the first caller runs the
+work, callers that arrive while it is in flight await the same result.
+Used by the caches in front of slow upstreams (llm_cache, kyc), which
+check their own entries first and store the result inside `compute`,
+before any waiter is released.
+
+Failures and cancellations reach every waiter and are not remembered.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs `compute` for `key`, or joins the call already in flight.
+        """
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark retrieved so a failure nobody else awaited isn't logged.
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
@@ -0,0 +1,180 @@
+# stage_engine.py
+"""
+Conversation Stage Engine
+
+Table-driven replacement for the /chat if/elif chain.
+
+- Each stage is an async handler registered with @engine.stage(...)
+  together with the stages it may move to
+- validate() checks the transition table once at startup: every target
+  exists and every stage is reachable from the initial one
+- run() owns the per-turn bookkeeping every stage shares: history
+  appends on both sides, the stage write, transition checks and
+  per-stage latency (also passed to observers, e.g. metrics)
+- run_script() drives scripted conversations without HTTP, for replay
+  tests and load benchmarks
+"""
+
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Sequence
+
+from records import Session
+
+# observer(stage, next_stage, seconds)
+Observer = Callable[[str, str, float], None]
+
+LATENCY_SAMPLES = 2048
+
+
+class StageEngineError(Exception):
+    """Raised for an invalid transition table or an undeclared transition."""
+
+
+class Turn:
+    """
+    One user message being applied to a session. Actions appended to
+    after_commit run only once the session has been stored; an action
+    may return an awaitable, which the caller awaits.
+    """
+
+    __slots__ = ("session_id", "session", "text", "after_commit")
+
+    def __init__(
+        self,
+        session_id: str,
+        session: Session,
+        text: str,
+        after_commit: List[Callable[[], Any]],
+    ):
+        self.session_id = session_id
+        self.session = session
+        self.text = text
+        self.after_commit = after_commit
+
+
+Handler = Callable[[Turn], Awaitable[Any]]
+
+
+class Stage:
+    __slots__ = ("name", "handler", "transitions", "samples", "count")
+
+    def __init__(self, name: str, handler: Handler, transitions: Sequence[str]):
+        self.name = name
+        self.handler = handler
+        # Staying put (a re-prompt) is always allowed.
+        self.transitions = frozenset(transitions) | {name}
+        self.samples: deque = deque(maxlen=LATENCY_SAMPLES)
+        self.count = 0
+
+
+class StageEngine:
+    def __init__(self, initial: str):
+        self.initial = initial
+        self._stages: Dict[str, Stage] = {}
+        self._observers: List[Observer] = []
+
+    def stage(self, name: str, next: Sequence[str] = ()) -> Callable[[Handler], Handler]:
+        """
+        Registers the decorated handler for `name`. The handler returns a
+        response with .reply and .stage; `next` lists the other stages
+        that .stage may name.
+        """
+        def register(handler: Handler) -> Handler:
+            if name in self._stages:
+                raise StageEngineError(f"stage {name} registered twice")
+            self._stages[name] = Stage(name, handler, next)
+            return handler
+
+        return register
+
+    def observe(self, observer: Observer) -> None:
+        """
+        Calls `observer` after every turn with the stage it ran in, the
+        stage it moved to and the handler's time in seconds.
+        """
+        self._observers.append(observer)
+
+    @property
+    def stages(self) -> List[str]:
+        return list(self._stages)
+
+    def validate(self) -> None:
+        if self.initial not in self._stages:
+            raise StageEngineError(f"initial stage {self.initial} has no handler")
+
+        for stage in self._stages.values():
+            unknown = stage.transitions - self._stages.keys()
+            if unknown:
+                raise StageEngineError(
+                    f"{stage.name} moves to unregistered stage(s) {sorted(unknown)}"
+                )
+
+        reachable, frontier = {self.initial}, [self.initial]
+        while frontier:
+            for target in self._stages[frontier.pop()].transitions:
+                if target not in reachable:
+                    reachable.add(target)
+                    frontier.append(target)
+
+        unreachable = self._stages.keys() - reachable
+        if unreachable:
+            raise StageEngineError(f"unreachable stage(s) {sorted(unreachable)}")
+
+    async def run(self, turn: Turn) -> Any:
+        session = turn.session
+        name = str(session.stage)
+        stage = self._stages.get(name)
+        if stage is None:
+            raise StageEngineError(f"no handler for stage {name}")
+
+        session.history.append("user", turn.text)
+
+        start = time.perf_counter()
+        response = await stage.handler(turn)
+        elapsed = time.perf_counter() - start
+        stage.samples.append(elapsed)
+        stage.count += 1
+
+        if response.stage not in stage.transitions:
+            raise StageEngineError(f"undeclared transition {name} -> {response.stage}")
+
+        for observer in self._observers:
+            observer(name, response.stage, elapsed)
+
+        session.stage = response.stage
+        session.history.append("assistant", response.reply)
+        return response
+
+    async def run_script(
+        self,
+        session: Session,
+        messages: Sequence[str],
+        session_id: str = "script",
+    ) -> List[Any]:
+        """
+        Plays `messages` against `session` in order. Post-commit actions
+        (such as queueing letter renders) are dropped.
+        """
+        return [
+            await self.run(Turn(session_id, session, text, []))
+            for text in messages
+        ]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-stage turn count and handler latency (ms) over the most
+        recent LATENCY_SAMPLES turns.
+        """
+        report = {}
+        for stage in self._stages.values():
+            if not stage.samples:
+                continue
+            samples = sorted(stage.samples)
+            report[stage.name] = {
+                "turns": stage.count,
+                "p50_ms": samples[len(samples) // 2] * 1000,
+                "p95_ms": samples[int(len(samples) * 0.95)] * 1000,
+                "max_ms": samples[-1] * 1000,
+            }
+        return report
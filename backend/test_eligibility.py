@@ -0,0 +1,75 @@
+# test_eligibility.py
+"""
+Credit Worker checks: inputs the chat accepts must never crash the
+scalar or batch engines, and the two engines must agree.
+
+Usage:
+    python -m pytest backend
+"""
+
+import numpy as np
+import pytest
+
+from annuity import annuity_factor, annuity_factors
+from batch_eligibility import check_eligibility_batch, check_parity, REASONS
+from offers import amount_ladder, find_counter_offers, MAX_AMOUNT_SAME_TENURE
+from policy import CreditPolicy, DEFAULT_POLICY
+from workers import check_eligibility, LOAN_INTEREST_RATE, MAX_LOAN_TENURE
+
+
+@pytest.mark.parametrize("tenure", [100_000, 10**12])
+def test_annuity_factor_long_tenure_tends_to_monthly_rate(tenure):
+    rate = LOAN_INTEREST_RATE / 1200
+    assert annuity_factor(LOAN_INTEREST_RATE, tenure) == pytest.approx(rate)
+    assert annuity_factors(LOAN_INTEREST_RATE, np.array([tenure]))[0] == pytest.approx(rate)
+
+
+@pytest.mark.parametrize("tenure", [0, MAX_LOAN_TENURE + 1, 100_000, 10**30])
+def test_out_of_range_tenure_is_invalid(tenure):
+    result = check_eligibility({
+        "monthly_income": 85000,
+        "existing_emi": 6000,
+        "requested_amount": 300000,
+        "tenure": tenure,
+    })
+    assert not result["eligible"]
+    assert result["reason"] == "Invalid loan tenure"
+
+
+def test_batch_rejects_tenure_above_max():
+    result = check_eligibility_batch([85000], [6000], [300000], [100_000])
+    assert not result["eligible"][0]
+    assert REASONS[result["reason"][0]] == "Invalid loan tenure"
+
+
+@pytest.mark.parametrize("tenure", [0, MAX_LOAN_TENURE + 1, 100_000, 10**30])
+def test_counter_offers_ignore_out_of_range_tenure(tenure):
+    offers = find_counter_offers(60000, 10000, 1500000, tenure)
+    assert offers
+    assert all(0 < o["tenure_months"] <= MAX_LOAN_TENURE for o in offers)
+    assert all(o["kind"] != MAX_AMOUNT_SAME_TENURE for o in offers)
+
+
+@pytest.mark.parametrize("policy", [
+    DEFAULT_POLICY,
+    CreditPolicy(name="tight", min_monthly_income=40000, max_foir=0.35, low_risk_foir=0.2),
+    # Lowest threshold allowed: zero incomes sit just below it.
+    CreditPolicy(name="floor", min_monthly_income=1),
+])
+def test_batch_engine_matches_credit_worker(policy):
+    assert check_parity(20_000, seed=11, policy=policy) == 0
+
+
+@pytest.mark.parametrize("min_income", [0, -1])
+def test_policy_rejects_non_positive_min_income(min_income):
+    with pytest.raises(ValueError):
+        CreditPolicy(min_monthly_income=min_income)
+
+
+@pytest.mark.parametrize("amount", [3 * 10**17, 10**22])
+def test_amount_ladder_keeps_every_rung_for_huge_amounts(amount):
+    ladder = amount_ladder(amount)
+    assert ladder[0] == amount
+    assert ladder[1] == pytest.approx(amount * 0.95)
+    assert list(ladder) == sorted(ladder, reverse=True)
+    assert find_counter_offers(60000, 10000, amount, 36) == []
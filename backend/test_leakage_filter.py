@@ -0,0 +1,31 @@
+# test_leakage_filter.py
+"""
+Leakage filter checks: the bench_leakage corpus must come out right,
+whole and streamed in every chunk size the stream has to handle.
+
+Usage:
+    python -m pytest backend
+"""
+
+import pytest
+
+from bench_leakage import LEAKY_CORPUS, SAFE_CORPUS, streamed_rule
+from leakage_filter import LeakageFilter
+
+LEAK_FILTER = LeakageFilter()
+# Every chunking exercises a different split of the held-back tail.
+CHUNKS = range(1, 9)
+
+
+@pytest.mark.parametrize("reply", SAFE_CORPUS)
+def test_safe_reply_passes(reply):
+    assert LEAK_FILTER.scan(reply) is None
+    for chunk in CHUNKS:
+        assert streamed_rule(LEAK_FILTER, reply, chunk) is None, chunk
+
+
+@pytest.mark.parametrize("reply, expected", LEAKY_CORPUS)
+def test_leaky_reply_is_caught_by_expected_phrase(reply, expected):
+    assert LEAK_FILTER.scan(reply) == expected
+    for chunk in CHUNKS:
+        assert streamed_rule(LEAK_FILTER, reply, chunk) == expected, chunk
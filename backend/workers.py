@@ -1,17 +1,30 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional, TYPE_CHECKING
 from datetime import datetime
 import os
+import tempfile
 
-from reportlab.platypus import HRFlowable
-from pypdf import PdfReader, PdfWriter
+from annuity import annuity_factor
+from policy import CreditPolicy, DEFAULT_POLICY
+
+if TYPE_CHECKING:
+    from letter_render import SanctionLetterTemplate
 
 # =====================================================
 # CONFIG
 # =====================================================
 NBFC_NAME = "ARMEK Financial Services"
 NBFC_WEBSITE = "www.armekfinance.com"  # demo-safe
-OUTPUT_DIR = "generated_letters"
+OUTPUT_DIR = os.getenv("LETTER_OUTPUT_DIR", "generated_letters")
 LOGO_PATH = "static/nbfc_logo.png"
+LOGO_WIDTH = 140
+LOGO_HEIGHT = 50
+LOGO_RESOLUTION = 3  # logo pixels per point, ~216 dpi
+
+# ---------- Credit Policy ----------
+# Eligibility thresholds live in policy.CreditPolicy.
+LOAN_INTEREST_RATE = 12.0  # % per annum, printed on the sanction letter
+MAX_LOAN_TENURE = 360  # months; longer tenures are rejected as invalid
+MAX_LOAN_AMOUNT = 1_000_000_000  # larger requests are re-prompted by the chat
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
@@ -37,18 +50,22 @@ def verify_customer(data: Dict[str, Any]) -> Dict[str, Any]:
 # =====================================================
 # WORKER 2 — CREDIT / ELIGIBILITY AGENT
 # =====================================================
-def check_eligibility(data: Dict[str, Any]) -> Dict[str, Any]:
+def check_eligibility(
+    data: Dict[str, Any],
+    policy: CreditPolicy = DEFAULT_POLICY,
+) -> Dict[str, Any]:
     """
-    NBFC-style affordability and risk evaluation.
+    NBFC-style affordability and risk evaluation under `policy`.
     Returns explainable metrics for the Master Agent.
     """
     income = float(data.get("monthly_income", 0))
     existing_emi = float(data.get("existing_emi", 0))
     requested_amount = float(data.get("requested_amount", 0))
     tenure = int(data.get("tenure", 60))
+    rate = float(data.get("interest_rate", LOAN_INTEREST_RATE))
 
     # ---------- Guardrails ----------
-    if income < 25000:
+    if income < policy.min_monthly_income:
         return {
             "eligible": False,
             "approved_amount": 0,
@@ -56,7 +73,7 @@ def check_eligibility(data: Dict[str, Any]) -> Dict[str, Any]:
             "risk_band": "HIGH",
         }
 
-    if tenure <= 0:
+    if not 0 < tenure <= MAX_LOAN_TENURE:
         return {
             "eligible": False,
             "approved_amount": 0,
@@ -64,13 +81,14 @@ def check_eligibility(data: Dict[str, Any]) -> Dict[str, Any]:
             "risk_band": "HIGH",
         }
 
-    # ---------- EMI Approximation ----------
-    proposed_emi = requested_amount / tenure
+    # ---------- EMI (reducing balance) ----------
+    factor = annuity_factor(rate, tenure)
+    proposed_emi = requested_amount * factor
 
     # ---------- FOIR ----------
     foir = (existing_emi + proposed_emi) / income
 
-    if foir > 0.45:
+    if foir > policy.max_foir:
         return {
             "eligible": False,
             "approved_amount": 0,
@@ -80,11 +98,11 @@ def check_eligibility(data: Dict[str, Any]) -> Dict[str, Any]:
         }
 
     # ---------- Risk Band ----------
-    risk_band = "LOW" if foir <= 0.30 else "MEDIUM"
+    risk_band = "LOW" if foir <= policy.low_risk_foir else "MEDIUM"
 
     # ---------- Max Eligibility (Upsell Logic) ----------
-    max_affordable_emi = income * 0.45 - existing_emi
-    max_eligible_amount = int(max_affordable_emi * tenure)
+    max_affordable_emi = income * policy.max_foir - existing_emi
+    max_eligible_amount = int(max_affordable_emi / factor)
 
     approved_amount = min(int(requested_amount), max_eligible_amount)
 
@@ -94,6 +112,7 @@ def check_eligibility(data: Dict[str, Any]) -> Dict[str, Any]:
         "requested_amount": int(requested_amount),
         "foir": round(foir, 2),
         "risk_band": risk_band,
+        "proposed_emi": proposed_emi,
         "max_eligible_amount": max_eligible_amount,
         "reason": "Eligible based on income, obligations, and tenure",
     }
@@ -102,188 +121,94 @@ def check_eligibility(data: Dict[str, Any]) -> Dict[str, Any]:
 # =====================================================
 # WORKER 3 — SANCTION LETTER AGENT
 # =====================================================
-def generate_sanction_letter(data: Dict[str, Any]) -> Dict[str, Any]:
-    from reportlab.platypus import (
-        SimpleDocTemplate,
-        Paragraph,
-        Table,
-        TableStyle,
-        Spacer,
-        Image,
-    )
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib import colors
+_LETTER_TEMPLATE: Optional["SanctionLetterTemplate"] = None
+
+
+def get_letter_template() -> "SanctionLetterTemplate":
+    """
+    The process-wide letter template. ReportLab is imported on first use,
+    so only processes that render letters pay for it.
+    """
+    global _LETTER_TEMPLATE
+    if _LETTER_TEMPLATE is None:
+        from letter_render import SanctionLetterTemplate
+
+        _LETTER_TEMPLATE = SanctionLetterTemplate()
+    return _LETTER_TEMPLATE
+
+
+def reload_letter_template() -> "SanctionLetterTemplate":
+    """
+    Rebuilds the cached template, e.g. after the logo is replaced.
+    """
+    from letter_render import SanctionLetterTemplate
+
+    global _LETTER_TEMPLATE
+    _LETTER_TEMPLATE = SanctionLetterTemplate()
+    return _LETTER_TEMPLATE
+
+
+def write_atomic(file_path: str, payload: bytes) -> None:
+    """
+    Writes the file once via a temp file + rename, so a partially
+    written letter is never visible at its final path.
+    """
+    directory = os.path.dirname(file_path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=".pdf")
 
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def generate_sanction_letter(data: Dict[str, Any]) -> Dict[str, Any]:
     # ---------- INPUT ----------
     raw_name = data["customer_name"]
     name = " ".join(word.capitalize() for word in raw_name.split())
 
     amount = int(data["approved_amount"])
-    rate = float(data.get("interest_rate", 12.0))
+    rate = float(data.get("interest_rate", LOAN_INTEREST_RATE))
     tenure = int(data.get("tenure_months", 60))
-    today = datetime.now().strftime("%d %b %Y")
-
-    safe_name = name.replace(" ", "_")
-    file_path = f"{OUTPUT_DIR}/sanction_{safe_name}.pdf"
-
-    # ---------- DOCUMENT ----------
-    doc = SimpleDocTemplate(
-        file_path,
-        pagesize=A4,
-        leftMargin=36,
-        rightMargin=36,
-        topMargin=28,
-        bottomMargin=36,
-    )
-
-    styles = getSampleStyleSheet()
-
-    styles.add(
-        ParagraphStyle(
-            name="TitleCenter",
-            alignment=TA_CENTER,
-            fontSize=18,
-            leading=22,
-            fontName="Helvetica-Bold",
-            spaceAfter=8,
-        )
-    )
-
-    styles.add(
-        ParagraphStyle(
-            name="SubTitleCenter",
-            alignment=TA_CENTER,
-            fontSize=12,
-            leading=14,
-            fontName="Helvetica-Bold",
-            spaceAfter=16,
-        )
-    )
-
-    styles.add(
-        ParagraphStyle(
-            name="BodyTextCustom",
-            alignment=TA_LEFT,
-            fontSize=11,
-            leading=14,
-            spaceAfter=10,
-        )
-    )
-
-    elements = []
-
-    # ---------- LOGO ----------
-    if os.path.exists(LOGO_PATH):
-        logo = Image(LOGO_PATH, width=140, height=50)
-        logo.hAlign = "CENTER"
-        elements.append(logo)
-        elements.append(Spacer(1, 6))
-
-    # ---------- HEADER ----------
-    elements.append(Paragraph("LOAN SANCTION LETTER", styles["TitleCenter"]))
-    elements.append(Paragraph(NBFC_NAME, styles["SubTitleCenter"]))
-
-    elements.append(HRFlowable(width="100%", thickness=0.8, color=colors.grey))
-    elements.append(Spacer(1, 16))
-
-    # ---------- BORROWER DETAILS ----------
-    borrower_table = Table(
-        [
-            ["Borrower Name", name],
-            ["Sanction Date", today],
-            ["Loan Type", "Personal Loan"],
-        ],
-        colWidths=[160, 340],
-    )
-
-    borrower_table.setStyle(
-        TableStyle(
-            [
-                ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-                ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
-                ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-                ("PADDING", (0, 0), (-1, -1), 8),
-            ]
-        )
-    )
-
-    elements.append(borrower_table)
-    elements.append(Spacer(1, 20))
-
-    # ---------- KEY FACT SHEET ----------
-    elements.append(Paragraph("KEY FACT SHEET", styles["BodyTextCustom"]))
-    elements.append(Spacer(1, 6))
-
-    kfs_table = Table(
-        [
-           ["Approved Amount", f"INR {amount:,}"],
-
-            ["Interest Rate", f"{rate:.2f}% per annum"],
-            ["Tenure", f"{tenure} months"],
-            ["Repayment Mode", "Monthly EMI"],
-            ["Interest Type", "Fixed"],
-        ],
-        colWidths=[200, 300],
-    )
-
-    kfs_table.setStyle(
-        TableStyle(
-            [
-                ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-                ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
-                ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-                ("PADDING", (0, 0), (-1, -1), 8),
-            ]
-        )
-    )
-
-    elements.append(kfs_table)
-    elements.append(Spacer(1, 20))
-
-    # ---------- DISCLAIMER ----------
-    elements.append(
-        Paragraph(
-            "This loan is sanctioned subject to completion of documentation, "
-            "verification, and internal credit policies of the company. "
-            "This is a system-generated document and does not require a physical signature.",
-            styles["BodyTextCustom"],
-        )
-    )
-
-    elements.append(Spacer(1, 30))
-    elements.append(HRFlowable(width="100%", thickness=0.6, color=colors.lightgrey))
-    elements.append(Spacer(1, 16))
-
-    # ---------- SIGNATURE ----------
-    elements.append(Paragraph(f"For {NBFC_NAME}", styles["BodyTextCustom"]))
-    elements.append(Paragraph("Authorized Credit Team", styles["BodyTextCustom"]))
-
-    # ---------- BUILD ----------
-    doc.build(elements)
-
-    # ---------- ENCRYPT ----------
-    reader = PdfReader(file_path)
-    writer = PdfWriter()
-
-    for page in reader.pages:
-        writer.add_page(page)
+    today = data.get("sanction_date") or datetime.now().strftime("%d %b %Y")
+
+    # The letter store supplies a content-addressed path; otherwise fall
+    # back to naming the file after the customer.
+    if data.get("output_path"):
+        file_path = data["output_path"]
+        letter_url = data["letter_url"]
+    else:
+        safe_name = name.replace(" ", "_")
+        file_path = f"{OUTPUT_DIR}/sanction_{safe_name}.pdf"
+        letter_url = f"/generated_letters/{os.path.basename(file_path)}"
 
     password = name.split()[0].lower()
-    writer.encrypt(password)
 
-    with open(file_path, "wb") as f:
-        writer.write(f)
+    # Same key, same content: a duplicate render request is a no-op.
+    if not (data.get("output_path") and os.path.exists(file_path)):
+        # ---------- BUILD + ENCRYPT ----------
+        from letter_render import render_sanction_pdf
+
+        elements = get_letter_template().build_elements(name, today, amount, rate, tenure)
+        pdf_bytes = render_sanction_pdf(elements, password)
+
+        # ---------- WRITE ----------
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        write_atomic(file_path, pdf_bytes)
 
     # ---------- RESPONSE ----------
     return {
-        "letter_url": f"/generated_letters/{os.path.basename(file_path)}",
+        "letter_url": letter_url,
         "password": password,
         "meta": {
             "customer_name": name,
             "approved_amount": amount,
             "interest_rate": rate,
             "tenure_months": tenure,
+            "sanction_date": today,
         },
     }
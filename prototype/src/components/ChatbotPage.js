@@ -6,12 +6,42 @@ import { useEffect, useState, useRef } from "react";
 
 const BACKEND_URL =
   process.env.REACT_APP_BACKEND_URL || "http://localhost:8000/chat";
+const BACKEND_ORIGIN = new URL(BACKEND_URL).origin;
+const STREAM_URL = `${BACKEND_URL}/stream`;
+const LETTER_POLL_MS = 1000;
 
 /* ---------- HELPERS ---------- */
 function generateUUID() {
   return crypto.randomUUID();
 }
 
+// Reads a server-sent event stream from a fetch() response.
+async function readEvents(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += decoder.decode(value, { stream: true });
+
+    let end;
+    while ((end = buffer.indexOf("\n\n")) !== -1) {
+      const frame = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of frame.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      onEvent(event, JSON.parse(data));
+    }
+  }
+}
+
 /* ---------- STAGE LABELS (Human-friendly) ---------- */
 const STAGE_LABELS = {
   ASK_NAME: "Getting Started",
@@ -20,6 +50,7 @@ const STAGE_LABELS = {
   ASK_EMI: "Financial Obligations",
   ASK_AMOUNT: "Loan Requirement",
   ASK_TENURE: "Loan Preferences",
+  CHOOSE_OFFER: "Alternative Offers",
   COMPLETED: "Loan Approved",
   REJECTED: "Application Update",
 };
@@ -32,6 +63,7 @@ const STAGE_TO_AGENT = {
   ASK_EMI: "Credit & Eligibility Agent",
   ASK_AMOUNT: "Credit & Eligibility Agent",
   ASK_TENURE: "Credit & Eligibility Agent",
+  CHOOSE_OFFER: "Credit & Eligibility Agent",
   COMPLETED: "Document Agent",
   REJECTED: "Master Agent",
 };
@@ -68,6 +100,40 @@ export default function ChatbotPage() {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [messages, sanctionUrl, loading]);
 
+  /* ---------- SANCTION LETTER POLLING ---------- */
+  const pollLetterJob = async (statusUrl) => {
+    try {
+      const response = await fetch(`${BACKEND_ORIGIN}${statusUrl}`);
+      if (response.status === 404) return;
+      if (!response.ok) throw new Error("Network error");
+
+      const job = await response.json();
+
+      if (job.status === "READY" && job.letter_url) {
+        setSanctionUrl(`${BACKEND_ORIGIN}${job.letter_url}`);
+        return;
+      }
+
+      if (job.status === "FAILED") {
+        setMessages((prev) => [
+          ...prev,
+          {
+            id: Date.now(),
+            sender: "bot",
+            text:
+              "Your sanction letter is taking a little longer than usual. " +
+              "Send any message to check on it again.",
+          },
+        ]);
+        return;
+      }
+    } catch {
+      // Transient failure: keep polling.
+    }
+
+    setTimeout(() => pollLetterJob(statusUrl), LETTER_POLL_MS);
+  };
+
   /* ---------- SEND MESSAGE ---------- */
   const sendMessage = async () => {
     if (!input.trim() || loading) return;
@@ -81,28 +147,61 @@ export default function ChatbotPage() {
       { id: Date.now(), sender: "user", text: userText },
     ]);
 
+    const botId = Date.now() + 1;
+    const showReply = (text) =>
+      setMessages((prev) =>
+        prev.some((m) => m.id === botId)
+          ? prev.map((m) => (m.id === botId ? { ...m, text } : m))
+          : [...prev, { id: botId, sender: "bot", text }]
+      );
+
+    // One id per message: a retry is answered with the original reply
+    // instead of running the turn again.
+    const request = {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        session_id: sessionId,
+        message: userText,
+        turn_id: generateUUID(),
+      }),
+    };
+
     try {
-      const response = await fetch(BACKEND_URL, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          session_id: sessionId,
-          message: userText,
-        }),
-      });
+      let response;
+      try {
+        response = await fetch(STREAM_URL, request);
+      } catch {
+        response = await fetch(STREAM_URL, request);
+      }
 
       if (!response.ok) throw new Error("Network error");
 
-      const data = await response.json();
+      // Stage-machine text arrives first, agent tokens after it.
+      let streamed = "";
+      let data = null;
+      await readEvents(response, (event, payload) => {
+        if (event === "delta") {
+          streamed += payload.text;
+          showReply(streamed);
+        } else if (event === "reset") {
+          streamed = payload.text;
+          showReply(streamed);
+        } else if (event === "done") {
+          data = payload;
+        }
+      });
+
+      if (!data) throw new Error("Stream ended early");
 
       if (data.stage) {
         setCurrentStage(data.stage);
       }
 
       if (data.reply) {
+        showReply(data.reply);
         setMessages((prev) => [
           ...prev,
-          { id: Date.now() + 1, sender: "bot", text: data.reply },
           {
             id: Date.now() + 2,
             sender: "system",
@@ -111,12 +210,21 @@ export default function ChatbotPage() {
         ]);
       }
 
+      // Download links expire: always replace the one held with the
+      // newest, and drop it while the letter is being prepared again.
       if (
         data.ui_action === "SHOW_SANCTION_DOWNLOAD" &&
-        data.data?.letter_url &&
-        !sanctionUrl
+        data.data?.letter_url
+      ) {
+        setSanctionUrl(`${BACKEND_ORIGIN}${data.data.letter_url}`);
+      }
+
+      if (
+        data.ui_action === "SANCTION_LETTER_PENDING" &&
+        data.data?.status_url
       ) {
-        setSanctionUrl(`http://localhost:8000${data.data.letter_url}`);
+        setSanctionUrl(null);
+        pollLetterJob(data.data.status_url);
       }
     } catch {
       setMessages((prev) => [